@@ -19,66 +19,226 @@ const UDP_MSG_PORT = 10011;   // puerto único para mensajes directos entre robo
 // Configuración del simulador
 const UDP_DISPATCHER_TO_SIM = 10009; // puerto del simulador
 const SIM_HOST = "127.0.0.1";
+const BIN_MAGIC = 0xE5; // primer byte de los paquetes binarios de ester_grid
+
+// Timestamps por tramo (ester_grid/hops.py): si el paquete termina en
+// ,"ht":[t_robot]} se le agregan recepción y reenvío del dispatcher (µs epoch)
+// sin re-serializar: ,"ht":[t_robot,t_recv,t_fwd]}
+const HT_KEY = Buffer.from('"ht":[');
+function now_us(){ return Math.round((performance.timeOrigin + performance.now()) * 1000); }
+
+function hop_stamp(msg, tRecv){
+  const n = msg.length;
+  if(n < 3 || msg[n-1] !== 0x7D || msg[n-2] !== 0x5D) return msg; // no termina en ]}
+  const at = msg.lastIndexOf(HT_KEY);
+  if(at < 0 || msg.indexOf(0x5D, at) !== n-2) return msg;          // "ht" no es el último campo
+  return Buffer.concat([msg.subarray(0, n-2), Buffer.from(`,${tRecv},${now_us()}]}`)]);
+}
 
 let nextIndex = 0;
-const robots = {}; // socket.id -> { sendPort, recvPort, udpSocket }
+const robots = {}; // socket.id -> { sendPort, recvPort, udpSocket, sockets }
 const udpEndpoints = {}; // robotId/name -> { address, port, lastSeen }
 const twinPairs = {}; // robotId -> twinId (bidirectional mapping)
+const topicSubs = new Map(); // tópico/grupo -> Set(robotId) (Map: un tópico "constructor" no pisa Object.prototype)
+const robotTopics = new Map(); // robotId -> Set(tópico)
 
 server.listen(6029, () => console.log("Dispatcher Socket.IO escuchando en puerto 6029"));
 
-// Asignación de puertos al conectar
-io.on("connection", (socket) => {
-  console.log("Nuevo robot conectado:", socket.id);
+// ===============================================
+// Sincronización de gemelos: un solo loop para todos los pares
+// Los estados de un robot con gemelo (por su puerto UDP o por el 10011) no
+// se reenvían uno por uno: se guarda el último de cada par y cada
+// 1/TWIN_SYNC_HZ s sale ese último, con mirrored_from/via/for empalmados en
+// el datagrama original (una sola codificación, sin spread + stringify).
+// Lag por par = recepción del último estado -> reenvío. GET /twins lo reporta.
+// ===============================================
+const TWIN_SYNC_HZ = Math.max(1, Number(process.env.ESTER_TWIN_HZ) || 20);
+const TWIN_REPORT_MS = 10000;
+const twinLatest = new Map(); // robotId -> { msg, tRecv } (último estado sin reenviar)
+const twinStats = new Map();  // robotId -> { twin, received, sent, coalesced, lagLastMs, lagSumMs, lagMaxMs, lastSent }
+
+function twin_stats(src){
+  let st = twinStats.get(src);
+  if(!st){
+    st = { twin: twinPairs[src], received: 0, sent: 0, coalesced: 0, lagLastMs: 0, lagSumMs: 0, lagMaxMs: 0, lastSent: 0 };
+    twinStats.set(src, st);
+  }
+  return st;
+}
+
+function twin_offer(src, msg){
+  if(!twinPairs[src]) return;
+  const st = twin_stats(src);
+  st.received++;
+  if(twinLatest.has(src)) st.coalesced++;
+  twinLatest.set(src, { msg, tRecv: performance.now() });
+}
+
+function twin_mirror(msg, src, twinId){
+  const end = msg.lastIndexOf(0x7D);
+  if(end < 1) return null;
+  return Buffer.concat([msg.subarray(0, end), Buffer.from(`,"mirrored_from":${JSON.stringify(src)},"via":"dispatcher_twin","for":${JSON.stringify(twinId)}}`)]);
+}
+
+function twin_flush(){
+  if(twinLatest.size === 0) return;
+  const now = performance.now();
+  for(const [src, { msg, tRecv }] of twinLatest){
+    const twinId = twinPairs[src];
+    const twinEp = twinId && udpEndpoints[twinId];
+    if(!twinEp) continue;
+    const buf = twin_mirror(msg, src, twinId);
+    if(!buf) continue;
+    udpMsgSocket.send(buf, twinEp.port, twinEp.address, (err) => {
+      if (err) console.log(`[TWIN] Error replicando a gemelo ${twinId}: ${err}`);
+    });
+    const st = twin_stats(src);
+    const lag = now - tRecv;
+    st.twin = twinId;
+    st.sent++;
+    st.lagLastMs = lag;
+    st.lagSumMs += lag;
+    if(lag > st.lagMaxMs) st.lagMaxMs = lag;
+    st.lastSent = Date.now();
+  }
+  twinLatest.clear();
+}
+
+function twin_report(){
+  const pairs = {};
+  for(const [src, st] of twinStats){
+    pairs[src] = {
+      twin: st.twin, received: st.received, sent: st.sent, coalesced: st.coalesced,
+      lag_last_ms: +st.lagLastMs.toFixed(2),
+      lag_mean_ms: st.sent ? +(st.lagSumMs / st.sent).toFixed(2) : null,
+      lag_max_ms: +st.lagMaxMs.toFixed(2),
+      since_last_ms: st.lastSent ? Date.now() - st.lastSent : null,
+    };
+  }
+  return { hz: TWIN_SYNC_HZ, pairs };
+}
 
-  const index = nextIndex++;
-  const sendPort = BASE_UDP_SEND + index; // puerto donde dispatcher recibe
-  const recvPort = BASE_UDP_RECV + index; // puerto donde dispatcher envía
+setInterval(twin_flush, 1000 / TWIN_SYNC_HZ);
+setInterval(() => {
+  if(twinStats.size === 0) return;
+  let received = 0, sent = 0, coalesced = 0, lagSum = 0, lagMax = 0;
+  for(const st of twinStats.values()){
+    received += st.received; sent += st.sent; coalesced += st.coalesced;
+    lagSum += st.lagSumMs; if(st.lagMaxMs > lagMax) lagMax = st.lagMaxMs;
+  }
+  console.log(`[TWIN] ${twinStats.size} robots con gemelo a ${TWIN_SYNC_HZ} Hz: ${received} estados -> ${sent} envíos ` +
+              `(${coalesced} coalescidos), lag medio ${sent ? (lagSum / sent).toFixed(1) : "-"} ms, máx ${lagMax.toFixed(1)} ms`);
+}, TWIN_REPORT_MS);
 
-  // UDP socket para recibir datos del robot
+app.get("/twins", (req, res) => res.json(twin_report()));
+
+// Socket UDP donde el dispatcher recibe estados de uno o más robots
+// y los reenvía al simulador (y al gemelo si corresponde)
+// sendPort 0: puerto efímero elegido por el sistema. onBound(err, port) se
+// llama una sola vez, al quedar escuchando o si el bind falla (EADDRINUSE...)
+function createForwardSocket(sendPort, label, onBound){
   const udpSocket = dgram.createSocket("udp4");
   udpSocket.on("message", (msg, rinfo) => {
+    const tRecv = now_us();
+    // Paquetes binarios (magic 0xE5): reenviar sin parsear
+    if (msg[0] === BIN_MAGIC) {
+      udpSocket.send(msg, UDP_DISPATCHER_TO_SIM, SIM_HOST, (err) => {
+        if (err) console.log(`Error reenviando a simulador: ${err}`);
+      });
+      return;
+    }
     try {
       const packet = JSON.parse(msg.toString());
       console.log(`[${packet.src}] Recibido en dispatcher UDP ${sendPort}:`, packet);
 
       // --- REENVÍO AL SIMULADOR ---
-      udpSocket.send(msg, UDP_DISPATCHER_TO_SIM, SIM_HOST, (err) => {
+      const out = packet.ht ? hop_stamp(msg, tRecv) : msg;
+      udpSocket.send(out, UDP_DISPATCHER_TO_SIM, SIM_HOST, (err) => {
         if (err) console.log(`Error reenviando a simulador: ${err}`);
       });
 
-      // --- REPLICACIÓN A GEMELO ---
+      // --- REPLICACIÓN A GEMELO (coalescida, ver twin_flush) ---
       const src = packet.src || packet.name;
-      if(src && packet.type === "state"){
-        const twinId = twinPairs[src];
-        if(twinId){
-          const twinEp = udpEndpoints[twinId];
-          if(twinEp){
-            const mirroredPacket = { ...packet, mirrored_from: src, via: "dispatcher_twin" };
-            const twinBuf = Buffer.from(JSON.stringify(mirroredPacket));
-            udpSocket.send(twinBuf, twinEp.port, twinEp.address, (err) => {
-              if (err) console.log(`[TWIN] Error replicando a gemelo: ${err}`);
-              else console.log(`[TWIN] Estado de ${src} replicado a gemelo ${twinId}`);
-            });
-          }
-        }
-      }
+      if(src && packet.type === "state") twin_offer(src, msg);
 
     } catch (e) {
       console.log("Error parseando paquete UDP:", e);
     }
   });
 
+  udpSocket.on("error", (err) => {
+    console.log(`[DISPATCHER] Error en UDP ${sendPort} (${label}): ${err.message}`);
+    try { udpSocket.close(); } catch(e) {}
+    if(onBound){ onBound(err); onBound = null; }
+  });
+
   udpSocket.bind(sendPort, () => {
-    console.log(`[DISPATCHER] Escuchando robot ${socket.id} en UDP ${sendPort}`);
+    sendPort = udpSocket.address().port;
+    console.log(`[DISPATCHER] Escuchando ${label} en UDP ${sendPort}`);
+    if(onBound){ onBound(null, sendPort); onBound = null; }
   });
+  return udpSocket;
+}
+
+// Asignación de puertos al conectar
+// - Conexión normal: un robot, un par de puertos (evento "udp_ports")
+// - Conexión con auth { bulk: true }: una flota registra muchos robots con
+//   "register_bulk" y recibe todos los puertos en una sola respuesta
+io.on("connection", (socket) => {
+  const bulk = !!(socket.handshake.auth && socket.handshake.auth.bulk);
+  console.log(bulk ? "Nueva flota conectada:" : "Nuevo robot conectado:", socket.id);
+
+  const entry = { sockets: [] };
+  robots[socket.id] = entry;
+
+  if(!bulk){
+    const index = nextIndex++;
+    const sendPort = BASE_UDP_SEND + index; // puerto donde dispatcher recibe
+    const recvPort = BASE_UDP_RECV + index; // puerto donde dispatcher envía
 
-  robots[socket.id] = { sendPort, recvPort, udpSocket };
-  socket.emit("udp_ports", { send: sendPort, recv: recvPort });
+    // UDP socket para recibir datos del robot (si el puerto está ocupado se
+    // avisa con { error } en vez de tirar el proceso)
+    const udpSocket = createForwardSocket(sendPort, `robot ${socket.id}`, (err) => {
+      if(err) socket.emit("udp_ports", { error: "bind_failed", message: err.message });
+      else socket.emit("udp_ports", { send: sendPort, recv: recvPort });
+    });
+    Object.assign(entry, { sendPort, recvPort, udpSocket });
+    entry.sockets.push(udpSocket);
+  }
+
+  // { ids: [...] } -> { send, ports: { id: { send, recv } } }
+  // Todos los robots del lote comparten un único puerto de envío (los paquetes
+  // ya llevan src), efímero: no compite con 10010+/11010+ ni con puertos fijos
+  // como el 10011 del router. Los puertos recv se reservan uno por robot.
+  socket.on("register_bulk", (payload, ack) => {
+    const reply_to = (obj) => { if(typeof ack === "function") ack(obj); else socket.emit("udp_ports_bulk", obj); };
+    const ids = Array.isArray(payload && payload.ids) ? payload.ids : [];
+    if(ids.length === 0){
+      reply_to({ error: "missing_ids", message: "Se requiere 'ids' (lista de robot_id)." });
+      return;
+    }
+    const first = nextIndex;
+    if(BASE_UDP_RECV + first + ids.length > 65536){
+      reply_to({ error: "no_ports", message: `Sin puertos recv para ${ids.length} robots (próximo: ${BASE_UDP_RECV + first}).` });
+      return;
+    }
+    nextIndex += ids.length;
+    const udpSocket = createForwardSocket(0, `flota ${socket.id} (${ids.length} robots)`, (err, sendPort) => {
+      if(err){
+        reply_to({ error: "bind_failed", message: err.message });
+        return;
+      }
+      const ports = {};
+      ids.forEach((id, i) => { ports[id] = { send: sendPort, recv: BASE_UDP_RECV + first + i }; });
+      console.log(`[DISPATCHER] Registro en lote: ${ids.length} robots -> UDP ${sendPort}`);
+      reply_to({ send: sendPort, ports });
+    });
+    entry.sockets.push(udpSocket);
+  });
 
   socket.on("disconnect", () => {
-    console.log(`[DISPATCHER] Robot desconectado: ${socket.id}, puertos liberados`);
-    udpSocket.close();
+    console.log(`[DISPATCHER] Desconectado: ${socket.id}, puertos liberados`);
+    entry.sockets.forEach(s => { try { s.close(); } catch(e) {} });   // los que fallaron ya están cerrados
     delete robots[socket.id];
   });
 });
@@ -99,6 +259,33 @@ function sendUdpJson(address, port, obj){
   }
 }
 
+function topicList(packet){
+  let topics = packet.topics;
+  if(topics === undefined || topics === null) topics = packet.topic ? [packet.topic] : [];
+  else if(typeof topics === "string") topics = [topics];
+  else if(!Array.isArray(topics)) topics = [];
+  return topics.filter(t => typeof t === "string" && t.length > 0);
+}
+
+// Una sola serialización y una copia por dirección con suscriptores del tópico
+function fanoutTopic(topic, obj){
+  const members = topicSubs.get(topic);
+  if(!members || members.size === 0) return 0;
+  const buf = Buffer.from(JSON.stringify(obj));
+  const seen = new Set();
+  for(const robotId of members){
+    const ep = udpEndpoints[robotId];
+    if(!ep) continue;
+    const key = `${ep.address}:${ep.port}`;
+    if(seen.has(key)) continue;
+    seen.add(key);
+    udpMsgSocket.send(buf, ep.port, ep.address, (err)=>{
+      if(err) console.log(`[MSG] Error enviando a ${key} ->`, err.message);
+    });
+  }
+  return seen.size;
+}
+
 udpMsgSocket.on("message", (msg, rinfo) => {
   let packet;
   try { packet = JSON.parse(msg.toString()); }
@@ -124,7 +311,7 @@ udpMsgSocket.on("message", (msg, rinfo) => {
   if(packet.type === "twin_register"){
     const twinId = packet.twin || packet.twin_id;
     if(!twinId){
-      sendUdpJson(rinfo.address, rinfo.port, { type: "error", code: "missing_twin_id", message: "Se requiere 'twin' o 'twin_id'." });
+      sendUdpJson(rinfo.address, rinfo.port, { type: "error", for: src, code: "missing_twin_id", message: "Se requiere 'twin' o 'twin_id'." });
       return;
     }
     // Registrar par gemelo bidireccional
@@ -140,35 +327,76 @@ udpMsgSocket.on("message", (msg, rinfo) => {
     if(twin){
       delete twinPairs[twin];
       delete twinPairs[src];
+      twinLatest.delete(src); twinLatest.delete(twin);
+      twinStats.delete(src); twinStats.delete(twin);
       sendUdpJson(rinfo.address, rinfo.port, { type: "twin_unregister_ack", src: "dispatcher", robot: src });
       console.log(`[TWIN] Par gemelo eliminado: ${src} <-> ${twin}`);
     }
     return;
   }
 
-  if(packet.type === "state"){
-    // Si este robot tiene gemelo, reenviar el estado al gemelo
-    const twinId = twinPairs[src];
-    if(twinId){
-      const twinEp = udpEndpoints[twinId];
-      if(twinEp){
-        const mirroredPacket = { ...packet, mirrored_from: src, via: "dispatcher_twin" };
-        sendUdpJson(twinEp.address, twinEp.port, mirroredPacket);
-        console.log(`[TWIN] Estado de ${src} replicado a gemelo ${twinId}`);
+  if(packet.type === "subscribe" || packet.type === "unsubscribe"){
+    const topics = topicList(packet);
+    let mine = robotTopics.get(src);
+    if(!mine) robotTopics.set(src, mine = new Set());
+    if(packet.type === "subscribe"){
+      if(topics.length === 0){
+        sendUdpJson(rinfo.address, rinfo.port, { type: "error", src: "dispatcher", for: src, code: "missing_topic", message: "Se requiere 'topic' o 'topics'." });
+        return;
+      }
+      for(const t of topics){
+        let members = topicSubs.get(t);
+        if(!members) topicSubs.set(t, members = new Set());
+        members.add(src);
+        mine.add(t);
       }
+    } else {
+      for(const t of (topics.length ? topics : [...mine])){
+        const members = topicSubs.get(t);
+        if(members){
+          members.delete(src);
+          if(members.size === 0) topicSubs.delete(t);
+        }
+        mine.delete(t);
+      }
+    }
+    sendUdpJson(rinfo.address, rinfo.port, { type: "sub_ack", src: "dispatcher", for: src, topics: [...mine].sort() });
+    if(mine.size === 0) robotTopics.delete(src);
+    return;
+  }
+
+  if(packet.type === "publish"){
+    if(!packet.topic || typeof packet.topic !== "string"){
+      sendUdpJson(rinfo.address, rinfo.port, { type: "error", src: "dispatcher", for: src, code: "missing_topic", message: "Se requiere 'topic' (string) en el paquete." });
+      return;
     }
+    fanoutTopic(packet.topic, { ...packet, via: "dispatcher" });
+    return;
+  }
+
+  if(packet.type === "state"){
+    // Si este robot tiene gemelo, el motor de sincronización reenvía el último estado
+    twin_offer(src, msg);
     return;
   }
 
   if(packet.type === "msg" || packet.type === "reply"){
     const to = packet.to || packet.dest || packet.target;
     if(!to){
-      sendUdpJson(rinfo.address, rinfo.port, { type: "error", src: "dispatcher", code: "missing_to", message: "Se requiere 'to' en el paquete." });
+      sendUdpJson(rinfo.address, rinfo.port, { type: "error", src: "dispatcher", for: src, code: "missing_to", message: "Se requiere 'to' en el paquete." });
+      return;
+    }
+    // "to": "@grupo" -> a todos los suscriptores del grupo
+    if(typeof to === "string" && to.startsWith("@")){
+      const mid = packet.mid || packet.id || `${Date.now()}_${Math.random().toString(36).slice(2,8)}`;
+      if(!fanoutTopic(to.slice(1), { ...packet, mid, via: "dispatcher" })){
+        sendUdpJson(rinfo.address, rinfo.port, { type: "error", src: "dispatcher", for: src, code: "unknown_group", message: `Grupo '${to.slice(1)}' sin suscriptores.` });
+      }
       return;
     }
     const dest = udpEndpoints[to];
     if(!dest){
-      sendUdpJson(rinfo.address, rinfo.port, { type: "error", src: "dispatcher", code: "unknown_target", message: `Destino '${to}' no registrado.` });
+      sendUdpJson(rinfo.address, rinfo.port, { type: "error", src: "dispatcher", for: src, code: "unknown_target", message: `Destino '${to}' no registrado.` });
       return;
     }
     // Reenviar tal cual, agregando metadata mínima
@@ -181,7 +409,7 @@ udpMsgSocket.on("message", (msg, rinfo) => {
     if(twinId){
       const twinEp = udpEndpoints[twinId];
       if(twinEp){
-        const mirroredMsg = { ...out, twin_copy: true, original_dest: to };
+        const mirroredMsg = { ...out, twin_copy: true, original_dest: to, for: twinId };
         sendUdpJson(twinEp.address, twinEp.port, mirroredMsg);
         console.log(`[TWIN] Mensaje a ${to} también enviado a gemelo ${twinId}`);
       }
@@ -190,13 +418,21 @@ udpMsgSocket.on("message", (msg, rinfo) => {
   }
 
   if(packet.type === "broadcast"){
+    // Una copia por dirección: los robots que comparten socket (ester_grid.transport)
+    // la reparten localmente a todos sus endpoints
     const out = { ...packet, via: "dispatcher" };
-    Object.values(udpEndpoints).forEach(ep => sendUdpJson(ep.address, ep.port, out));
+    const seen = new Set();
+    for(const ep of Object.values(udpEndpoints)){
+      const key = `${ep.address}:${ep.port}`;
+      if(seen.has(key)) continue;
+      seen.add(key);
+      sendUdpJson(ep.address, ep.port, out);
+    }
     return;
   }
 
   // Desconocido: notificar
-  sendUdpJson(rinfo.address, rinfo.port, { type: "error", src: "dispatcher", code: "unknown_type", message: `Tipo '${packet.type}' no soportado.` });
+  sendUdpJson(rinfo.address, rinfo.port, { type: "error", src: "dispatcher", for: src, code: "unknown_type", message: `Tipo '${packet.type}' no soportado.` });
 });
 
 udpMsgSocket.on("listening", ()=>{
@@ -208,6 +444,11 @@ udpMsgSocket.on("error", (err)=>{
   console.log("[MSG] Error socket UDP mensajes:", err.message);
 });
 
-udpMsgSocket.bind(UDP_MSG_PORT, () => {
-  // bound
-});
+// ESTER_MSG_ROUTER=python: el 10011 lo atiende ester_grid/router.py (recvmmsg/sendmmsg)
+if(process.env.ESTER_MSG_ROUTER === "python"){
+  console.log(`[MSG] Router de mensajes delegado a python -m ester_grid.router (puerto ${UDP_MSG_PORT})`);
+} else {
+  udpMsgSocket.bind(UDP_MSG_PORT, () => {
+    // bound
+  });
+}
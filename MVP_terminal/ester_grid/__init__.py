@@ -0,0 +1,10 @@
+# ========================================================
+# ESTER-Grid - Paquete cliente Python para robots
+# ========================================================
+
+from .binary import StateBatch
+from .client import RobotClient, StatePacket, shared_socket
+from .fleet import Fleet, FleetRobot
+from .transport import mesh_endpoint
+
+__all__ = ["Fleet", "FleetRobot", "RobotClient", "StateBatch", "StatePacket", "mesh_endpoint", "shared_socket"]
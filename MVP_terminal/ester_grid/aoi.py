@@ -0,0 +1,163 @@
+# ========================================================
+# ESTER-Grid - Área de interés: vecinos cercanos desde el simulador
+# ========================================================
+#
+# robots_30_udp.coreografia lee el dict de estado de los otros robots (solo
+# anda porque comparten proceso) y en ejemplo10 el líder le manda su
+# posición a mano al seguidor. Con el área de interés cada robot declara un
+# radio y sim_server.js (que ya tiene todas las posiciones en robotGrid) le
+# devuelve un flujo compacto y limitado en frecuencia de los robots cercanos:
+#
+#   → 10009  {"type":"aoi","src":"R7","radius":150,"hz":10,"max":16}
+#   ←        {"type":"neighbors","for":"R7","t":<ms>,"n":[["R8",412,300,90],...]}
+#
+# La suscripción vence a los 5 s: NeighborClient la renueva cada RENEW s
+# desde un hilo propio. Un solo socket por proceso (neighbor_client()) sirve
+# a todos sus robots; las respuestas se reparten por "for". Un ESP32 solo
+# necesita mandar el paquete "aoi" cada pocos segundos y leer "neighbors".
+#
+#   from ester_grid.aoi import neighbor_client
+#   aoi = neighbor_client()
+#   aoi.subscribe("R7", radius=150, hz=10)
+#   for rid, x, y, rot in aoi.neighbors("R7"):
+#       ...
+
+import json
+import socket
+import threading
+import time
+
+from .config import SIM_IP, SIM_PORT
+
+RENEW = 2.0             # el simulador descarta suscripciones sin renovar en 5 s
+DEFAULT_HZ = 10
+DEFAULT_MAX = 16
+
+
+class NeighborClient:
+    """Suscripciones de área de interés de los robots del proceso (un socket, un hilo)."""
+
+    def __init__(self, sim=(SIM_IP, SIM_PORT)):
+        self.sim = sim
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("0.0.0.0", 0))
+        self.sock.settimeout(0.5)
+        self.subs = {}          # robot -> paquete "aoi" (se reenvía para renovar)
+        self.views = {}         # robot -> (t_recibido, [[id, x, y, rot], ...])
+        self.on_update = None   # fn(robot, vecinos) en el hilo receptor
+        self.stats = {"rx": 0, "bytes": 0, "neighbors": 0}
+        self._lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="aoi", daemon=True)
+        self._thread.start()
+
+    def _send(self, pkt):
+        try:
+            self.sock.sendto(json.dumps(pkt, separators=(",", ":")).encode("utf-8"), self.sim)
+        except OSError as e:
+            print(f"[AOI] Error enviando suscripción: {e}")
+
+    def subscribe(self, robot_id, radius, hz=DEFAULT_HZ, max_neighbors=DEFAULT_MAX):
+        """Pide los vecinos a menos de `radius` px de robot_id, hasta `hz` veces por segundo."""
+        pkt = {"type": "aoi", "src": robot_id, "radius": radius, "hz": hz, "max": max_neighbors}
+        with self._lock:
+            self.subs[robot_id] = pkt
+        self._send(pkt)
+
+    def unsubscribe(self, robot_id):
+        with self._lock:
+            self.subs.pop(robot_id, None)
+            self.views.pop(robot_id, None)
+        self._send({"type": "aoi", "src": robot_id, "radius": 0})
+
+    def neighbors(self, robot_id):
+        """Último [[id, x, y, rot], ...] recibido para robot_id (más cercano primero)."""
+        view = self.views.get(robot_id)
+        return view[1] if view else []
+
+    def neighbor(self, robot_id, other):
+        """(x, y, rot) de `other` si está en el área de robot_id, si no None."""
+        for rid, x, y, rot in self.neighbors(robot_id):
+            if rid == other:
+                return x, y, rot
+        return None
+
+    def age(self, robot_id):
+        """Segundos desde la última actualización (None si nunca llegó)."""
+        view = self.views.get(robot_id)
+        return time.monotonic() - view[0] if view else None
+
+    def _loop(self):
+        next_renew = time.monotonic() + RENEW
+        while self._running:
+            try:
+                data, _ = self.sock.recvfrom(65535)
+            except socket.timeout:
+                data = None
+            except OSError:
+                break
+            now = time.monotonic()
+            if data is not None:
+                try:
+                    pkt = json.loads(data)
+                except ValueError:
+                    pkt = None
+                if isinstance(pkt, dict) and pkt.get("type") == "neighbors":
+                    rid = pkt.get("for")
+                    if rid in self.subs:
+                        near = pkt.get("n") or []
+                        self.views[rid] = (now, near)
+                        self.stats["rx"] += 1
+                        self.stats["bytes"] += len(data)
+                        self.stats["neighbors"] += len(near)
+                        if self.on_update is not None:
+                            self.on_update(rid, near)
+            if now >= next_renew:
+                with self._lock:
+                    pending = list(self.subs.values())
+                for pkt in pending:
+                    self._send(pkt)
+                next_renew = now + RENEW
+
+    def close(self):
+        self._running = False
+        for rid in list(self.subs):
+            self.unsubscribe(rid)
+        self._thread.join(timeout=1)
+        self.sock.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def neighbor_client():
+    """NeighborClient del proceso (se crea la primera vez)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = NeighborClient()
+    return _client
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.aoi", description="Muestra los vecinos de un robot")
+    ap.add_argument("robot")
+    ap.add_argument("--radius", type=float, default=150)
+    ap.add_argument("--hz", type=float, default=2)
+    args = ap.parse_args()
+
+    aoi = NeighborClient()
+    aoi.on_update = lambda rid, near: print(f"[AOI] {rid}: " + (", ".join(
+        f"{n[0]}({n[1]},{n[2]})" for n in near) or "sin vecinos"))
+    aoi.subscribe(args.robot, args.radius, args.hz)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        aoi.close()
@@ -0,0 +1,350 @@
+# ========================================================
+# ESTER-Grid - Benchmark de punta a punta robot → dispatcher → simulador
+# ========================================================
+#
+# Mide el camino de un paquete de estado:
+#   robot_to_dispatcher   send_state → puerto BASE_UDP_SEND(+i) del dispatcher
+#   dispatcher_to_sim     reenvío a UDP_DISPATCHER_TO_SIM
+#   sim_to_broadcast      espera hasta el próximo state_update (tick de 50 ms)
+#   end_to_end            los tres juntos
+# con p50/p99/p999/max en µs, paquetes/s logrados y pérdidas por tramo.
+#
+# Modo "standin" (por defecto): dispatcher y simulador de reemplazo en
+# procesos aparte que hacen lo mismo que los de Node (JSON.parse, reenvío,
+# tick de 50 ms que serializa el estado) y anotan cuándo vio cada paquete.
+# El reloj es time.monotonic_ns(), común a todos los procesos del equipo.
+#
+# Modo "real": usa dispatcher.js y sim_server.js de verdad (--spawn los
+# levanta con node). Solo se puede medir end_to_end: los robots se registran
+# con register_fleet y la latencia se toma al ver el objetivo (tx) en el
+# state_update. Requiere python-socketio y node_modules instalados.
+#
+#   python -m ester_grid.bench --robots 1,10,100,1000,5000 --rate 20 --duration 5 --out bench.json
+#   python -m ester_grid.bench --mode real --spawn --robots 30
+
+import array
+import json
+import multiprocessing as mp
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import time
+
+from .config import DISP_IP, SIM_URL
+
+TICK = 0.05
+STANDIN_SIM_PORT = 20009       # puertos propios para no chocar con un sim/dispatcher corriendo
+STANDIN_DISP_BASE = 20010
+DRAIN_S = 0.3
+SCHEMA = "ester_grid.bench/1"
+
+
+# ----------------------------
+# Estadística
+# ----------------------------
+def summarize(samples_ns):
+    """p50/p99/p999/max en µs de una lista de latencias en ns."""
+    if not samples_ns:
+        return {"count": 0, "p50_us": None, "p99_us": None, "p999_us": None, "max_us": None}
+    vals = sorted(samples_ns)
+    n = len(vals)
+
+    def pct(q):
+        return round(vals[min(n - 1, int(q * (n - 1) + 0.5))] / 1000, 1)
+
+    return {"count": n, "p50_us": pct(0.50), "p99_us": pct(0.99), "p999_us": pct(0.999),
+            "max_us": round(vals[-1] / 1000, 1)}
+
+
+def _packet(rid, seq, t_ns, x, y):
+    return ('{"type":"state","src":"%s","name":"%s","data":{"pos":[%.2f,0,%.2f],"rot":0},"bench":[%d,%d]}'
+            % (rid, rid, x, y, seq, t_ns)).encode()
+
+
+def _udp(port=0, host="127.0.0.1"):
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 23)
+    s.bind((host, port))
+    return s
+
+
+# ----------------------------
+# Stand-ins (procesos)
+# ----------------------------
+def _standin_dispatcher(ports, sim_addr, ready, stop, conn):
+    """Como createForwardSocket: JSON.parse + reenvío al simulador, en uno o muchos puertos."""
+    sel = selectors.DefaultSelector()
+    socks = [_udp(p) for p in ports]
+    for s in socks:
+        s.setblocking(False)
+        sel.register(s, selectors.EVENT_READ)
+    out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    seen = array.array("q")  # seq, t_ns
+    ready.set()
+    while not stop.is_set():
+        for key, _ in sel.select(0.05):
+            s = key.fileobj
+            while True:
+                try:
+                    msg = s.recv(65535)
+                except BlockingIOError:
+                    break
+                t = time.monotonic_ns()
+                packet = json.loads(msg)
+                out.sendto(msg, sim_addr)
+                seen.append(packet["bench"][0])
+                seen.append(t)
+    for s in socks:
+        s.close()
+    conn.send_bytes(seen.tobytes())
+
+
+def _standin_simulator(port, tick, ready, stop, conn):
+    """Como sim_server.js: JSON.parse por paquete y cada `tick` serializa y emite el estado."""
+    s = _udp(port)
+    s.settimeout(0.005)
+    robots = {}
+    pending = []
+    seen = array.array("q")  # seq, t_recv, t_broadcast
+    ready.set()
+    next_tick = time.monotonic() + tick
+    while not stop.is_set():
+        try:
+            msg = s.recv(65535)
+            t = time.monotonic_ns()
+            packet = json.loads(msg)
+            pos = packet["data"]["pos"]
+            robots[packet["src"]] = {"id": packet["src"], "tx": pos[0], "ty": pos[2], "rot": packet["data"]["rot"]}
+            pending.append((packet["bench"][0], t))
+        except socket.timeout:
+            pass
+        if time.monotonic() >= next_tick:
+            json.dumps({"robots": list(robots.values())})  # costo de armar state_update
+            t_b = time.monotonic_ns()
+            for seq, t in pending:
+                seen.extend((seq, t, t_b))
+            pending.clear()
+            next_tick += tick
+    s.close()
+    conn.send_bytes(seen.tobytes())
+
+
+def _sender(n, rate, duration, ports, start_at, conn):
+    """n robots a `rate` Hz cada uno; envía en ráfaga por tick como un Fleet."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent = array.array("q")  # t_ns por seq
+    ids = [f"BENCH{i + 1}" for i in range(n)]
+    addrs = [(DISP_IP if DISP_IP != "0.0.0.0" else "127.0.0.1", ports[i % len(ports)]) for i in range(n)]
+    period = 1.0 / rate
+    seq = 0
+    while time.monotonic() < start_at:
+        time.sleep(0.001)
+    deadline = start_at
+    end = start_at + duration
+    k = 0
+    while deadline < end:
+        for i in range(n):
+            t = time.monotonic_ns()
+            sock.sendto(_packet(ids[i], seq, t, 50 + (k * 7 + i) % 800, 50 + i % 500), addrs[i])
+            sent.append(t)
+            seq += 1
+        k += 1
+        deadline += period
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    conn.send_bytes(sent.tobytes())
+
+
+def _recv_array(conn):
+    a = array.array("q")
+    a.frombytes(conn.recv_bytes())
+    return a
+
+
+def run_standin(n, rate=20.0, duration=5.0, per_robot_ports=False, tick=TICK):
+    """Un caso contra los stand-ins. Devuelve el dict de resultados."""
+    ctx = mp.get_context("spawn" if sys.platform == "win32" else "fork")
+    ports = [STANDIN_DISP_BASE + i for i in range(n)] if per_robot_ports else [STANDIN_DISP_BASE]
+    stop = ctx.Event()
+    sim_ready, disp_ready = ctx.Event(), ctx.Event()
+    sim_rx, sim_tx = ctx.Pipe(duplex=False)
+    disp_rx, disp_tx = ctx.Pipe(duplex=False)
+    snd_rx, snd_tx = ctx.Pipe(duplex=False)
+    sim = ctx.Process(target=_standin_simulator, args=(STANDIN_SIM_PORT, tick, sim_ready, stop, sim_tx))
+    disp = ctx.Process(target=_standin_dispatcher,
+                       args=(ports, ("127.0.0.1", STANDIN_SIM_PORT), disp_ready, stop, disp_tx))
+    sim.start()
+    disp.start()
+    sim_ready.wait(10)
+    disp_ready.wait(10)
+    start_at = time.monotonic() + 0.2
+    snd = ctx.Process(target=_sender, args=(n, rate, duration, ports, start_at, snd_tx))
+    snd.start()
+    sent = _recv_array(snd_rx)
+    snd.join()
+    time.sleep(DRAIN_S + tick)
+    stop.set()
+    d = _recv_array(disp_rx)
+    s = _recv_array(sim_rx)
+    disp.join()
+    sim.join()
+
+    t_disp = {d[i]: d[i + 1] for i in range(0, len(d), 2)}
+    hop1 = [t1 - sent[seq] for seq, t1 in t_disp.items()]
+    hop2, hop3, e2e = [], [], []
+    for i in range(0, len(s), 3):
+        seq, t_recv, t_b = s[i], s[i + 1], s[i + 2]
+        t1 = t_disp.get(seq)
+        if t1 is not None:
+            hop2.append(t_recv - t1)
+        hop3.append(t_b - t_recv)
+        e2e.append(t_b - sent[seq])
+    n_sent, n_disp, n_sim = len(sent), len(t_disp), len(s) // 3
+    return {
+        "mode": "standin",
+        "robots": n,
+        "rate_hz": rate,
+        "duration_s": duration,
+        "ports": "per_robot" if per_robot_ports else "shared",
+        "sent": n_sent,
+        "requested_pps": n * rate,
+        "sent_pps": round(n_sent / duration, 1),
+        "received_pps": round(n_sim / duration, 1),
+        "drops": {
+            "robot_to_dispatcher": n_sent - n_disp,
+            "dispatcher_to_sim": n_disp - n_sim,
+            "drop_rate": round(1 - n_sim / n_sent, 6) if n_sent else 0.0,
+        },
+        "latency": {
+            "robot_to_dispatcher": summarize(hop1),
+            "dispatcher_to_sim": summarize(hop2),
+            "sim_to_broadcast": summarize(hop3),
+            "end_to_end": summarize(e2e),
+        },
+    }
+
+
+# ----------------------------
+# Procesos reales (node)
+# ----------------------------
+def _spawn_node(root):
+    env = dict(os.environ)
+    procs = []
+    for cwd, script in (("dispatcher", "dispatcher.js"), ("simulator", "sim_server.js")):
+        procs.append(subprocess.Popen(["node", script], cwd=os.path.join(root, cwd), env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    time.sleep(1.5)
+    return procs
+
+
+def run_real(n, rate=20.0, duration=5.0, spawn=False):
+    """Un caso contra dispatcher.js + sim_server.js. Solo end_to_end (ver cabecera)."""
+    try:
+        import socketio
+    except ImportError as e:
+        raise ImportError("El modo real requiere python-socketio: pip install \"python-socketio[client]\"") from e
+    from .bootstrap import register_fleet
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    procs = _spawn_node(root) if spawn else []
+    ids = [f"BENCH{i + 1}" for i in range(n)]
+    pending = {rid: {} for rid in ids}  # rid -> {tx: t_send_ns}
+    e2e = []
+    observed = 0
+    sio = socketio.Client()
+    reg = None
+
+    @sio.on("state_update")
+    def on_state(data):
+        nonlocal observed
+        t = time.monotonic_ns()
+        for rb in data.get("robots", ()):
+            sends = pending.get(rb.get("id"))
+            if sends:
+                t0 = sends.pop(round(rb.get("tx", -1), 2), None)
+                if t0 is not None:
+                    e2e.append(t - t0)
+                    observed += 1
+
+    try:
+        sio.connect(SIM_URL)
+        reg = register_fleet(ids)
+        addr = (DISP_IP, reg.send_port)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        period = 1.0 / rate
+        sent = 0
+        start = deadline = time.monotonic()
+        k = 0
+        while deadline < start + duration:
+            for i, rid in enumerate(ids):
+                x = round(50 + (k * 7 + i) % 800 + 0.25, 2)
+                t = time.monotonic_ns()
+                pending[rid][x] = t
+                sock.sendto(_packet(rid, sent, t, x, 50 + i % 500), addr)
+                sent += 1
+            k += 1
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        time.sleep(DRAIN_S + TICK * 2)
+    finally:
+        if reg is not None:
+            reg.close()
+        sio.disconnect()
+        for p in procs:
+            p.terminate()
+    return {
+        "mode": "real",
+        "robots": n,
+        "rate_hz": rate,
+        "duration_s": duration,
+        "sent": sent,
+        "requested_pps": n * rate,
+        "sent_pps": round(sent / duration, 1),
+        # el simulador se queda con el último objetivo por tick: lo no observado se coalesció o se perdió
+        "observed_in_broadcast": observed,
+        "latency": {"end_to_end": summarize(e2e)},
+    }
+
+
+def _machine():
+    import platform
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.bench",
+                                 description="Latencia y throughput robot → dispatcher → simulador")
+    ap.add_argument("--mode", choices=("standin", "real"), default="standin")
+    ap.add_argument("--robots", default="1,10,100,1000", help="lista de tamaños de flota, ej: 1,10,100,1000,5000")
+    ap.add_argument("--rate", type=float, default=20.0, help="Hz por robot (robots_30_udp: 20)")
+    ap.add_argument("--duration", type=float, default=5.0)
+    ap.add_argument("--per-robot-ports", action="store_true", help="un puerto de dispatcher por robot (conexión clásica)")
+    ap.add_argument("--spawn", action="store_true", help="modo real: levantar dispatcher.js y sim_server.js")
+    ap.add_argument("--out", help="archivo JSON de resultados (si no, a stdout)")
+    args = ap.parse_args()
+
+    results = []
+    for n in (int(v) for v in args.robots.split(",")):
+        if args.mode == "standin":
+            res = run_standin(n, args.rate, args.duration, args.per_robot_ports)
+        else:
+            res = run_real(n, args.rate, args.duration, args.spawn)
+        e2e = res["latency"]["end_to_end"]
+        print(f"[BENCH] {n:5d} robots: {res['sent_pps']:9.0f} paq/s enviados, e2e p50={e2e['p50_us']} µs "
+              f"p99={e2e['p99_us']} µs p999={e2e['p999_us']} µs", file=sys.stderr)
+        results.append(res)
+
+    doc = {"schema": SCHEMA, "ts": int(time.time() * 1000), "machine": _machine(), "results": results}
+    text = json.dumps(doc, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,300 @@
+# ========================================================
+# ESTER-Grid - Formato binario compacto para paquetes 'state'
+# Convive con JSON: el primer byte decide (0xE5 binario, '{' JSON)
+# ========================================================
+#
+# Layout (little-endian):
+#
+#   off  tam  campo
+#   0    1    magic 0xE5
+#   1    1    kind (bits 0-3) | flags (bits 4-7)
+#   2    2    rid (u16, id de robot internado)
+#
+#   KIND_STATE / KIND_TELEPORT
+#   4    3    color r,g,b (u8)
+#   7    1    reservado (0)
+#   8    12   x, y, rot (f32)                       → 20 bytes
+#        6    x, y (i16, 1/16 px) + rot (u16, 360/65536°)  con FLAG_FIXED → 14 bytes
+#
+#   KIND_INTERN (asocia rid → nombre; se repite cada tanto)
+#   4    1    largo del nombre
+#   5    n    nombre utf-8
+#
+#   KIND_BATCH (varios robots en un solo datagrama; ver StateBatch)
+#   2    1    n_intern
+#   3    1    n_state
+#        ...  n_intern × (rid u16, largo u8, nombre)
+#        ...  n_state × (rid u16, r, g, b, eflags u8, x, y, rot)   18 bytes f32 / 12 fijo
+#   eflags bit0 = teleport
+#
+# El rid sólo es válido para la dirección (ip:puerto) que lo anunció, así
+# que cada proceso numera sus robots desde 1 sin coordinar con nadie.
+
+import itertools
+import struct
+import threading
+
+from .transport import send_many
+
+MAGIC = 0xE5
+
+KIND_STATE = 1
+KIND_TELEPORT = 2
+KIND_INTERN = 3
+KIND_BATCH = 4
+
+FLAG_FIXED = 0x10
+ENTRY_TELEPORT = 0x01
+
+MAX_DATAGRAM = 1400  # bytes por frame batch (debajo del MTU típico de 1500)
+
+FIXED_POS_SCALE = 16.0            # 1/16 px → rango ±2047 px
+FIXED_ROT_SCALE = 65536.0 / 360.0
+
+INTERN_EVERY = 50  # reanunciar el nombre cada N paquetes (por si el simulador reinicia)
+
+_HEAD = struct.Struct("<BBH")
+_STATE_F32 = struct.Struct("<BBHBBBBfff")
+_STATE_FIXED = struct.Struct("<BBHBBBBhhH")
+_BATCH_HEAD = struct.Struct("<BBBB")
+_ENTRY_F32 = struct.Struct("<HBBBBfff")
+_ENTRY_FIXED = struct.Struct("<HBBBBhhH")
+
+_rid_counter = itertools.count(1)
+_rid_lock = threading.Lock()
+_rid_by_name = {}
+
+
+def intern_id(robot_id):
+    """Número corto (u16) para robot_id, único dentro del proceso."""
+    rid = _rid_by_name.get(robot_id)
+    if rid is None:
+        with _rid_lock:
+            rid = _rid_by_name.get(robot_id)
+            if rid is None:
+                rid = next(_rid_counter) & 0xFFFF
+                _rid_by_name[robot_id] = rid
+    return rid
+
+
+def is_binary(buf):
+    return len(buf) > 0 and buf[0] == MAGIC
+
+
+def _clamp_byte(v):
+    return max(0, min(255, int(v)))
+
+
+def _fixed_pos(v):
+    return max(-32768, min(32767, int(round(v * FIXED_POS_SCALE))))
+
+
+def _fixed_rot(rot):
+    return int(round((rot % 360) * FIXED_ROT_SCALE)) & 0xFFFF
+
+
+def encode_intern(rid, robot_id):
+    name = robot_id.encode("utf-8")[:255]
+    return _HEAD.pack(MAGIC, KIND_INTERN, rid) + bytes((len(name),)) + name
+
+
+class BinaryStatePacket:
+    """
+    Equivalente binario de client.StatePacket: buffer fijo que se reescribe
+    con struct.pack_into en cada update().
+    """
+
+    def __init__(self, robot_id, teleport=False, fixed=False):
+        self.robot_id = robot_id
+        self.rid = intern_id(robot_id)
+        self.kind = (KIND_TELEPORT if teleport else KIND_STATE) | (FLAG_FIXED if fixed else 0)
+        self.fixed = fixed
+        self._fmt = _STATE_FIXED if fixed else _STATE_F32
+        self.buf = bytearray(self._fmt.size)
+        self.intern = encode_intern(self.rid, robot_id)
+        self._sent = 0
+        self._color = (200, 200, 200)
+
+    def needs_intern(self):
+        """True cuando corresponde (re)anunciar el nombre antes del próximo envío."""
+        due = self._sent % INTERN_EVERY == 0
+        self._sent += 1
+        return due
+
+    def update(self, x, y, rot, color=None):
+        if color is not None:
+            self._color = (_clamp_byte(color[0]), _clamp_byte(color[1]), _clamp_byte(color[2]))
+        r, g, b = self._color
+        if self.fixed:
+            self._fmt.pack_into(self.buf, 0, MAGIC, self.kind, self.rid, r, g, b, 0,
+                                _fixed_pos(x), _fixed_pos(y), _fixed_rot(rot))
+        else:
+            self._fmt.pack_into(self.buf, 0, MAGIC, self.kind, self.rid, r, g, b, 0,
+                                float(x), float(y), float(rot))
+        return self.buf
+
+
+class StateBatch:
+    """
+    Junta los estados de muchos robots y los envía en pocos datagramas
+    (KIND_BATCH), partiendo en frames de hasta `mtu` bytes.
+
+    Pensado para un proceso de flota: cada robot llama add() durante el tick
+    y el reloj llama flush() una sola vez. Los robots que no cambiaron desde
+    el último envío se omiten (salvo teleport).
+    """
+
+    def __init__(self, fixed=False, mtu=MAX_DATAGRAM):
+        self.fixed = fixed
+        self.mtu = mtu
+        self._entry = _ENTRY_FIXED if fixed else _ENTRY_F32
+        self._pending = {}     # robot_id -> (x, y, rot, color, teleport)
+        self._last_sent = {}   # robot_id -> (x, y, rot, color)
+        self._frames_since_intern = {}
+        self._lock = threading.Lock()
+
+    def add(self, robot_id, x, y, rot, color, teleport=False):
+        with self._lock:
+            prev = self._pending.get(robot_id)
+            # un teleport pendiente no se pisa con un state común del mismo tick
+            self._pending[robot_id] = (x, y, rot, color, teleport or (prev is not None and prev[4]))
+
+    def add_robot(self, robot, teleport=False):
+        """Atajo para objetos con robot_id / pos / rot / color (RobotClient y ejemplos)."""
+        self.add(robot.robot_id, robot.pos[0], robot.pos[1], robot.rot, robot.color, teleport)
+
+    def _take_changed(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        changed = []
+        for robot_id, (x, y, rot, color, teleport) in pending.items():
+            snap = (x, y, rot, tuple(color[:3]))
+            if teleport or self._last_sent.get(robot_id) != snap:
+                self._last_sent[robot_id] = snap
+                changed.append((robot_id, x, y, rot, color, teleport))
+        return changed
+
+    def frames(self):
+        """Frames binarios listos para enviar con los cambios acumulados."""
+        entry = self._entry
+        kind = KIND_BATCH | (FLAG_FIXED if self.fixed else 0)
+        frames = []
+        interns, states, size = [], [], _BATCH_HEAD.size
+
+        def close():
+            nonlocal interns, states, size
+            if states or interns:
+                out = bytearray(_BATCH_HEAD.pack(MAGIC, kind, len(interns), len(states)))
+                for chunk in interns:
+                    out += chunk
+                for chunk in states:
+                    out += chunk
+                frames.append(out)
+            interns, states, size = [], [], _BATCH_HEAD.size
+
+        for robot_id, x, y, rot, color, teleport in self._take_changed():
+            rid = intern_id(robot_id)
+            since = self._frames_since_intern.get(robot_id, INTERN_EVERY)
+            intern = None
+            if since >= INTERN_EVERY:
+                name = robot_id.encode("utf-8")[:255]
+                intern = struct.pack("<HB", rid, len(name)) + name
+            need = entry.size + (len(intern) if intern else 0)
+            if size + need > self.mtu or len(states) == 255 or len(interns) == 255:
+                close()
+            r, g, b = _clamp_byte(color[0]), _clamp_byte(color[1]), _clamp_byte(color[2])
+            eflags = ENTRY_TELEPORT if teleport else 0
+            if self.fixed:
+                states.append(entry.pack(rid, r, g, b, eflags, _fixed_pos(x), _fixed_pos(y), _fixed_rot(rot)))
+            else:
+                states.append(entry.pack(rid, r, g, b, eflags, float(x), float(y), float(rot)))
+            if intern:
+                interns.append(intern)
+                self._frames_since_intern[robot_id] = 0
+            else:
+                self._frames_since_intern[robot_id] = since + 1
+            size += need
+        close()
+        return frames
+
+    def flush(self, sock, addr):
+        """Envía los cambios del tick. Devuelve la cantidad de datagramas."""
+        frames = self.frames()
+        send_many(sock, [(frame, addr) for frame in frames])  # sendmmsg si hay varios frames
+        return len(frames)
+
+
+def _decode_batch(buf, names, fixed):
+    _, _, n_intern, n_state = _BATCH_HEAD.unpack_from(buf, 0)
+    off = _BATCH_HEAD.size
+    for _ in range(n_intern):
+        rid = struct.unpack_from("<H", buf, off)[0]
+        n = buf[off + 2]
+        names[rid] = bytes(buf[off + 3:off + 3 + n]).decode("utf-8")
+        off += 3 + n
+    entry = _ENTRY_FIXED if fixed else _ENTRY_F32
+    packets = []
+    for _ in range(n_state):
+        rid, r, g, b, eflags, x, y, rot = entry.unpack_from(buf, off)
+        off += entry.size
+        name = names.get(rid)
+        if name is None:
+            continue
+        if fixed:
+            x, y, rot = x / FIXED_POS_SCALE, y / FIXED_POS_SCALE, rot / FIXED_ROT_SCALE
+        packets.append(_state_dict(name, x, y, rot, (r, g, b), eflags & ENTRY_TELEPORT))
+    return packets
+
+
+def _state_dict(name, x, y, rot, color, teleport):
+    packet = {
+        "type": "state",
+        "src": name,
+        "name": name,
+        "data": {"pos": [x, 0, y], "rot": rot, "color": list(color)},
+    }
+    if teleport:
+        packet["cmd"] = "teleport"
+        packet["cmdData"] = {"x": x, "y": y, "rot": rot}
+    return packet
+
+
+def decode_frame(buf, names):
+    """Cualquier paquete binario → lista de paquetes 'state' (vacía para control)."""
+    if buf[1] & 0x0F == KIND_BATCH:
+        return _decode_batch(buf, names, bool(buf[1] & FLAG_FIXED))
+    packet = decode(buf, names)
+    return [packet] if packet else []
+
+
+def decode(buf, names=None):
+    """
+    Decodifica un paquete binario a la misma forma que el JSON equivalente.
+    names: dict rid → robot_id (se actualiza con los KIND_INTERN recibidos).
+    Devuelve None para paquetes de control o rid desconocido.
+    """
+    if names is None:
+        names = {}
+    magic, kind_flags, rid = _HEAD.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("no es un paquete binario ESTER-Grid")
+    kind = kind_flags & 0x0F
+
+    if kind == KIND_INTERN:
+        n = buf[4]
+        names[rid] = bytes(buf[5:5 + n]).decode("utf-8")
+        return None
+
+    if kind not in (KIND_STATE, KIND_TELEPORT):
+        raise ValueError(f"kind binario desconocido: {kind} (usar decode_frame para batch)")
+    name = names.get(rid)
+    if name is None:
+        return None
+
+    if kind_flags & FLAG_FIXED:
+        _, _, _, r, g, b, _, xi, yi, ri = _STATE_FIXED.unpack_from(buf, 0)
+        x, y, rot = xi / FIXED_POS_SCALE, yi / FIXED_POS_SCALE, ri / FIXED_ROT_SCALE
+    else:
+        _, _, _, r, g, b, _, x, y, rot = _STATE_F32.unpack_from(buf, 0)
+
+    return _state_dict(name, x, y, rot, (r, g, b), kind == KIND_TELEPORT)
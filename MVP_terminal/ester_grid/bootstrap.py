@@ -0,0 +1,53 @@
+# ========================================================
+# ESTER-Grid - Registro de flotas en el dispatcher
+# Una conexión Socket.IO y un solo ida-y-vuelta para N robots
+# ========================================================
+#
+# Antes cada Robot abría su propio socketio.Client() y esperaba el evento
+# "udp_ports" (30 robots = 30 sesiones WebSocket en serie). Con
+# register_fleet() una sola conexión (auth {"bulk": true}) envía
+# "register_bulk" con todos los ids y recibe todos los puertos juntos.
+#
+# Requiere python-socketio (pip install "python-socketio[client]").
+
+from .config import DISP_URL
+
+
+class FleetRegistration:
+    """
+    Resultado de register_fleet(). Mantener vivo mientras la flota corre:
+    al cerrar la conexión el dispatcher libera el puerto de envío.
+    """
+
+    def __init__(self, sio, reply):
+        self.sio = sio
+        self.send_port = reply["send"]
+        self.ports = reply["ports"]  # robot_id -> {"send": p, "recv": p}
+
+    def __getitem__(self, robot_id):
+        return self.ports[robot_id]
+
+    def close(self):
+        self.sio.disconnect()
+
+
+def register_fleet(robot_ids, url=DISP_URL, timeout=10):
+    """Registra todos los robot_ids en el dispatcher con una sola llamada."""
+    try:
+        import socketio
+    except ImportError as e:
+        raise ImportError("register_fleet requiere python-socketio: pip install \"python-socketio[client]\"") from e
+
+    ids = list(robot_ids)
+    sio = socketio.Client()
+    sio.connect(url, auth={"bulk": True}, wait_timeout=timeout)
+    try:
+        reply = sio.call("register_bulk", {"ids": ids}, timeout=timeout)
+    except Exception:
+        sio.disconnect()
+        raise
+    if "error" in reply:
+        sio.disconnect()
+        raise RuntimeError(f"Registro en lote rechazado: {reply.get('message', reply['error'])}")
+    print(f"[FLOTA] {len(ids)} robots registrados en el dispatcher (UDP {reply['send']})")
+    return FleetRegistration(sio, reply)
@@ -0,0 +1,210 @@
+# ========================================================
+# ESTER-Grid - Cliente de robot compartido
+# Un socket UDP por proceso + plantillas de paquete cacheadas
+# ========================================================
+#
+# Todos los ejemplos repetían la misma clase Robot y en cada tick armaban
+# un dict anidado nuevo + json.dumps(...).encode(). Acá el paquete JSON se
+# arma UNA vez por robot como bytearray con campos de ancho fijo, y en cada
+# envío sólo se sobreescriben pos/rot/color dentro del mismo buffer.
+# JSON admite espacios alrededor de los números, así que los campos se
+# rellenan con espacios y el simulador los parsea igual que antes.
+
+import json
+import socket
+import threading
+import time
+
+from .binary import BinaryStatePacket
+from .config import SIM_IP, SIM_PORT, robot_color
+
+NUM_WIDTH = 10  # ancho inicial de x/y/rot ("%10.2f" → hasta 9999999.99)
+TS_WIDTH = 13   # milisegundos epoch
+HT_WIDTH = 16   # microsegundos epoch (timestamps por tramo, ver ester_grid.hops)
+
+_shared_sock = None
+_shared_lock = threading.Lock()
+
+
+def shared_socket():
+    """Socket UDP de envío único para todo el proceso (se crea la primera vez)."""
+    global _shared_sock
+    if _shared_sock is None:
+        with _shared_lock:
+            if _shared_sock is None:
+                _shared_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    return _shared_sock
+
+
+class StatePacket:
+    """
+    Paquete 'state' preconstruido para un robot.
+
+    Formato generado (igual al de los ejemplos):
+      {"type":"state","src":ID,"name":ID,"data":{"pos":[x,0,y],"rot":r,"color":[r,g,b],"name":ID}}
+    Con teleport=True agrega "cmd":"teleport" y "cmdData":{"x","y","rot"}.
+    Con ts=True agrega "ts" (ms) como hacía robots_30_udp.
+    Con hops=True agrega "ht":[envío_us] como último campo; dispatcher y
+    simulador le agregan sus propios timestamps (ester_grid.hops).
+    Con dr=True agrega "vel":[vx,vy] (px/s) y "turn" (grados/s) en data para
+    que el receptor extrapole entre paquetes (ester_grid.deadreckoning).
+    """
+
+    def __init__(self, robot_id, name=None, teleport=False, ts=False, dst=None, hops=False, dr=False):
+        self.robot_id = robot_id
+        self.name = name or robot_id
+        self.teleport = teleport
+        self.ts = ts
+        self.dst = dst
+        self.hops = hops
+        self.dr = dr
+        self._w = NUM_WIDTH
+        self._color = None
+        self._build()
+
+    def _build(self):
+        parts = []
+        slots = []
+        offset = 0
+
+        def lit(s):
+            nonlocal offset
+            b = s.encode("utf-8")
+            parts.append(b)
+            offset += len(b)
+
+        def slot(key, width):
+            nonlocal offset
+            slots.append((key, offset, offset + width))
+            parts.append(b" " * width)
+            offset += width
+
+        rid = json.dumps(self.robot_id)
+        name = json.dumps(self.name)
+        w = self._w
+        lit('{"type":"state","src":%s,"name":%s' % (rid, name))
+        if self.dst:
+            lit(',"dst":%s' % json.dumps(self.dst))
+        if self.teleport:
+            lit(',"cmd":"teleport","cmdData":{"x":')
+            slot("x", w)
+            lit(',"y":')
+            slot("y", w)
+            lit(',"rot":')
+            slot("rot", w)
+            lit('}')
+        if self.ts:
+            lit(',"ts":')
+            slot("ts", TS_WIDTH)
+        lit(',"data":{"pos":[')
+        slot("x", w)
+        lit(',0,')
+        slot("y", w)
+        lit('],"rot":')
+        slot("rot", w)
+        if self.dr:
+            lit(',"vel":[')
+            slot("vx", w)
+            lit(',')
+            slot("vy", w)
+            lit('],"turn":')
+            slot("turn", w)
+        lit(',"color":[')
+        slot("color", 11)  # "rrr,ggg,bbb"
+        lit('],"name":%s}' % name)
+        if self.hops:
+            lit(',"ht":[')
+            slot("ht", HT_WIDTH)
+            lit(']')
+        lit('}')
+
+        self.buf = bytearray(b"".join(parts))
+        self._slots = slots
+        # El color solo se escribe cuando cambia: la plantilla nueva ya lo lleva
+        # (el último usado, o el que el simulador le daría por defecto)
+        self._write_color(self._color or robot_color(self.robot_id))
+
+    def _write_color(self, color):
+        c = [max(0, min(255, int(v))) for v in color[:3]]
+        for key, a, b in self._slots:
+            if key == "color":
+                self.buf[a:b] = b"%3d,%3d,%3d" % (c[0], c[1], c[2])
+        self._color = list(color)
+
+    def update(self, x, y, rot, color=None, vel=None, turn=None):
+        """Escribe pos/rot (y color si cambió; vel/turn con dr=True) en el buffer y lo devuelve."""
+        w = self._w
+        xs = b"%*.2f" % (w, x)
+        ys = b"%*.2f" % (w, y)
+        rs = b"%*.2f" % (w, rot)
+        nums = [xs, ys, rs]
+        if self.dr:
+            vx, vy = vel if vel is not None else (0.0, 0.0)
+            dr = {"vx": b"%*.2f" % (w, vx), "vy": b"%*.2f" % (w, vy),
+                  "turn": b"%*.2f" % (w, turn or 0.0)}
+            nums.extend(dr.values())
+        if max(len(n) for n in nums) > w:
+            # Número más ancho que el campo: reconstruir con más espacio
+            self._w = max(len(n) for n in nums) + 2
+            self._build()
+            return self.update(x, y, rot, color, vel, turn)
+
+        buf = self.buf
+        for key, a, b in self._slots:
+            if key == "x":
+                buf[a:b] = xs
+            elif key == "y":
+                buf[a:b] = ys
+            elif key == "rot":
+                buf[a:b] = rs
+            elif key in ("vx", "vy", "turn"):
+                buf[a:b] = dr[key]
+            elif key == "ts":
+                buf[a:b] = b"%*d" % (TS_WIDTH, int(time.time() * 1000))
+            elif key == "ht":
+                buf[a:b] = b"%*d" % (HT_WIDTH, time.time_ns() // 1000)
+        if color is not None and color != self._color:
+            self._write_color(color)
+        return buf
+
+
+class RobotClient:
+    """
+    Robot mínimo: posición, rotación, color y envío de estado al simulador.
+    Todos los RobotClient del proceso comparten el mismo socket de envío.
+    Con binary=True usa el formato compacto de ester_grid.binary
+    (fixed=True: posición/rotación en punto fijo, 14 bytes por paquete).
+    """
+
+    def __init__(self, robot_id, start_pos=(0.0, 0.0), start_rot=0, color=None, name=None,
+                 sim_addr=None, sock=None, binary=False, fixed=False):
+        self.robot_id = robot_id
+        self.pos = [start_pos[0], start_pos[1]]
+        self.rot = start_rot
+        self.color = list(color) if color else [200, 200, 200]
+        self.sim_addr = sim_addr or (SIM_IP, SIM_PORT)
+        self.sock_state = sock or shared_socket()
+        self.binary = binary
+        if binary:
+            self._state_pkt = BinaryStatePacket(robot_id, fixed=fixed)
+            self._teleport_pkt = BinaryStatePacket(robot_id, teleport=True, fixed=fixed)
+        else:
+            self._state_pkt = StatePacket(robot_id, name=name)
+            self._teleport_pkt = StatePacket(robot_id, name=name, teleport=True)
+
+    def state_bytes(self):
+        """Paquete 'state' actual (buffer reutilizado, no guardar referencias)."""
+        return self._state_pkt.update(self.pos[0], self.pos[1], self.rot, self.color)
+
+    def _send(self, pkt_tpl, x, y, rot):
+        if self.binary and pkt_tpl.needs_intern():
+            self.sock_state.sendto(pkt_tpl.intern, self.sim_addr)
+        self.sock_state.sendto(pkt_tpl.update(x, y, rot, self.color), self.sim_addr)
+
+    def send_state(self):
+        self._send(self._state_pkt, self.pos[0], self.pos[1], self.rot)
+
+    def teleport(self, x, y, rot=0):
+        self.pos = [x, y]
+        self.rot = rot
+        self._send(self._teleport_pkt, x, y, rot)
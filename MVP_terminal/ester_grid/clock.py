@@ -0,0 +1,207 @@
+# ========================================================
+# ESTER-Grid - Reloj maestro de ticks (lockstep sin deriva)
+# ========================================================
+#
+# ejemplo8 armaba el reloj a mano con tick_start/tick_end (Events) y
+# time.sleep(TICK_RATE): cada tick dura TICK_RATE + lo que tarde el resto
+# del ciclo, así que el error se acumula. TickScheduler usa deadlines
+# absolutos sobre time.monotonic() (tick k arranca en t0 + k*period) y
+# una sola Condition compartida: los participantes esperan un número de
+# tick, sin Events que se crean/limpian en cada vuelta.
+#
+# Además lleva la cuenta de:
+#   - overruns: ticks que arrancaron más de un período tarde (se saltean)
+#   - participantes atrasados: no llamaron done() antes del tick siguiente
+#   - jitter: atraso de cada tick respecto a su deadline (p50/p99/p999)
+#
+# Uso con hilos:
+#
+#   reloj = TickScheduler(0.02)
+#   def robot(p):
+#       for tick in p:          # espera el tick, y marca done() al volver
+#           ...mover + send_state...
+#   for i in range(20):
+#       threading.Thread(target=robot, args=(reloj.join(f"S{i}"),)).start()
+#   reloj.run(duration=10)
+#   print(reloj.report())
+
+import collections
+import threading
+import time
+
+JITTER_SAMPLES = 10000
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+class Participant:
+    """Un robot/hilo sincronizado con el reloj."""
+
+    def __init__(self, scheduler, name):
+        self.scheduler = scheduler
+        self.name = name
+        self.seen = scheduler.tick       # último tick que procesó
+        self.done_tick = scheduler.tick  # último tick que terminó
+        self.late = 0                    # ticks en los que no llegó a terminar
+        self.active = True
+
+    def wait(self, timeout=None):
+        """Bloquea hasta el próximo tick. Devuelve su número o None si el reloj paró."""
+        sched = self.scheduler
+        with sched._cond:
+            ok = sched._cond.wait_for(lambda: sched.tick > self.seen or sched.finished, timeout)
+            if not ok or sched.tick <= self.seen:
+                return None
+            self.seen = sched.tick
+            return self.seen
+
+    def done(self):
+        self.done_tick = self.seen
+
+    def leave(self):
+        self.active = False
+        self.scheduler._leave(self)
+
+    def __iter__(self):
+        try:
+            while True:
+                tick = self.wait()
+                if tick is None:
+                    return
+                yield tick
+                self.done()
+        finally:
+            self.leave()
+
+
+class TickScheduler:
+    """Reloj de ticks con deadlines monótonos, muchos participantes y métricas."""
+
+    def __init__(self, period=0.02, on_tick=None):
+        self.period = period
+        self.on_tick = on_tick   # callback(tick) al cierre de cada tick (ej: batch.flush)
+        self.tick = 0
+        self.running = False
+        self.finished = False    # True cuando el reloj terminó (libera a los que esperan)
+        self.overruns = 0
+        self.skipped = 0
+        self.late_total = 0
+        self._participants = []
+        self._cond = threading.Condition()
+        self._jitter = collections.deque(maxlen=JITTER_SAMPLES)
+        self._late_by_name = collections.Counter()
+        self._thread = None
+
+    # ----------------------------
+    # Participantes
+    # ----------------------------
+    def join(self, name):
+        p = Participant(self, name)
+        with self._cond:
+            self._participants.append(p)
+        return p
+
+    def _leave(self, p):
+        with self._cond:
+            if p in self._participants:
+                self._participants.remove(p)
+
+    # ----------------------------
+    # Loop
+    # ----------------------------
+    def run(self, ticks=None, duration=None, until=None):
+        """Corre el reloj en el hilo actual hasta ticks/duration/until() o stop()."""
+        self.running = True
+        start = deadline = time.monotonic()
+        try:
+            while self.running:
+                deadline += self.period
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                now = time.monotonic()
+                lateness = now - deadline
+                self._jitter.append(lateness)
+                if lateness > self.period:
+                    # overrun: no recuperar ticks perdidos en ráfaga
+                    self.overruns += 1
+                    missed = int(lateness // self.period)
+                    self.skipped += missed
+                    deadline += missed * self.period
+
+                if self.on_tick is not None and self.tick > 0:
+                    self.on_tick(self.tick)
+
+                with self._cond:
+                    if self.tick > 0:
+                        for p in self._participants:
+                            if p.active and p.done_tick < self.tick:
+                                p.late += 1
+                                self.late_total += 1
+                                self._late_by_name[p.name] += 1
+                    self.tick += 1
+                    self._cond.notify_all()
+
+                if ticks is not None and self.tick >= ticks:
+                    break
+                if duration is not None and now - start >= duration:
+                    break
+                if until is not None and until():
+                    break
+        finally:
+            with self._cond:
+                self.running = False
+                self.finished = True
+                self._cond.notify_all()
+
+    def start(self, **kwargs):
+        """Corre el reloj en un hilo daemon (mismos argumentos que run)."""
+        self._thread = threading.Thread(target=self.run, kwargs=kwargs, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self.finished = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    # ----------------------------
+    # Métricas
+    # ----------------------------
+    def stats(self):
+        jit = sorted(self._jitter)
+        return {
+            "period_ms": self.period * 1000,
+            "ticks": self.tick,
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped,
+            "late_participants": self.late_total,
+            "late_by_participant": dict(self._late_by_name),
+            "jitter_ms": {
+                "p50": _percentile(jit, 0.50) * 1000,
+                "p99": _percentile(jit, 0.99) * 1000,
+                "p999": _percentile(jit, 0.999) * 1000,
+                "max": (jit[-1] * 1000) if jit else 0.0,
+            },
+        }
+
+    def report(self):
+        s = self.stats()
+        j = s["jitter_ms"]
+        lines = [
+            f"Reloj {s['period_ms']:.0f} ms: {s['ticks']} ticks, {s['overruns']} overruns "
+            f"({s['skipped_ticks']} ticks salteados), {s['late_participants']} atrasos de participantes",
+            f"Jitter: p50={j['p50']:.2f} ms  p99={j['p99']:.2f} ms  p999={j['p999']:.2f} ms  max={j['max']:.2f} ms",
+        ]
+        peores = sorted(s["late_by_participant"].items(), key=lambda kv: -kv[1])[:5]
+        if peores:
+            lines.append("Más atrasados: " + ", ".join(f"{n}={c}" for n, c in peores))
+        return "\n".join(lines)
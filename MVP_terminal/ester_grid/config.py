@@ -0,0 +1,38 @@
+# ========================================================
+# ESTER-Grid - Configuración compartida para clientes Python
+# Lee MVP_terminal/config.json (el mismo que usa sim_server.js)
+# ========================================================
+
+import json
+import os
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CFG_PATH = os.path.join(_ROOT, "config.json")
+
+try:
+    with open(_CFG_PATH, encoding="utf-8") as f:
+        _cfg = json.load(f)
+except (OSError, ValueError):
+    _cfg = {}
+
+SIM_IP = _cfg.get("sim_server_host", "127.0.0.1")
+SIM_PORT = _cfg.get("udp_dispatcher_to_sim", 10009)      # simulador (recibe estados)
+SIM_TO_DISPATCHER_PORT = _cfg.get("udp_sim_to_dispatcher", 10008)
+SIM_URL = _cfg.get("sim_url", f"http://{SIM_IP}:{_cfg.get('http_port', 4001)}")  # sim_server.js (state_update)
+
+DISP_IP = _cfg.get("dispatcher_host", "127.0.0.1")
+DISP_MSG_PORT = _cfg.get("udp_msg_port", 10011)           # dispatcher (router de mensajes)
+DISP_URL = _cfg.get("dispatcher_url", "http://127.0.0.1:6029")  # dispatcher Socket.IO
+
+WINDOW_W = 900
+WINDOW_H = 600
+
+LOGS_DIR = os.path.join(_ROOT, "logs")  # events.log y trazas de sim_server.js
+HOPS_PORT = _cfg.get("hops_collector_port", 10012)        # colector de timestamps por tramo (ester_grid.hops)
+HOPS_HTTP_PORT = _cfg.get("hops_http_port", 9109)         # /metrics para Prometheus
+
+
+def robot_color(rid):
+    """Color por defecto de un robot (el mismo que asigna sim_server.js)."""
+    seed = sum(ord(c) for c in rid)
+    return [(seed * 50) % 255, (seed * 80) % 255, (seed * 110) % 255]
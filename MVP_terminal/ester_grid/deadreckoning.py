@@ -0,0 +1,162 @@
+# ========================================================
+# ESTER-Grid - Dead reckoning: menos paquetes de estado con error acotado
+# ========================================================
+#
+# Los robots mandan la posición a 20-50 Hz aunque vayan en línea recta o en
+# arco. Con dead reckoning el paquete lleva además velocidad (px/s) y tasa
+# de giro (grados/s):
+#
+#   "data":{"pos":[x,0,y],"rot":r,"vel":[vx,vy],"turn":w,...}     (StatePacket(..., dr=True))
+#
+# y el receptor (sim_server.js, ester_grid.engine) extrapola entre paquetes
+# con extrapolate(): la velocidad gira a la tasa de giro, así que un arco de
+# radio constante se sigue exacto. El robot corre el mismo modelo sobre lo
+# último que mandó y solo vuelve a mandar cuando el error contra su posición
+# real supera `threshold` px (o `rot_threshold` grados), o cada `heartbeat` s
+# para no desvanecerse (TIMEOUT_SEC = 2 en el simulador).
+#
+#   dr = DeadReckoner(threshold=1.0, heartbeat=1.0)
+#   while True:
+#       ...mover...
+#       if dr.update(x, y, rot):                       # ¿el receptor se desvió?
+#           sock.sendto(pkt.update(x, y, rot, color, vel=dr.vel, turn=dr.turn), addr)
+#       time.sleep(0.02)
+#
+#   python -m ester_grid.deadreckoning      (paquetes/s y error por trayectoria)
+
+import math
+import time
+
+THRESHOLD = 1.0         # px de error visual tolerado
+ROT_THRESHOLD = 3.0     # grados
+HEARTBEAT = 1.0         # s entre paquetes aunque el modelo acierte
+MAX_EXTRAPOLATION = 3.0 # s (DR_MAX_S en sim_server.js): después el receptor se queda quieto
+
+
+def _angle_diff(a, b):
+    return (a - b + 180.0) % 360.0 - 180.0
+
+
+def extrapolate(x, y, rot, vx, vy, turn, dt):
+    """(x, y, rot) a dt s de un estado con velocidad (vx, vy) px/s que gira a `turn` grados/s."""
+    w = math.radians(turn)
+    if abs(w * dt) < 1e-9:
+        return x + vx * dt, y + vy * dt, rot
+    s = math.sin(w * dt)
+    c = 1.0 - math.cos(w * dt)
+    return (x + (vx * s - vy * c) / w,
+            y + (vx * c + vy * s) / w,
+            (rot + turn * dt) % 360.0)
+
+
+class DeadReckoner:
+    """
+    Decide cuándo mandar estado: lleva el mismo modelo que el receptor y
+    avisa cuando se aparta más que el umbral. Si no se pasan vel/turn, los
+    estima de los ticks anteriores.
+    """
+
+    def __init__(self, threshold=THRESHOLD, rot_threshold=ROT_THRESHOLD, heartbeat=HEARTBEAT):
+        self.threshold = threshold
+        self.rot_threshold = rot_threshold
+        self.heartbeat = heartbeat
+        self.vel = (0.0, 0.0)
+        self.turn = 0.0
+        self.model = None       # (t, x, y, rot, vx, vy, turn) del último paquete
+        self.ticks = 0
+        self.sent = 0
+        self.max_error = 0.0    # error máximo sin mandar (lo que ve el receptor)
+        self._prev = None
+
+    def _estimate(self, now, x, y, rot):
+        prev = self._prev
+        if prev is None or now <= prev[0]:
+            return (0.0, 0.0), 0.0
+        dt = now - prev[0]
+        turn = _angle_diff(rot, prev[3]) / dt
+        vx, vy = (x - prev[1]) / dt, (y - prev[2]) / dt
+        # la cuerda del último tick apunta medio paso atrás en un arco
+        h = math.radians(turn) * dt / 2
+        c, s = math.cos(h), math.sin(h)
+        return (vx * c - vy * s, vx * s + vy * c), turn
+
+    def update(self, x, y, rot, now=None, vel=None, turn=None, force=False):
+        """Nueva posición real; True si hay que mandar paquete (con self.vel / self.turn).
+        force=True: se manda igual (p. ej. por otro motivo) y el modelo arranca de acá."""
+        now = time.monotonic() if now is None else now
+        if vel is None or turn is None:
+            est_vel, est_turn = self._estimate(now, x, y, rot)
+            vel = est_vel if vel is None else vel
+            turn = est_turn if turn is None else turn
+        self.vel, self.turn = (float(vel[0]), float(vel[1])), float(turn)
+        self._prev = (now, x, y, rot)
+        self.ticks += 1
+
+        m = self.model
+        send = force or m is None or now - m[0] >= self.heartbeat
+        if not send:
+            ex, ey, erot = extrapolate(m[1], m[2], m[3], m[4], m[5], m[6], now - m[0])
+            err = math.hypot(x - ex, y - ey)
+            send = err > self.threshold or abs(_angle_diff(rot, erot)) > self.rot_threshold
+            if not send and err > self.max_error:
+                self.max_error = err
+        if send:
+            self.model = (now, x, y, rot, self.vel[0], self.vel[1], self.turn)
+            self.sent += 1
+        return send
+
+    def reset(self):
+        """Tras un teleport: el próximo update manda sí o sí."""
+        self.model = None
+        self._prev = None
+
+    def ratio(self):
+        return self.sent / self.ticks if self.ticks else 0.0
+
+
+def _trajectories():
+    """Trayectorias de prueba: (nombre, fn(t) -> (x, y, rot))."""
+    def line(t):
+        return 100 + 30 * t, 300, 0.0
+
+    def arc(t):
+        a = 0.5 * t
+        return 450 + 150 * math.cos(a), 300 + 150 * math.sin(a), math.degrees(a) + 90
+
+    def spiral(t):   # ejemplo10: ángulo += 0.15 y radio += 2 cada 50 ms
+        a = 3.0 * t
+        r = 20 + 40 * t
+        return 450 + r * math.cos(a), 300 + r * math.sin(a), math.degrees(a) + 90
+
+    def zigzag(t):   # escalera: 2 s en x, 2 s en y (giro de 90° en el lugar)
+        leg, u = divmod(t, 2.0)
+        n = int(leg)
+        along_x = n % 2 == 0
+        x = 100 + 40 * ((n + 1) // 2) + (20 * u if along_x else 0)
+        y = 200 + 40 * (n // 2) + (0 if along_x else 20 * u)
+        return x, y, 0.0 if along_x else 90.0
+
+    return [("línea", line), ("arco", arc), ("espiral", spiral), ("zigzag", zigzag)]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.deadreckoning",
+                                 description="Paquetes/s y error visual del dead reckoning por trayectoria")
+    ap.add_argument("--rate", type=float, default=50.0, help="Hz del loop del robot")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--heartbeat", type=float, default=HEARTBEAT)
+    args = ap.parse_args()
+
+    dt = 1.0 / args.rate
+    steps = int(args.seconds * args.rate)
+    print(f"{'trayectoria':<12} {'paq/s':>7} {'vs':>6} {'reducción':>10} {'error máx px':>13}")
+    for name, fn in _trajectories():
+        dr = DeadReckoner(args.threshold, heartbeat=args.heartbeat)
+        for i in range(steps):
+            t = i * dt
+            dr.update(*fn(t), now=t)
+        pps = dr.sent / args.seconds
+        print(f"{name:<12} {pps:>7.1f} {args.rate:>6.0f} {args.rate / pps:>9.1f}x {dr.max_error:>13.2f}")
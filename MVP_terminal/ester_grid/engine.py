@@ -0,0 +1,512 @@
+# ========================================================
+# ESTER-Grid - Motor de simulación headless (más rápido que tiempo real)
+# ========================================================
+#
+# Misma semántica que el setInterval de 50 ms de sim_server.js (y que
+# simulator/old/simulador.py), sin pygame, sockets ni time.sleep:
+#   - cada tick el robot avanza hasta ROBOT_SPEED px hacia su objetivo (tx, ty)
+#   - colisión robot/robot (círculos) y robot/objeto (rectángulos) con lado
+#     frente / izquierda / atrás / derecha
+#   - los objetos "movible" se empujan, los demás bloquean; TWIN_* no chocan
+#   - sin paquetes por TIMEOUT_SEC el robot se desvanece, a los 10 s se elimina
+#   - escenarios futbol / laberinto / obstaculos / rescate
+#   - estados con "vel"/"turn" se extrapolan entre paquetes (dead reckoning)
+#
+# El reloj es simulado (tick fijo de dt segundos), así que un loop de
+# engine.step() corre tan rápido como dé la CPU: minutos de flota en segundos.
+#
+#   eng = SimEngine(scenario="laberinto", seed=1)
+#   eng.set_target("R1", 100, 100, rot=0)          # o eng.handle_state(paquete)
+#   for frame in eng.run(duration=300):             # 300 s simulados
+#       ...frame tiene la forma de "state_update"...
+
+import json
+import math
+import random
+
+from .binary import decode_frame, is_binary
+from .config import robot_color
+from .deadreckoning import MAX_EXTRAPOLATION, extrapolate
+from .spatial import SpatialGrid
+
+WINDOW_W = 900
+WINDOW_H = 600
+TIMEOUT_SEC = 2
+REMOVE_SEC = 10
+FADE_SPEED = 0.05
+ROBOT_SIZE = 10
+ROBOT_SPEED = 2.0
+OBJ_WIDTH = 25
+OBJ_HEIGHT = 15
+TICK = 0.05
+ROBOT_CELL = ROBOT_SIZE * 4   # celda de la grilla de robots (px)
+OBJECT_CELL = 64              # celda de la grilla de objetos (~ una celda del laberinto)
+
+SCENARIOS = ("futbol", "laberinto", "obstaculos", "rescate")
+
+
+# ----------------------------
+# Helpers (idénticos a sim_server.js)
+# ----------------------------
+def clamp_pos(x, y):
+    return max(0, min(WINDOW_W, x)), max(0, min(WINDOW_H, y))
+
+
+def collision_side(x, y, rot, ox, oy):
+    """Lado del robot (en (x, y) mirando a rot) por el que está (ox, oy)."""
+    angle = math.degrees(math.atan2(y - oy, x - ox))
+    relative = (angle - rot % 360 + 360) % 360
+    if relative >= 315 or relative < 45:
+        return "frente"
+    if relative < 135:
+        return "izquierda"
+    if relative < 225:
+        return "atrás"
+    return "derecha"
+
+
+def color_name(color):
+    if not color:
+        return "sin color"
+    return f"RGB({round(color[0])},{round(color[1])},{round(color[2])})"
+
+
+# ----------------------------
+# Escenarios
+# ----------------------------
+def generate_objects(rng, count=50):
+    if count <= 0:
+        return [{"x": -100, "y": -100, "type": "inamovible", "name": "out_0", "color": [0, 0, 0],
+                 "width": OBJ_WIDTH, "height": OBJ_HEIGHT}]
+    objects = []
+    for i in range(count):
+        obj_type = "movible" if rng.random() > 0.5 else "inamovible"
+        x = 50 + rng.random() * (WINDOW_W - 100)
+        y = 50 + rng.random() * (WINDOW_H - 100)
+        color = [255, 0, 0] if obj_type == "inamovible" else [rng.random() * 205 + 50 for _ in range(3)]
+        objects.append({"x": x, "y": y, "type": obj_type, "name": f"{obj_type[:3]}_{i}", "color": color,
+                        "width": OBJ_WIDTH, "height": OBJ_HEIGHT})
+    return objects
+
+
+def generate_labyrinth(rng, cols=14, rows=10):
+    wall_color = [213, 106, 0]
+    thickness = 16
+    cell_w = WINDOW_W / cols
+    cell_h = WINDOW_H / rows
+    visited = [[False] * cols for _ in range(rows)]
+    v_walls = [[True] * (cols + 1) for _ in range(rows)]
+    h_walls = [[True] * cols for _ in range(rows + 1)]
+
+    # backtracker iterativo (el recursivo de JS pasa el límite de recursión de Python en mapas grandes)
+    visited[0][0] = True
+    stack = [(0, 0)]
+    while stack:
+        r, c = stack[-1]
+        dirs = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        rng.shuffle(dirs)
+        for dr, dc in dirs:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols and not visited[nr][nc]:
+                if dr == 0:
+                    v_walls[r][c + 1 if dc == 1 else c] = False
+                else:
+                    h_walls[r + 1 if dr == 1 else r][c] = False
+                visited[nr][nc] = True
+                stack.append((nr, nc))
+                break
+        else:
+            stack.pop()
+
+    exit_row = rows // 2
+    objects = []
+    for r in range(rows + 1):
+        for c in range(cols):
+            if h_walls[r][c] and not (r == 0 and c == 0) and not (r == exit_row and c == cols - 1):
+                objects.append({"x": c * cell_w + cell_w / 2, "y": r * cell_h, "type": "inamovible",
+                                "name": f"h_{r}_{c}", "color": wall_color, "width": cell_w, "height": thickness})
+    for r in range(rows):
+        for c in range(cols + 1):
+            if v_walls[r][c] and not (r == 0 and c == 0) and not (r == exit_row and c == cols):
+                objects.append({"x": c * cell_w, "y": r * cell_h + cell_h / 2, "type": "inamovible",
+                                "name": f"v_{r}_{c}", "color": wall_color, "width": thickness, "height": cell_h})
+    objects.append({"x": WINDOW_W / 2, "y": WINDOW_H / 2, "type": "inamovible", "name": "goal_center",
+                    "color": [0, 200, 0], "width": 30, "height": 30})
+    return objects
+
+
+def generate_rescue(rng):
+    zone_colors = {"red": [139, 0, 0], "green": [0, 100, 0], "blue": [0, 0, 139]}
+    item_colors = {"red": [255, 150, 150], "green": [144, 238, 144], "blue": [135, 206, 250]}
+    zone_w = WINDOW_W / 3
+    objects = []
+    for i, key in enumerate(("red", "green", "blue")):
+        objects.append({"x": zone_w * (i + 0.5), "y": WINDOW_H / 2, "type": "zona", "name": f"zone_{key}",
+                        "color": zone_colors[key], "width": zone_w, "height": WINDOW_H, "role": "zone",
+                        "zoneColor": item_colors[key]})
+    # 3 objetos movibles por color, nunca dentro de su zona objetivo
+    for target, key in enumerate(("red", "green", "blue")):
+        for i in range(3):
+            while True:
+                x = 100 + rng.random() * (WINDOW_W - 200)
+                y = 50 + rng.random() * (WINDOW_H - 100)
+                if int(x // zone_w) != target:
+                    break
+            objects.append({"x": x, "y": y, "type": "movible", "name": f"item_{key}_{i}",
+                            "color": item_colors[key], "width": 20, "height": 20, "role": "item",
+                            "targetColor": item_colors[key]})
+    return objects
+
+
+# ----------------------------
+# Motor
+# ----------------------------
+class SimEngine:
+    """Mundo de sim_server.js con reloj simulado de paso fijo."""
+
+    def __init__(self, scenario="futbol", dt=TICK, seed=None, on_event=None):
+        self.dt = dt
+        self.time = 0.0          # segundos simulados
+        self.ticks = 0
+        self.rng = random.Random(seed)
+        self.robots = {}         # mismos campos que `robots` en sim_server.js
+        self.objects = []
+        self.scenario = "futbol"
+        self.rescue = {"placed": 0, "total": 0, "done": False}
+        self.on_event = on_event  # callback(dict) con la forma de logs/events.log
+        self.events = []          # eventos del último tick
+        self._names = {}          # nombres de ids binarios por emisor
+        # Broad-phase: grilla de robots (por id) y de objetos (por índice en self.objects).
+        # _seq guarda el orden de alta para recorrer candidatos en el mismo orden que el O(N²).
+        self._robot_grid = SpatialGrid(ROBOT_CELL)
+        self._object_grid = SpatialGrid(OBJECT_CELL)
+        self._indexed_objects = None
+        self._indexed_count = 0
+        self._seq = {}
+        self._next_seq = 0
+        self.set_scenario(scenario)
+
+    # ----------------------------
+    # Eventos (logEvent de sim_server.js, con ts simulado)
+    # ----------------------------
+    def log_event(self, type_, **payload):
+        event = {"ts": int(self.time * 1000), "type": type_, **payload}
+        self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
+
+    # ----------------------------
+    # Escenarios
+    # ----------------------------
+    def set_scenario(self, scenario, count=50):
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Escenario desconocido: {scenario} (opciones: {', '.join(SCENARIOS)})")
+        self.scenario = scenario
+        self.rescue = {"placed": 0, "total": 0, "done": False}
+        if scenario == "futbol":
+            self.objects = []
+        elif scenario == "laberinto":
+            self.objects = generate_labyrinth(self.rng)
+        elif scenario == "obstaculos":
+            self.objects = generate_objects(self.rng, count)
+        else:
+            self.objects = generate_rescue(self.rng)
+            self.rescue["total"] = 9
+        self._index_objects()
+
+    def _index_objects(self):
+        """Reconstruye la grilla de objetos (cambio de escenario o self.objects reemplazado)."""
+        grid = self._object_grid
+        grid.clear()
+        for i, obj in enumerate(self.objects):
+            grid.insert(i, obj["x"], obj["y"], obj["width"] / 2, obj["height"] / 2)
+        self._indexed_objects = self.objects
+        self._indexed_count = len(self.objects)
+
+    # ----------------------------
+    # Entrada (handle_state de sim_server.js)
+    # ----------------------------
+    def feed(self, buf, sender="local"):
+        """Datagrama crudo (JSON o binario de ester_grid.binary) como lo recibe el UDP 10009."""
+        if is_binary(buf):
+            names = self._names.setdefault(sender, {})
+            packets = decode_frame(buf, names)
+        else:
+            packets = [json.loads(bytes(buf).decode())]
+        for packet in packets:
+            self.handle_state(packet)
+
+    def handle_state(self, packet):
+        if packet.get("type") != "state":
+            return
+        rid = packet.get("src")
+        if not rid:
+            return
+        data = packet.get("data") or {}
+        pos = data.get("pos")
+        px = py = 0
+        if isinstance(pos, (list, tuple)):
+            if len(pos) == 3:
+                px, py = pos[0], pos[2]
+            elif len(pos) >= 2:
+                px, py = pos[0], pos[1]
+        px, py = clamp_pos(px, py)
+        rot = data.get("rot") or 0
+        color = data.get("color") or robot_color(rid)
+        cmd = packet.get("cmd") or data.get("cmd")
+        cmd_data = packet.get("cmdData") or data
+
+        name = rid if rid.startswith("TWIN_") else (packet.get("name") or data.get("name") or rid)
+        rb = self.robots.get(rid)
+        if rb is None:
+            rb = self.add_robot(rid, px, py, rot, color, name)
+        else:
+            rb["name"] = name
+
+        if cmd == "teleport":
+            rb["x"] = rb["tx"] = px
+            rb["y"] = rb["ty"] = py
+            self._robot_grid.move(rid, px, py)
+            if cmd_data and cmd_data.get("rot") is not None:
+                rb["rot"] = cmd_data["rot"]
+            rb["cmd"] = "teleport"
+            rb["data"] = {"x": px, "y": py, "rot": rb["rot"]}
+            rb["dr"] = None
+            self.log_event("teleport", id=rid, name=rb["name"], x=rb["x"], y=rb["y"], rot=rb["rot"])
+        else:
+            rb["tx"], rb["ty"], rb["rot"] = px, py, rot
+            rb["dr"] = self._dr_model(data, px, py, rot)
+            if cmd:
+                rb["cmd"] = cmd
+                rb["data"] = cmd_data
+                self.log_event("cmd", id=rid, name=rb["name"], cmd=cmd, data=cmd_data)
+        rb["last_seen"] = self.time
+        rb["alpha"] = 255
+        rb["color"] = color
+
+    def _dr_model(self, data, px, py, rot):
+        """Modelo de dead reckoning si el paquete trae vel/turn (como dr_model en sim_server.js)."""
+        vel = data.get("vel")
+        if not isinstance(vel, (list, tuple)) or len(vel) < 2:
+            return None
+        return (self.time, px, py, rot, float(vel[0] or 0), float(vel[1] or 0), float(data.get("turn") or 0))
+
+    def _dr_extrapolate(self, rb):
+        t0, x, y, rot, vx, vy, turn = rb["dr"]
+        x, y, rb["rot"] = extrapolate(x, y, rot, vx, vy, turn, min(self.time - t0, MAX_EXTRAPOLATION))
+        rb["tx"], rb["ty"] = clamp_pos(x, y)
+
+    def add_robot(self, rid, x, y, rot=0, color=None, name=None):
+        x, y = clamp_pos(x, y)
+        rb = {"name": name or rid, "x": x, "y": y, "tx": x, "ty": y, "rot": rot, "last_seen": self.time,
+              "alpha": 255, "color": color or robot_color(rid), "collision": {"collision": False},
+              "cmd": None, "data": None, "distance": 0, "collisions_count": 0}
+        self.robots[rid] = rb
+        self._robot_grid.insert(rid, x, y)
+        self._seq[rid] = self._next_seq
+        self._next_seq += 1
+        self.log_event("robot_join", id=rid, name=rb["name"], x=x, y=y)
+        return rb
+
+    def set_target(self, rid, x, y, rot=None):
+        """Atajo sin paquete: fija el objetivo (crea el robot ahí si no existe)."""
+        rb = self.robots.get(rid)
+        if rb is None:
+            rb = self.add_robot(rid, x, y, rot or 0)
+        rb["tx"], rb["ty"] = clamp_pos(x, y)
+        if rot is not None:
+            rb["rot"] = rot
+        rb["last_seen"] = self.time
+        rb["alpha"] = 255
+
+    # ----------------------------
+    # Movimiento y colisiones (apply_movement de sim_server.js)
+    # ----------------------------
+    def apply_movement(self, rb, robot_id):
+        dx = rb["tx"] - rb["x"]
+        dy = rb["ty"] - rb["y"]
+        dist = math.hypot(dx, dy)
+        if dist == 0:
+            return False, None, 0
+        step = min(dist, ROBOT_SPEED)
+        move_dx = dx / dist * step
+        move_dy = dy / dist * step
+        nx = rb["x"] + move_dx
+        ny = rb["y"] + move_dy
+        collision = None
+
+        if not robot_id.startswith("TWIN_"):
+            robots = self.robots
+            near = self._robot_grid.query(nx, ny, ROBOT_SIZE * 2, ROBOT_SIZE * 2)
+            near.discard(robot_id)
+            for other_id in sorted(near, key=self._seq.__getitem__) if len(near) > 1 else near:
+                other = robots[other_id]
+                if (other["name"] or "").startswith("TWIN_"):
+                    continue
+                if ROBOT_SIZE * 2 - math.hypot(nx - other["x"], ny - other["y"]) > 0:
+                    collision = {"collision": True, "type": "robot", "name": other["name"],
+                                 "color": color_name(other["color"]),
+                                 "side": collision_side(nx, ny, rb["rot"], other["x"], other["y"])}
+                    return False, collision, 0
+
+            objects = self.objects
+            near = self._object_grid.query(nx, ny, ROBOT_SIZE, ROBOT_SIZE)
+            for i in sorted(near) if len(near) > 1 else near:
+                obj = objects[i]
+                if (ROBOT_SIZE + obj["width"] / 2 - abs(nx - obj["x"]) > 0
+                        and ROBOT_SIZE + obj["height"] / 2 - abs(ny - obj["y"]) > 0):
+                    collision = {"collision": True, "type": obj["type"], "name": obj["name"],
+                                 "color": color_name(obj["color"]),
+                                 "side": collision_side(nx, ny, rb["rot"], obj["x"], obj["y"])}
+                    if obj["type"] != "movible":  # incluye "zona", igual que sim_server.js
+                        return False, collision, 0
+                    obj["x"] += move_dx
+                    obj["y"] += move_dy
+                    self._object_grid.move(i, obj["x"], obj["y"], obj["width"] / 2, obj["height"] / 2)
+
+        rb["x"] = nx
+        rb["y"] = ny
+        self._robot_grid.move(robot_id, nx, ny)
+        return True, collision, step
+
+    def update_rescue_progress(self):
+        if self.scenario != "rescate":
+            return
+        zones = [o for o in self.objects if o.get("role") == "zone"]
+        placed = 0
+        for it in (o for o in self.objects if o.get("role") == "item"):
+            for z in zones:
+                if list(it["targetColor"]) == list(z["zoneColor"]):
+                    if (abs(it["x"] - z["x"]) <= z["width"] / 2 - it["width"] / 2
+                            and abs(it["y"] - z["y"]) <= z["height"] / 2 - it["height"] / 2):
+                        placed += 1
+                    break
+        self.rescue["placed"] = placed
+        if placed == self.rescue["total"] and not self.rescue["done"]:
+            self.rescue["done"] = True
+            self.log_event("rescate_completed", total=self.rescue["total"])
+
+    # ----------------------------
+    # Tick
+    # ----------------------------
+    def step(self):
+        """Un tick de dt segundos simulados. Devuelve las colisiones del tick (texto)."""
+        self.events = []
+        self.time += self.dt
+        self.ticks += 1
+        now = self.time
+        collisions = []
+        if self.objects is not self._indexed_objects or len(self.objects) != self._indexed_count:
+            self._index_objects()
+        for rid in list(self.robots):
+            rb = self.robots[rid]
+            if rb.get("dr"):
+                self._dr_extrapolate(rb)
+            moved, collision, dist = self.apply_movement(rb, rid)
+            if moved and dist > 0:
+                rb["distance"] += dist
+            if now - rb["last_seen"] > TIMEOUT_SEC:
+                rb["alpha"] = max(0, rb["alpha"] - FADE_SPEED * 255)
+            if collision:
+                rb["collision"] = collision
+                rb["collisions_count"] += 1
+                collisions.append(f"{rid} chocó con {collision['name']} ({collision['color']}) por {collision['side']}")
+                self.log_event("collision", id=rid, name=rb["name"], obj_type=collision["type"],
+                               color=collision["color"], side=collision["side"], **{"with": collision["name"]})
+            else:
+                rb["collision"] = {"collision": False}
+            if now - rb["last_seen"] > REMOVE_SEC:
+                del self.robots[rid]
+                self._robot_grid.remove(rid)
+                del self._seq[rid]
+                self.log_event("robot_leave", id=rid)
+        self.update_rescue_progress()
+        return collisions
+
+    def state(self, collisions=()):
+        """Snapshot con la forma de "state_update" de sim_server.js."""
+        return {
+            "robots": [{"id": rid, "name": rb["name"], "x": rb["x"], "y": rb["y"], "tx": rb["tx"], "ty": rb["ty"],
+                        "rot": rb["rot"], "alpha": rb["alpha"], "color": rb["color"], "collision": rb["collision"],
+                        "distance": rb["distance"], "collisions_count": rb["collisions_count"],
+                        "cmd": rb["cmd"], "data": rb["data"]}
+                       for rid, rb in self.robots.items()],
+            "objects": self.objects,
+            "collisions": list(collisions),
+            "scenario": self.scenario,
+            "rescue": self.rescue,
+        }
+
+    def run(self, ticks=None, duration=None, controller=None, frames=True):
+        """
+        Corre sin esperas hasta `ticks` o `duration` segundos simulados.
+        controller(engine) se llama antes de cada tick (ahí se fijan objetivos).
+        Con frames=True es un generador de snapshots; con frames=False solo avanza.
+        """
+        if ticks is None:
+            ticks = math.inf if duration is None else round(duration / self.dt)
+        gen = self._loop(ticks, controller)
+        if frames:
+            return gen
+        for _ in gen:
+            pass
+        return None
+
+    def _loop(self, ticks, controller):
+        n = 0
+        while n < ticks:
+            if controller is not None:
+                controller(self)
+            collisions = self.step()
+            n += 1
+            yield self.state(collisions)
+            for rb in self.robots.values():
+                rb["cmd"] = None
+                rb["data"] = None
+
+    def metrics(self):
+        """Mismo resumen que GET /metrics."""
+        return {
+            "ts": int(self.time * 1000),
+            "robots": [{"id": rid, "name": rb["name"], "x": rb["x"], "y": rb["y"], "rot": rb["rot"],
+                        "distance": rb["distance"], "collisions": rb["collisions_count"]}
+                       for rid, rb in self.robots.items()],
+            "robots_count": len(self.robots),
+            "total_distance": sum(rb["distance"] for rb in self.robots.values()),
+            "total_collisions": sum(rb["collisions_count"] for rb in self.robots.values()),
+        }
+
+
+# ----------------------------
+# Corrida de prueba: python -m ester_grid.engine [escenario] [robots] [segundos]
+# ----------------------------
+def _random_walk(engine):
+    rng = engine.rng
+    for rid, rb in engine.robots.items():
+        if rb["collision"]["collision"] or math.hypot(rb["tx"] - rb["x"], rb["ty"] - rb["y"]) < 1e-6:
+            tx = rb["x"] + rng.uniform(-80, 80)
+            ty = rb["y"] + rng.uniform(-80, 80)
+            engine.set_target(rid, tx, ty, rot=math.degrees(math.atan2(ty - rb["y"], tx - rb["x"])) % 360)
+        else:
+            rb["last_seen"] = engine.time
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    scenario = sys.argv[1] if len(sys.argv) > 1 else "obstaculos"
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 60
+
+    eng = SimEngine(scenario, seed=0)
+    for i in range(n):
+        eng.add_robot(f"ROB{i+1}", eng.rng.uniform(0, WINDOW_W), eng.rng.uniform(0, WINDOW_H))
+    t0 = time.perf_counter()
+    eng.run(duration=seconds, controller=_random_walk, frames=False)
+    wall = time.perf_counter() - t0
+    m = eng.metrics()
+    print(f"[ENGINE] {scenario}: {n} robots, {len(eng.objects)} objetos, {eng.ticks} ticks "
+          f"({seconds:.0f} s simulados) en {wall:.2f} s → x{seconds / wall:.0f} tiempo real, "
+          f"{wall / eng.ticks * 1000:.2f} ms/tick")
+    print(f"[ENGINE] distancia total {m['total_distance']:.0f} px, colisiones {m['total_collisions']}")
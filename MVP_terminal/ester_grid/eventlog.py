@@ -0,0 +1,377 @@
+# ========================================================
+# ESTER-Grid - Almacén indexado de logs/events.log
+# Rotación por tamaño/tiempo, segmentos comprimidos e índices de tiempo y robot
+# ========================================================
+#
+# events.log (logEvent de sim_server.js) crece sin límite y responder
+# "colisiones de ROB7 entre 14:00 y 14:05" era leer y json.loads todo.
+# Layout en logs/:
+#
+#   events.log                     segmento activo (JSONL, lo escribe sim_server.js o EventStore.append)
+#   events-<ms>.log                segmento rotado, todavía en texto
+#   events-<ts0>-<ts1>.seg         segmento compactado: bloques zlib independientes de BLOCK_EVENTS líneas
+#   events-<ts0>-<ts1>.idx.json    índice del .seg: por bloque (ts0, ts1, offset, largo, n) y
+#                                  bloques por robot ("id") y por tipo
+#
+# Una consulta elige segmentos por nombre (rango de ts), bloques por índice
+# (tiempo ∩ robot ∩ tipo), descomprime solo esos y descarta líneas por
+# substring antes de json.loads. En los .log de texto (acotados por la
+# rotación) busca el inicio por bisección sobre ts.
+#
+#   store = EventStore()                       # logs/ del repo
+#   for ev in store.query(start="14:00", end="14:05", robot="ROB7", type="collision"):
+#       print(ev)
+#
+#   python -m ester_grid.eventlog query --robot ROB7 --type collision --from 14:00 --to 14:05
+#   python -m ester_grid.eventlog compact | stats
+
+import datetime
+import json
+import os
+import re
+import time
+import zlib
+
+from .config import LOGS_DIR
+
+ACTIVE_NAME = "events.log"
+BLOCK_EVENTS = 512
+BLOCK_BYTES = 1 << 16
+MAX_BYTES = 16 * 1024 * 1024     # rotación por tamaño (igual que sim_server.js)
+MAX_AGE_S = 3600                 # rotación por tiempo
+SETTLE_S = 5                     # no compactar un .log rotado que se modificó hace menos de esto
+TS_SKEW_MS = 1000                # appendFile asíncrono puede desordenar un poco los ts
+
+_ROLLED_RE = re.compile(r"^events-(\d+)\.log$")
+_SEG_RE = re.compile(r"^events-(\d+)-(\d+)(?:-\d+)?\.seg$")
+_TS_RE = re.compile(rb'"ts":(\d+)')
+
+
+def parse_time(value, now=None):
+    """ms epoch desde int/float, datetime, 'HH:MM[:SS]' (hoy) o ISO 'YYYY-MM-DD HH:MM[:SS]'."""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    if isinstance(value, datetime.datetime):
+        return int(value.timestamp() * 1000)
+    text = str(value).strip()
+    if text.isdigit():
+        return int(text)
+    if re.fullmatch(r"\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?", text):
+        today = datetime.datetime.fromtimestamp(now if now is not None else time.time()).date()
+        text = f"{today.isoformat()} {text}"
+    return int(datetime.datetime.fromisoformat(text).timestamp() * 1000)
+
+
+def _line_ts(line):
+    m = _TS_RE.search(line)
+    return int(m.group(1)) if m else None
+
+
+def event_type(ev):
+    """
+    Tipo del evento. Los logs viejos de colisión tienen "type" pisado por el
+    tipo del objeto ({ts, type, ...payload} con payload.type): se reconocen por "with"/"side".
+    """
+    if "with" in ev and "side" in ev:
+        return "collision"
+    return ev.get("type")
+
+
+def _needles(robot):
+    """Substrings que una línea tiene que contener (JSON.stringify / separators compactos)."""
+    if robot is None:
+        return []
+    return [b'"id":' + json.dumps(robot, ensure_ascii=False).encode("utf-8")]
+
+
+class EventStore:
+    """Segmentos de events.log con rotación, compresión e índices; ver cabecera del módulo."""
+
+    def __init__(self, directory=LOGS_DIR, max_bytes=MAX_BYTES, max_age=MAX_AGE_S, block_events=BLOCK_EVENTS):
+        self.dir = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.block_events = block_events
+        self.active_path = os.path.join(directory, ACTIVE_NAME)
+        self._f = None
+        self._opened_at = None
+        self._index_cache = {}  # path .idx.json -> (mtime, índice)
+        os.makedirs(directory, exist_ok=True)
+
+    # ----------------------------
+    # Escritura (mismo formato que logEvent)
+    # ----------------------------
+    def append(self, event):
+        """Agrega un evento dict ({"ts", "type", ...}); rota si corresponde."""
+        if self._f is None:
+            self._f = open(self.active_path, "ab")
+            self._opened_at = time.time()
+        if "ts" not in event:
+            event = {"ts": int(time.time() * 1000), **event}
+        self._f.write(json.dumps(event, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n")
+        if self._f.tell() >= self.max_bytes or time.time() - self._opened_at >= self.max_age:
+            self.rotate()
+
+    def log(self, type_, **payload):
+        self.append({"ts": int(time.time() * 1000), "type": type_, **payload})
+
+    def rotate(self, compact=True):
+        """Cierra events.log como events-<ms>.log y (por defecto) lo compacta."""
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        if not os.path.exists(self.active_path) or os.path.getsize(self.active_path) == 0:
+            return None
+        rolled = os.path.join(self.dir, f"events-{int(time.time() * 1000)}.log")
+        os.replace(self.active_path, rolled)
+        if compact:
+            return self.compact_file(rolled)
+        return rolled
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    # ----------------------------
+    # Compactación
+    # ----------------------------
+    def compact(self, settle=SETTLE_S):
+        """Compacta todos los events-<ms>.log rotados (los de sim_server.js incluidos)."""
+        done = []
+        now = time.time()
+        for name in sorted(os.listdir(self.dir)):
+            if not _ROLLED_RE.match(name):
+                continue
+            path = os.path.join(self.dir, name)
+            if now - os.path.getmtime(path) < settle:
+                continue  # puede quedar un appendFile en vuelo
+            seg = self.compact_file(path)
+            if seg:
+                done.append(seg)
+        return done
+
+    def compact_file(self, path):
+        with open(path, "rb") as f:
+            lines = [line for line in f.read().split(b"\n") if line.strip()]
+        if not lines:
+            os.remove(path)
+            return None
+        # ordenar por ts (el orden de llegada puede tener saltos chicos)
+        keyed = [(_line_ts(line) or 0, i, line) for i, line in enumerate(lines)]
+        keyed.sort()
+
+        blocks, robots, types = [], {}, {}
+        tmp_seg = path + ".seg.tmp"
+        with open(tmp_seg, "wb") as out:
+            start = 0
+            while start < len(keyed):
+                end, size = start, 0
+                while end < len(keyed) and end - start < self.block_events and size < BLOCK_BYTES:
+                    size += len(keyed[end][2]) + 1
+                    end += 1
+                chunk = keyed[start:end]
+                b = len(blocks)
+                for _ts, _i, line in chunk:
+                    try:
+                        ev = json.loads(line)
+                    except ValueError:
+                        continue
+                    rid = ev.get("id")
+                    if isinstance(rid, str):
+                        posting = robots.setdefault(rid, [])
+                        if not posting or posting[-1] != b:
+                            posting.append(b)
+                    posting = types.setdefault(str(event_type(ev)), [])
+                    if not posting or posting[-1] != b:
+                        posting.append(b)
+                data = zlib.compress(b"\n".join(line for _ts, _i, line in chunk) + b"\n", 6)
+                blocks.append([chunk[0][0], chunk[-1][0], out.tell(), len(data), len(chunk)])
+                out.write(data)
+                start = end
+
+        ts0, ts1 = keyed[0][0], keyed[-1][0]
+        base = os.path.join(self.dir, f"events-{ts0}-{ts1}")
+        if os.path.exists(base + ".seg"):
+            base += f"-{int(time.time() * 1000)}"  # mismo rango que otro segmento: no pisarlo
+        index = {"version": 1, "first_ts": ts0, "last_ts": ts1, "count": len(keyed),
+                 "blocks": blocks, "robots": robots, "types": types}
+        with open(base + ".idx.json.tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_seg, base + ".seg")
+        os.replace(base + ".idx.json.tmp", base + ".idx.json")
+        os.remove(path)
+        return base + ".seg"
+
+    # ----------------------------
+    # Consultas
+    # ----------------------------
+    def _segments(self):
+        """(tipo, path, ts0, ts1) en orden de tiempo; ts None = desconocido (texto)."""
+        segs, texts = [], []
+        for name in os.listdir(self.dir):
+            m = _SEG_RE.match(name)
+            if m:
+                segs.append(("seg", os.path.join(self.dir, name), int(m.group(1)), int(m.group(2))))
+                continue
+            m = _ROLLED_RE.match(name)
+            if m:
+                texts.append(("log", os.path.join(self.dir, name), None, int(m.group(1))))
+        segs.sort(key=lambda s: (s[2], s[3]))
+        texts.sort(key=lambda s: s[3])
+        out = segs + texts
+        if os.path.exists(self.active_path):
+            out.append(("log", self.active_path, None, None))
+        return out
+
+    def _index(self, seg_path):
+        idx_path = seg_path[:-len(".seg")] + ".idx.json"
+        mtime = os.path.getmtime(idx_path)
+        cached = self._index_cache.get(idx_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(idx_path, encoding="utf-8") as f:
+            index = json.load(f)
+        self._index_cache[idx_path] = (mtime, index)
+        return index
+
+    def query(self, start=None, end=None, robot=None, type=None, where=None, limit=None):
+        """
+        Eventos con start <= ts <= end (ms epoch, datetime o 'HH:MM'), del robot
+        `robot` ("id") y tipo `type`. where(ev) filtra además por cualquier campo.
+        """
+        start, end = parse_time(start), parse_time(end)
+        needles = _needles(robot)
+        n = 0
+        for kind, path, ts0, ts1 in self._segments():
+            if kind == "seg":
+                if (start is not None and ts1 < start) or (end is not None and ts0 > end):
+                    continue
+                events = self._query_seg(path, start, end, robot, type, needles)
+            else:
+                if start is not None and ts1 is not None and ts1 < start - TS_SKEW_MS:
+                    continue  # rotado antes del inicio del rango
+                events = self._query_log(path, start, end, needles)
+            for ev in events:
+                if (robot is not None and ev.get("id") != robot) or (type is not None and event_type(ev) != type):
+                    continue
+                if where is not None and not where(ev):
+                    continue
+                yield ev
+                n += 1
+                if limit is not None and n >= limit:
+                    return
+
+    def _query_seg(self, path, start, end, robot, type_, needles):
+        index = self._index(path)
+        blocks = index["blocks"]
+        candidates = None
+        if robot is not None:
+            candidates = set(index["robots"].get(robot, ()))
+        if type_ is not None:
+            by_type = set(index["types"].get(type_, ()))
+            candidates = by_type if candidates is None else candidates & by_type
+        selected = sorted(candidates) if candidates is not None else range(len(blocks))
+        with open(path, "rb") as f:
+            for b in selected:
+                b_ts0, b_ts1, off, length, _count = blocks[b]
+                if (start is not None and b_ts1 < start) or (end is not None and b_ts0 > end):
+                    continue
+                f.seek(off)
+                for line in zlib.decompress(f.read(length)).split(b"\n"):
+                    if not line or any(nd not in line for nd in needles):
+                        continue
+                    ts = _line_ts(line)
+                    if ts is None or (start is not None and ts < start) or (end is not None and ts > end):
+                        continue
+                    yield json.loads(line)
+
+    def _query_log(self, path, start, end, needles):
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            if start is not None:
+                f.seek(self._bisect(f, start - TS_SKEW_MS))
+            for line in f:
+                ts = _line_ts(line)
+                if ts is None:
+                    continue
+                if end is not None and ts > end + TS_SKEW_MS:
+                    break
+                if (start is not None and ts < start) or (end is not None and ts > end):
+                    continue
+                if any(nd not in line for nd in needles):
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # línea a medio escribir
+
+    @staticmethod
+    def _bisect(f, target):
+        """Offset de comienzo de una línea con ts < target, cerca del comienzo del rango."""
+        f.seek(0, os.SEEK_END)
+        lo, hi = 0, f.tell()
+        while hi - lo > 4096:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            f.readline()  # alinear al comienzo de la línea siguiente
+            pos = f.tell()
+            line = f.readline()
+            ts = _line_ts(line) if line else None
+            if ts is not None and ts < target:
+                lo = pos
+            else:
+                hi = mid
+        return lo
+
+    def stats(self):
+        out = {"segments": 0, "compressed_bytes": 0, "events_indexed": 0, "text_segments": 0, "text_bytes": 0}
+        for kind, path, _ts0, _ts1 in self._segments():
+            if kind == "seg":
+                out["segments"] += 1
+                out["compressed_bytes"] += os.path.getsize(path)
+                out["events_indexed"] += self._index(path)["count"]
+            else:
+                out["text_segments"] += 1
+                out["text_bytes"] += os.path.getsize(path)
+        return out
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.eventlog", description="Consultas sobre logs/events.log")
+    ap.add_argument("--dir", default=LOGS_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    q = sub.add_parser("query", help="eventos por rango de tiempo, robot y tipo (JSONL a stdout)")
+    q.add_argument("--from", dest="start")
+    q.add_argument("--to", dest="end")
+    q.add_argument("--robot")
+    q.add_argument("--type")
+    q.add_argument("--limit", type=int)
+    q.add_argument("--count", action="store_true", help="solo contar")
+    sub.add_parser("compact", help="comprimir e indexar los segmentos rotados")
+    sub.add_parser("stats", help="resumen del almacén")
+    args = ap.parse_args()
+
+    store = EventStore(args.dir)
+    if args.cmd == "compact":
+        for seg in store.compact():
+            print(f"[EVENTLOG] {seg}")
+    elif args.cmd == "stats":
+        for k, v in store.stats().items():
+            print(f"{k}: {v}")
+    else:
+        t0 = time.perf_counter()
+        n = 0
+        for ev in store.query(args.start, args.end, robot=args.robot, type=args.type, limit=args.limit):
+            n += 1
+            if not args.count:
+                print(json.dumps(ev, ensure_ascii=False))
+        print(f"[EVENTLOG] {n} eventos en {(time.perf_counter() - t0) * 1000:.1f} ms", file=sys.stderr)
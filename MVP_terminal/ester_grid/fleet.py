@@ -0,0 +1,185 @@
+# ========================================================
+# ESTER-Grid - Flota asyncio (un solo hilo para muchos robots)
+# ========================================================
+#
+# robots_30_udp.py lanzaba 2 hilos por robot (+1 receptor por socket);
+# con 30 robots eran ~90 hilos peleando por el GIL. Acá todos los robots
+# son corutinas sobre UN event loop:
+#
+#   - el reloj de la flota avanza con deadlines monótonos (sin deriva)
+#   - cada robot espera `await fleet.tick()` (un Future compartido por tick)
+#   - al final de cada tick se envían los cambios de toda la flota en
+#     frames StateBatch (ver binary.py) por un único endpoint UDP
+#
+# Uso:
+#
+#   async def cuadrado(robot, fleet):
+#       while True:
+#           robot.pos[0] += 1
+#           robot.send_state()
+#           await fleet.tick()
+#
+#   fleet = Fleet(tick=0.02)
+#   for i in range(1000):
+#       fleet.spawn(cuadrado, fleet.robot(f"R{i}", (i % 900, i // 900 * 20)))
+#   fleet.run(duration=10)
+
+import asyncio
+import json
+
+from .binary import StateBatch
+from .config import SIM_IP, SIM_PORT
+
+
+class FleetRobot:
+    """Robot de flota: mismo estado que RobotClient, pero envía vía el batch del tick."""
+
+    def __init__(self, fleet, robot_id, start_pos=(0.0, 0.0), start_rot=0, color=None):
+        self.fleet = fleet
+        self.robot_id = robot_id
+        self.pos = [start_pos[0], start_pos[1]]
+        self.rot = start_rot
+        self.color = list(color) if color else [200, 200, 200]
+
+    def send_state(self):
+        self.fleet.batch.add_robot(self)
+
+    def teleport(self, x, y, rot=0):
+        self.pos = [x, y]
+        self.rot = rot
+        self.fleet.batch.add_robot(self, teleport=True)
+
+
+class _JsonProtocol(asyncio.DatagramProtocol):
+    def __init__(self, handler):
+        self.handler = handler
+
+    def datagram_received(self, data, addr):
+        try:
+            packet = json.loads(data)
+        except ValueError:
+            return
+        self.handler(packet, addr)
+
+
+class Fleet:
+    """Runtime de flota: reloj de ticks, corutinas de comportamiento y UDP en un solo loop."""
+
+    def __init__(self, tick=0.05, sim_addr=None, fixed=False):
+        self.tick_s = tick
+        self.sim_addr = sim_addr or (SIM_IP, SIM_PORT)
+        self.batch = StateBatch(fixed=fixed)
+        self.robots = {}
+        self.tick_count = 0
+        self.late_ticks = 0        # ticks que arrancaron después de su deadline
+        self.max_lateness = 0.0    # segundos
+        self._pending = []         # (behavior, robot, args) a lanzar en run()
+        self._listeners = []       # (local_addr, handler)
+        self._tasks = []
+        self._alive = 0
+        self._tick_fut = None
+        self._transport = None
+        self._running = False
+
+    # ----------------------------
+    # Armado
+    # ----------------------------
+    def robot(self, robot_id, start_pos=(0.0, 0.0), start_rot=0, color=None):
+        rb = FleetRobot(self, robot_id, start_pos, start_rot, color)
+        self.robots[robot_id] = rb
+        return rb
+
+    def spawn(self, behavior, robot, *args):
+        """Registra la corutina behavior(robot, fleet, *args) como tarea del loop."""
+        if self._running:
+            self._start(behavior, robot, args)
+        else:
+            self._pending.append((behavior, robot, args))
+
+    def listen(self, local_addr, handler):
+        """Endpoint UDP extra (comandos, mensajes): handler(packet_dict, addr) en el loop."""
+        self._listeners.append((local_addr, handler))
+
+    # ----------------------------
+    # API para comportamientos
+    # ----------------------------
+    def tick(self):
+        """Awaitable que se resuelve al comenzar el próximo tick (devuelve su número)."""
+        return self._tick_fut
+
+    async def ticks(self, n):
+        for _ in range(n):
+            await self._tick_fut
+
+    def sendto(self, data, addr):
+        self._transport.sendto(data, addr)
+
+    # ----------------------------
+    # Loop
+    # ----------------------------
+    def _start(self, behavior, robot, args):
+        task = asyncio.ensure_future(behavior(robot, self, *args))
+        self._alive += 1
+        task.add_done_callback(self._task_done)
+        self._tasks.append(task)
+
+    def _task_done(self, task):
+        self._alive -= 1
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[FLOTA] Error en comportamiento: {task.exception()!r}")
+
+    async def _clock(self, duration):
+        loop = asyncio.get_running_loop()
+        start = deadline = loop.time()
+        while self._running:
+            deadline += self.tick_s
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                lateness = -delay
+                self.late_ticks += 1
+                self.max_lateness = max(self.max_lateness, lateness)
+                if lateness > self.tick_s:
+                    deadline = loop.time()  # saltear ticks perdidos en vez de acumular ráfagas
+            self.tick_count += 1
+            fut, self._tick_fut = self._tick_fut, loop.create_future()
+            fut.set_result(self.tick_count)
+            # ceder el loop una vez: los robots despertados corren su paso
+            # antes de que se envíe el batch del tick
+            await asyncio.sleep(0)
+            self.batch.flush(self._transport, self.sim_addr)
+            if duration is not None and loop.time() - start >= duration:
+                self._running = False
+            if self._alive == 0:
+                self._running = False
+
+    async def run_async(self, duration=None):
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, local_addr=("0.0.0.0", 0))
+        extra = []
+        for local_addr, handler in self._listeners:
+            tr, _ = await loop.create_datagram_endpoint(
+                lambda h=handler: _JsonProtocol(h), local_addr=local_addr)
+            extra.append(tr)
+        self._tick_fut = loop.create_future()
+        self._running = True
+        for behavior, robot, args in self._pending:
+            self._start(behavior, robot, args)
+        self._pending = []
+        try:
+            await self._clock(duration)
+        finally:
+            self._running = False
+            for t in self._tasks:
+                t.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self.batch.flush(self._transport, self.sim_addr)
+            for tr in extra:
+                tr.close()
+            self._transport.close()
+
+    def run(self, duration=None):
+        """Ejecuta la flota hasta `duration` segundos o hasta que terminen todos los robots."""
+        asyncio.run(self.run_async(duration))
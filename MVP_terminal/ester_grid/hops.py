@@ -0,0 +1,311 @@
+# ========================================================
+# ESTER-Grid - Latencia por tramo (histogramas HDR por hop y por robot)
+# ========================================================
+#
+# Cada salto agrega su timestamp (µs epoch) al campo "ht" del paquete:
+#
+#   robot       StatePacket(..., hops=True)        "ht":[envío]
+#   dispatcher  createForwardSocket                "ht":[envío, recepción, reenvío]
+#   simulador   handle_state / tick de 50 ms       + recepción, + state_update
+#
+# El simulador junta los registros de cada tick y los manda a este colector
+# por UDP ({"type":"hops","records":[[src, ht, t_sim, t_emit], ...]}) con
+# ESTER_HOPS=127.0.0.1:10012 (robots_30_udp.py solo agrega "ht" con la
+# misma variable definida). Los tramos son:
+#
+#   robot_to_dispatcher  envío → recepción en el dispatcher
+#   dispatcher           recepción → reenvío (JSON.parse + send)
+#   dispatcher_to_sim    reenvío → recepción en el simulador
+#   robot_to_sim         envío → recepción en el simulador (robots directos al 10009)
+#   sim_to_emit          recepción → io.emit("state_update") (espera del tick)
+#   end_to_end           envío → io.emit
+#
+# Los relojes son time.time_ns() y performance.timeOrigin: en máquinas
+# distintas hace falta NTP/PTP; los deltas negativos se cuentan en "skew".
+#
+#   python -m ester_grid.hops [--port 10012] [--http 9109] [--per-robot]
+#   curl localhost:9109/metrics      (formato Prometheus)
+#   curl localhost:9109/hops.json
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import HOPS_HTTP_PORT, HOPS_PORT
+
+SUB_BITS = 7                    # 128 sub-cubetas por potencia de 2: error relativo < 1/128
+SUB_COUNT = 1 << SUB_BITS
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+HOPS_VIA_DISPATCHER = ("robot_to_dispatcher", "dispatcher", "dispatcher_to_sim", "sim_to_emit", "end_to_end")
+HOPS_DIRECT = ("robot_to_sim", "sim_to_emit", "end_to_end")
+
+
+class Histogram:
+    """Histograma log-lineal (estilo HdrHistogram) de enteros ≥ 0, en µs."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(v):
+        if v < SUB_COUNT:
+            return v
+        shift = v.bit_length() - SUB_BITS - 1
+        return ((shift + 1) << SUB_BITS) + ((v >> shift) - SUB_COUNT)
+
+    @staticmethod
+    def _value(idx):
+        """Límite superior de la cubeta idx."""
+        if idx < SUB_COUNT:
+            return idx
+        shift = (idx >> SUB_BITS) - 1
+        return ((SUB_COUNT + (idx & (SUB_COUNT - 1)) + 1) << shift) - 1
+
+    def record(self, v, n=1):
+        v = max(0, int(v))
+        idx = self._index(v)
+        self.counts[idx] = self.counts.get(idx, 0) + n
+        self.count += n
+        self.total += v * n
+        self.min = v if self.min is None else min(self.min, v)
+        self.max = max(self.max, v)
+
+    def merge(self, other):
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(self._value(idx), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self):
+        out = {"count": self.count, "min_us": self.min, "mean_us": self.mean(), "max_us": self.max}
+        for q in QUANTILES:
+            out[f"p{q * 100:g}_us"] = self.percentile(q)
+        return out
+
+
+def hop_deltas(ht, t_sim, t_emit):
+    """[(tramo, µs)] de un registro; ht de 1 entrada (directo) o 3 (vía dispatcher)."""
+    sent = ht[0]
+    if len(ht) >= 3:
+        d_recv, d_fwd = ht[1], ht[2]
+        return [("robot_to_dispatcher", d_recv - sent), ("dispatcher", d_fwd - d_recv),
+                ("dispatcher_to_sim", t_sim - d_fwd), ("sim_to_emit", t_emit - t_sim),
+                ("end_to_end", t_emit - sent)]
+    return [("robot_to_sim", t_sim - sent), ("sim_to_emit", t_emit - t_sim), ("end_to_end", t_emit - sent)]
+
+
+class HopCollector:
+    """
+    Recibe los registros del simulador por UDP y acumula un Histogram por
+    tramo y, con per_robot=True, otro por (robot, tramo).
+    """
+
+    def __init__(self, port=HOPS_PORT, host="0.0.0.0", per_robot=True):
+        self.addr = (host, port)
+        self.per_robot = per_robot
+        self.hops = {}        # tramo -> Histogram
+        self.robots = {}      # robot -> {tramo -> Histogram}
+        self.records = 0
+        self.skew = 0         # deltas negativos (relojes desincronizados)
+        self.bad = 0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add(self, src, ht, t_sim, t_emit):
+        deltas = hop_deltas(ht, t_sim, t_emit)
+        with self._lock:
+            self.records += 1
+            per = self.robots.setdefault(src, {}) if self.per_robot else None
+            for hop, d in deltas:
+                if d < 0:
+                    self.skew += 1
+                    d = 0
+                h = self.hops.get(hop)
+                if h is None:
+                    h = self.hops[hop] = Histogram()
+                h.record(d)
+                if per is not None:
+                    h = per.get(hop)
+                    if h is None:
+                        h = per[hop] = Histogram()
+                    h.record(d)
+
+    def feed(self, data):
+        try:
+            msg = json.loads(data)
+            if msg.get("type") != "hops":
+                return
+            for src, ht, t_sim, t_emit in msg["records"]:
+                if not ht:
+                    continue
+                self.add(src, ht, t_sim, t_emit)
+        except (ValueError, KeyError, TypeError):
+            self.bad += 1
+
+    # ----------------------------
+    # Hilo receptor
+    # ----------------------------
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self._sock.bind(self.addr)
+        self._sock.settimeout(0.5)
+        self._thread = threading.Thread(target=self._loop, name="hops-collector", daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                data, _ = self._sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.feed(data)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        if self._sock is not None:
+            self._sock.close()
+
+    def reset(self):
+        with self._lock:
+            self.hops.clear()
+            self.robots.clear()
+            self.records = self.skew = self.bad = 0
+            self.started_at = time.time()
+
+    # ----------------------------
+    # Exposición
+    # ----------------------------
+    def snapshot(self, per_robot=False):
+        with self._lock:
+            out = {
+                "started_at": self.started_at,
+                "records": self.records,
+                "skew": self.skew,
+                "bad": self.bad,
+                "hops": {hop: h.summary() for hop, h in self.hops.items()},
+            }
+            if per_robot:
+                out["robots"] = {rid: {hop: h.summary() for hop, h in hops.items()}
+                                 for rid, hops in self.robots.items()}
+        return out
+
+    def prometheus(self, per_robot=False):
+        lines = [
+            "# HELP ester_hop_latency_us Latencia por tramo robot→dispatcher→simulador→state_update",
+            "# TYPE ester_hop_latency_us summary",
+        ]
+        with self._lock:
+            series = [({"hop": hop}, h) for hop, h in sorted(self.hops.items())]
+            if per_robot:
+                series += [({"hop": hop, "robot": rid}, h)
+                           for rid, hops in sorted(self.robots.items()) for hop, h in sorted(hops.items())]
+            for labels, h in series:
+                base = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                for q in QUANTILES:
+                    lines.append(f'ester_hop_latency_us{{{base},quantile="{q:g}"}} {h.percentile(q)}')
+                lines.append(f"ester_hop_latency_us_sum{{{base}}} {h.total}")
+                lines.append(f"ester_hop_latency_us_count{{{base}}} {h.count}")
+            lines += [
+                "# TYPE ester_hop_records_total counter",
+                f"ester_hop_records_total {self.records}",
+                "# TYPE ester_hop_clock_skew_total counter",
+                f"ester_hop_clock_skew_total {self.skew}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def serve(collector, port=HOPS_HTTP_PORT, host="0.0.0.0"):
+    """Servidor HTTP en un hilo: /metrics (Prometheus, ?robots=1 por robot) y /hops.json."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            per_robot = "robots=1" in query
+            if path == "/metrics":
+                body, ctype = collector.prometheus(per_robot).encode(), "text/plain; version=0.0.4"
+            elif path == "/hops.json":
+                body, ctype = json.dumps(collector.snapshot(per_robot)).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="hops-http", daemon=True).start()
+    return httpd
+
+
+def _print_table(snap):
+    print(f"[HOPS] {snap['records']} registros  (skew {snap['skew']}, inválidos {snap['bad']})")
+    order = [h for h in HOPS_VIA_DISPATCHER + HOPS_DIRECT if h in snap["hops"]]
+    for hop in dict.fromkeys(order):
+        s = snap["hops"][hop]
+        print(f"  {hop:<20} n={s['count']:<8} p50={s['p50_us']:>8} p99={s['p99_us']:>8} "
+              f"p99.9={s['p99.9_us']:>8} max={s['max_us']:>8} µs")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.hops", description="Colector de latencia por tramo")
+    ap.add_argument("--port", type=int, default=HOPS_PORT, help="UDP donde el simulador manda los registros")
+    ap.add_argument("--http", type=int, default=HOPS_HTTP_PORT, help="puerto de /metrics (0 = sin HTTP)")
+    ap.add_argument("--per-robot", action="store_true", help="histogramas también por robot")
+    ap.add_argument("--every", type=float, default=5.0, help="segundos entre resúmenes por consola")
+    args = ap.parse_args()
+
+    col = HopCollector(args.port, per_robot=args.per_robot).start()
+    if args.http:
+        serve(col, args.http)
+        print(f"[HOPS] /metrics en http://0.0.0.0:{args.http}/metrics")
+    print(f"[HOPS] Escuchando UDP {args.port} (sim_server.js con ESTER_HOPS=127.0.0.1:{args.port})")
+    try:
+        while True:
+            time.sleep(args.every)
+            _print_table(col.snapshot())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        col.stop()
@@ -0,0 +1,227 @@
+# ========================================================
+# ESTER-Grid - Cinemática vectorizada de flota (NumPy)
+# ========================================================
+#
+# En robots_30_udp.coreografia cada robot en STATE_AVANZAR recorre la
+# fila contraria con min(...) en cada tick → O(N²) en Python por tick.
+# Acá toda la flota vive en arrays: posiciones, rumbos, estado FSM y fila.
+# Un tick es un puñado de operaciones NumPy + una reducción por fila, y el
+# envío arma los frames StateBatch directamente desde los arrays.
+#
+# Requiere numpy (pip install numpy).
+
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # dependencia opcional
+    np = None
+
+from .binary import (
+    ENTRY_TELEPORT, FIXED_POS_SCALE, FIXED_ROT_SCALE, FLAG_FIXED, INTERN_EVERY,
+    KIND_BATCH, MAGIC, MAX_DATAGRAM, intern_id,
+)
+
+# Estados de la coreografía por filas (mismos valores que robots_30_udp)
+STATE_INICIAL = 0
+STATE_GIRAR = 1
+STATE_AVANZAR = 2
+STATE_RETROCEDER = 3
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("ester_grid.kinematics requiere numpy: pip install numpy")
+
+
+def _entry_dtype(fixed):
+    if fixed:
+        return np.dtype([("rid", "<u2"), ("rgb", "u1", 3), ("flags", "u1"),
+                         ("x", "<i2"), ("y", "<i2"), ("rot", "<u2")])
+    return np.dtype([("rid", "<u2"), ("rgb", "u1", 3), ("flags", "u1"),
+                     ("x", "<f4"), ("y", "<f4"), ("rot", "<f4")])
+
+
+class FleetState:
+    """Estado de N robots en arrays NumPy (x, y, rot, state, row, home, color)."""
+
+    def __init__(self, robot_ids, colors=None, fixed=False):
+        _require_numpy()
+        self.ids = list(robot_ids)
+        n = len(self.ids)
+        self.n = n
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.rot = np.zeros(n)
+        self.state = np.zeros(n, dtype=np.int8)
+        self.row = np.zeros(n, dtype=np.int16)
+        self.home_x = np.zeros(n)
+        self.home_y = np.zeros(n)
+        self.color = np.full((n, 3), 200, dtype=np.uint8) if colors is None else np.asarray(colors, dtype=np.uint8)
+        self.fixed = fixed
+
+        self._rids = np.array([intern_id(rid) for rid in self.ids], dtype=np.uint16)
+        self._dtype = _entry_dtype(fixed)
+        self._entries = np.zeros(n, dtype=self._dtype)
+        self._entries["rid"] = self._rids
+        self._last = None  # (x, y, rot) enviados por última vez
+        self._teleport = np.zeros(n, dtype=bool)
+        self._frames_sent = 0
+
+    # ----------------------------
+    # Movimiento
+    # ----------------------------
+    def place(self, x, y, rot=None, home=True):
+        """Teletransporta a toda la flota (y opcionalmente fija 'home')."""
+        self.x[:] = x
+        self.y[:] = y
+        if rot is not None:
+            self.rot[:] = rot
+        if home:
+            self.home_x[:] = self.x
+            self.home_y[:] = self.y
+        self._teleport[:] = True
+
+    def advance(self, speed, mask=None):
+        """Avanza `speed` px en la dirección de rot (grados)."""
+        rad = np.radians(self.rot if mask is None else self.rot[mask])
+        if mask is None:
+            self.x += speed * np.cos(rad)
+            self.y += speed * np.sin(rad)
+        else:
+            self.x[mask] += speed * np.cos(rad)
+            self.y[mask] += speed * np.sin(rad)
+
+    def step_towards(self, tx, ty, speed, mask=None):
+        """move_towards vectorizado. Devuelve máscara de robots que llegaron."""
+        sel = slice(None) if mask is None else mask
+        dx = tx - self.x[sel]
+        dy = ty - self.y[sel]
+        dist = np.hypot(dx, dy)
+        arrived = dist <= speed
+        k = np.where(arrived, 1.0, speed / np.maximum(dist, 1e-9))
+        self.x[sel] += dx * k
+        self.y[sel] += dy * k
+        moving = ~arrived
+        if np.any(moving):
+            rot = self.rot[sel]
+            rot[moving] = np.degrees(np.arctan2(dy[moving], dx[moving])) % 360
+            self.rot[sel] = rot
+        return arrived
+
+    def circle(self, cx, cy, radius, angle=0.0):
+        """Ubica a la flota repartida en un círculo (latido de ejemplo8 con radius por robot)."""
+        base = np.arange(self.n) * (2 * np.pi / self.n) + angle
+        self.x[:] = cx + radius * np.cos(base)
+        self.y[:] = cy + radius * np.sin(base)
+
+    def sinusoid(self, i, dy=2.0, amp=40.0, pasos=120):
+        """mover_sinusoidal de ejemplo4 para toda la flota (paso i)."""
+        fase = i / 12.0 + np.arange(self.n) * 0.1
+        self.y += dy
+        self.x += np.sin(fase) * (amp / pasos * 6)
+        self.rot[:] = (90 + np.sin(fase) * 30) % 360
+
+    # ----------------------------
+    # Envío (frames StateBatch desde los arrays)
+    # ----------------------------
+    def frames(self, changed_only=True, mtu=MAX_DATAGRAM):
+        """Frames KIND_BATCH con los robots que cambiaron desde el último envío."""
+        cur = np.stack((self.x, self.y, self.rot))
+        if changed_only and self._last is not None:
+            mask = np.any(cur != self._last, axis=0) | self._teleport
+        else:
+            mask = np.ones(self.n, dtype=bool)
+        self._last = cur.copy()
+
+        e = self._entries
+        e["rgb"] = self.color
+        e["flags"] = np.where(self._teleport, ENTRY_TELEPORT, 0)
+        if self.fixed:
+            e["x"] = np.clip(np.rint(self.x * FIXED_POS_SCALE), -32768, 32767)
+            e["y"] = np.clip(np.rint(self.y * FIXED_POS_SCALE), -32768, 32767)
+            e["rot"] = (np.rint((self.rot % 360) * FIXED_ROT_SCALE).astype(np.int64) & 0xFFFF)
+        else:
+            e["x"] = self.x
+            e["y"] = self.y
+            e["rot"] = self.rot
+        self._teleport[:] = False
+
+        kind = KIND_BATCH | (FLAG_FIXED if self.fixed else 0)
+        frames = []
+        if self._frames_sent % INTERN_EVERY == 0:
+            frames.extend(self._intern_frames(kind, mtu))
+        self._frames_sent += 1
+
+        sel = e[mask]
+        per_frame = min(255, (mtu - 4) // self._dtype.itemsize)
+        for i in range(0, len(sel), per_frame):
+            chunk = sel[i:i + per_frame]
+            frames.append(struct.pack("<BBBB", MAGIC, kind, 0, len(chunk)) + chunk.tobytes())
+        return frames
+
+    def _intern_frames(self, kind, mtu):
+        frames, chunk, size = [], [], 4
+        for rid, robot_id in zip(self._rids.tolist(), self.ids):
+            name = robot_id.encode("utf-8")[:255]
+            item = struct.pack("<HB", rid, len(name)) + name
+            if size + len(item) > mtu or len(chunk) == 255:
+                frames.append(struct.pack("<BBBB", MAGIC, kind, len(chunk), 0) + b"".join(chunk))
+                chunk, size = [], 4
+            chunk.append(item)
+            size += len(item)
+        if chunk:
+            frames.append(struct.pack("<BBBB", MAGIC, kind, len(chunk), 0) + b"".join(chunk))
+        return frames
+
+    def flush(self, sock, addr):
+        frames = self.frames()
+        for frame in frames:
+            sock.sendto(frame, addr)
+        return len(frames)
+
+
+class RowsChoreography:
+    """
+    coreografia() de robots_30_udp para toda la flota: dos filas que avanzan
+    una hacia la otra hasta quedar a MIN_DIST y vuelven a su posición inicial.
+    row 0 = fila de arriba (avanza +y), row 1 = fila de abajo (avanza -y).
+    """
+
+    def __init__(self, fleet, speed=1.0, min_dist=30.0):
+        self.fleet = fleet
+        self.speed = speed
+        self.min_dist = min_dist
+
+    def step(self):
+        f = self.fleet
+        speed = self.speed
+        arriba = f.row == 0
+        abajo = ~arriba
+
+        # INICIAL → GIRAR → AVANZAR (un tick cada uno, como en la versión con hilos)
+        f.state[f.state == STATE_GIRAR] = STATE_AVANZAR
+        f.state[f.state == STATE_INICIAL] = STATE_GIRAR
+
+        # Una reducción por fila en lugar de un min() por robot
+        min_abajo = f.y.min(where=abajo, initial=np.inf)
+        max_arriba = f.y.max(where=arriba, initial=-np.inf)
+
+        avanzando = f.state == STATE_AVANZAR
+        baja = avanzando & arriba
+        puede = f.y + speed < min_abajo - self.min_dist
+        f.y[baja & puede] += speed
+        f.state[baja & ~puede] = STATE_RETROCEDER
+
+        sube = avanzando & abajo
+        puede = f.y - speed > max_arriba + self.min_dist
+        f.y[sube & puede] -= speed
+        f.state[sube & ~puede] = STATE_RETROCEDER
+
+        volviendo = f.state == STATE_RETROCEDER
+        if np.any(volviendo):
+            rot = f.rot.copy()
+            llegaron = f.step_towards(f.home_x[volviendo], f.home_y[volviendo], speed, mask=volviendo)
+            f.rot[:] = rot  # la coreografía original no cambia el rumbo al volver
+            idx = np.flatnonzero(volviendo)[llegaron]
+            f.state[idx] = STATE_INICIAL
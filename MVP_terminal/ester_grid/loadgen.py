@@ -0,0 +1,338 @@
+# ========================================================
+# ESTER-Grid - Generador de carga sintético (decenas de miles de robots)
+# ========================================================
+#
+# robots_30_udp llega a 30 robots: no alcanza para ver dónde se caen los
+# sockets por robot de dispatcher.js o el console.log por paquete del
+# simulador. Este generador reparte N robots en P procesos y mantiene una
+# tasa agregada objetivo:
+#   - estados a `rate` Hz por robot (JSON con StatePacket o binario con StateBatch)
+#     directo al simulador, a un puerto fijo, o al dispatcher vía register_fleet
+#   - modelos de movimiento: static, random_walk, circle, lanes
+#   - mezcla para el router UDP 10011: register de todos, msg a robots al azar
+#     (msg_rate Hz por robot), broadcast (Hz agregados) y pares de gemelos
+#     (twin_register con TWIN_<id> para una fracción de la flota)
+# El envío de cada tick se reparte en rebanadas de SLICE s; si un proceso se
+# atrasa, las rebanadas siguientes recuperan lo adeudado (token bucket).
+# Al final informa tasa pedida vs lograda por clase y lo recibido del router.
+#
+#   python -m ester_grid.loadgen --robots 20000 --procs 4 --rate 20 --duration 30
+#   python -m ester_grid.loadgen --robots 5000 --to dispatcher --msg-rate 0.5 --broadcast-rate 2 --twins 0.05
+#   python -m ester_grid.loadgen --robots 50000 --binary --model circle --to 127.0.0.1:20010
+
+import json
+import math
+import multiprocessing as mp
+import random
+import socket
+import sys
+import time
+
+from .binary import StateBatch
+from .client import StatePacket
+from .config import DISP_IP, DISP_MSG_PORT, SIM_IP, SIM_PORT, WINDOW_H, WINDOW_W
+from .transport import send_many
+
+MODELS = ("static", "random_walk", "circle", "lanes")
+SLICE = 0.005          # rebanada de envío dentro de un tick (s)
+MAX_CATCHUP = 4        # nunca adeudar más de 4 ticks de paquetes (evita ráfagas sin fin)
+REGISTER_BURST = 500   # registers al router antes de una pausa corta
+
+
+# ----------------------------
+# Movimiento
+# ----------------------------
+class Movement:
+    """Posiciones de n robots según `model`; step(t) las actualiza en el lugar."""
+
+    def __init__(self, model, n, seed=0):
+        if model not in MODELS:
+            raise ValueError(f"Modelo desconocido: {model} (opciones: {', '.join(MODELS)})")
+        self.model = model
+        rng = random.Random(seed)
+        self.rng = rng
+        self.hx = [rng.uniform(20, WINDOW_W - 20) for _ in range(n)]
+        self.hy = [rng.uniform(20, WINDOW_H - 20) for _ in range(n)]
+        self.phase = [rng.uniform(0, 2 * math.pi) for _ in range(n)]
+        self.x = list(self.hx)
+        self.y = list(self.hy)
+        self.rot = [0.0] * n
+
+    def step(self, t):
+        x, y, rot = self.x, self.y, self.rot
+        if self.model == "static":
+            return
+        if self.model == "random_walk":
+            rnd = self.rng.random
+            for i in range(len(x)):
+                a = rot[i] + (rnd() - 0.5) * 40
+                rad = math.radians(a)
+                x[i] = min(WINDOW_W, max(0.0, x[i] + 2 * math.cos(rad)))
+                y[i] = min(WINDOW_H, max(0.0, y[i] + 2 * math.sin(rad)))
+                rot[i] = a % 360
+        elif self.model == "circle":
+            hx, hy, ph = self.hx, self.hy, self.phase
+            for i in range(len(x)):
+                a = t + ph[i]
+                x[i] = hx[i] + 15 * math.cos(a)
+                y[i] = hy[i] + 15 * math.sin(a)
+                rot[i] = (math.degrees(a) + 90) % 360
+        else:  # lanes: ida y vuelta horizontal
+            hx, ph = self.hx, self.phase
+            for i in range(len(x)):
+                s = math.sin(t * 0.5 + ph[i])
+                x[i] = min(WINDOW_W, max(0.0, hx[i] + 100 * s))
+                rot[i] = 0.0 if math.cos(t * 0.5 + ph[i]) >= 0 else 180.0
+
+
+# ----------------------------
+# Proceso generador
+# ----------------------------
+def _robot_id(w, i):
+    return f"LG{w}_{i}"
+
+
+def _send_json(sock, data, addr, counts, key):
+    sock.sendto(json.dumps(data, separators=(",", ":")).encode(), addr)
+    counts[key] += 1
+
+
+def _drain(sock, received):
+    while True:
+        try:
+            msg = sock.recv(65535)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            return  # ICMP port unreachable de un envío anterior (router caído)
+        try:
+            kind = json.loads(msg).get("type", "?")
+        except ValueError:
+            kind = "invalid"
+        received[kind] = received.get(kind, 0) + 1
+
+
+def _worker(w, cfg, start_at, conn):
+    n = cfg["per_proc"][w]
+    n_procs = len(cfg["per_proc"])
+    ids = [_robot_id(w, i) for i in range(n)]
+    rng = random.Random(cfg["seed"] * 1000 + w)
+    move = Movement(cfg["model"], n, seed=cfg["seed"] * 1000 + w)
+    rate = cfg["rate"]
+    counts = {"state": 0, "datagrams": 0, "msg": 0, "broadcast": 0, "register": 0, "twin_register": 0}
+    received = {}
+    reg = None
+
+    state_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    state_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 22)
+    if cfg["to"] == "dispatcher":
+        from .bootstrap import register_fleet
+        reg = register_fleet(ids)
+        state_addr = (DISP_IP, reg.send_port)
+    else:
+        state_addr = cfg["to"]
+
+    router = cfg["router"]
+    msg_sock = None
+    if cfg["msg_rate"] > 0 or cfg["broadcast_rate"] > 0 or cfg["twins"] > 0:
+        msg_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        msg_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        msg_sock.bind(("0.0.0.0", 0))
+        msg_sock.setblocking(False)
+        twins = [rid for rid in ids if rng.random() < cfg["twins"]]
+        for k, rid in enumerate(ids + [f"TWIN_{rid}" for rid in twins]):
+            _send_json(msg_sock, {"type": "register", "src": rid}, router, counts, "register")
+            if k % REGISTER_BURST == REGISTER_BURST - 1:
+                time.sleep(0.01)
+                _drain(msg_sock, received)
+        for rid in twins:
+            _send_json(msg_sock, {"type": "twin_register", "src": rid, "twin": f"TWIN_{rid}"}, router,
+                       counts, "twin_register")
+
+    if cfg["binary"]:
+        batch = StateBatch(fixed=True)
+        color = (120, 200, 255)
+    else:
+        packets = [StatePacket(rid, ts=True) for rid in ids]
+
+    # tasas por rebanada (paquetes por segundo de este proceso)
+    state_pps = n * rate
+    msg_pps = n * cfg["msg_rate"]
+    bcast_pps = cfg["broadcast_rate"] / n_procs
+    owed = {"state": 0.0, "msg": 0.0, "broadcast": 0.0}
+    next_robot = 0
+    late_slices = 0
+    move_period = 1.0 / rate
+
+    while time.monotonic() < start_at:
+        time.sleep(0.001)
+    t_start = time.monotonic()
+    end = t_start + cfg["duration"]
+    last = t_start
+    deadline = next_move = t_start
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        dt = now - last
+        last = now
+        if now >= next_move:
+            move.step(now - t_start)  # una vez por tick, no por rebanada
+            next_move += move_period
+        owed["state"] = min(owed["state"] + state_pps * dt, n * MAX_CATCHUP)
+        owed["msg"] += msg_pps * dt
+        owed["broadcast"] += bcast_pps * dt
+
+        # estados: round-robin sobre la flota, tantos como se deban
+        due = int(owed["state"])
+        if due:
+            owed["state"] -= due
+            x, y, rot = move.x, move.y, move.rot
+            if cfg["binary"]:
+                for _ in range(due):
+                    i = next_robot
+                    batch.add(ids[i], x[i], y[i], rot[i], color)
+                    next_robot = (i + 1) % n
+                # StateBatch omite robots sin cambios: contar las entradas que salieron (byte 3 del frame)
+                for frame in batch.frames():
+                    state_sock.sendto(frame, state_addr)
+                    counts["state"] += frame[3]
+                    counts["datagrams"] += 1
+            else:
+                out = []
+                for _ in range(due):
+                    i = next_robot
+                    out.append((bytes(packets[i].update(x[i], y[i], rot[i])), state_addr))
+                    next_robot = (i + 1) % n
+                send_many(state_sock, out)  # sendmmsg: una syscall cada MMSG_CHUNK paquetes
+                counts["state"] += due
+                counts["datagrams"] += due
+
+        if msg_sock is not None:
+            due = int(owed["msg"])
+            if due:
+                owed["msg"] -= due
+                for _ in range(due):
+                    src = ids[rng.randrange(n)]
+                    dw = rng.randrange(n_procs)
+                    dst = _robot_id(dw, rng.randrange(cfg["per_proc"][dw]))
+                    _send_json(msg_sock, {"type": "msg", "src": src, "to": dst, "data": {"t": now}},
+                               router, counts, "msg")
+            due = int(owed["broadcast"])
+            if due:
+                owed["broadcast"] -= due
+                for _ in range(due):
+                    _send_json(msg_sock, {"type": "broadcast", "src": ids[rng.randrange(n)], "data": {"t": now}},
+                               router, counts, "broadcast")
+            _drain(msg_sock, received)
+
+        deadline += SLICE
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            late_slices += 1
+            if -delay > SLICE * 10:
+                deadline = time.monotonic()  # muy atrasado: no intentar recuperar rebanadas
+
+    elapsed = time.monotonic() - t_start
+    if msg_sock is not None:
+        time.sleep(0.2)
+        _drain(msg_sock, received)
+        msg_sock.close()
+    if reg is not None:
+        reg.close()
+    state_sock.close()
+    conn.send({"proc": w, "robots": n, "elapsed": elapsed, "sent": counts, "received": received,
+               "late_slices": late_slices})
+
+
+# ----------------------------
+# Orquestación
+# ----------------------------
+def run(robots, procs=None, rate=20.0, duration=10.0, model="random_walk", binary=False, to="sim",
+        msg_rate=0.0, broadcast_rate=0.0, twins=0.0, router=(DISP_IP, DISP_MSG_PORT), seed=0):
+    """Lanza los procesos y devuelve el informe (pedido vs logrado por clase)."""
+    procs = procs or max(1, min(mp.cpu_count(), math.ceil(robots / 5000)))
+    per_proc = [robots // procs + (1 if p < robots % procs else 0) for p in range(procs)]
+    if to == "sim":
+        to = (SIM_IP, SIM_PORT)
+    cfg = {"per_proc": per_proc, "rate": rate, "duration": duration, "model": model, "binary": binary,
+           "to": to, "msg_rate": msg_rate, "broadcast_rate": broadcast_rate, "twins": twins,
+           "router": router, "seed": seed}
+    ctx = mp.get_context("spawn" if sys.platform == "win32" else "fork")
+    start_at = time.monotonic() + 0.5 + 0.0002 * robots  # registros al router antes de arrancar
+    pipes, workers = [], []
+    for w in range(procs):
+        rx, tx = ctx.Pipe(duplex=False)
+        p = ctx.Process(target=_worker, args=(w, cfg, start_at, tx), daemon=True)
+        p.start()
+        pipes.append(rx)
+        workers.append(p)
+    reports = [rx.recv() for rx in pipes]
+    for p in workers:
+        p.join()
+
+    elapsed = max(r["elapsed"] for r in reports)
+    sent = {k: sum(r["sent"][k] for r in reports) for k in reports[0]["sent"]}
+    received = {}
+    for r in reports:
+        for k, v in r["received"].items():
+            received[k] = received.get(k, 0) + v
+    requested = {"state": robots * rate, "msg": robots * msg_rate, "broadcast": broadcast_rate}
+    achieved = {k: sent[k] / elapsed for k in requested}
+    return {
+        "robots": robots,
+        "procs": procs,
+        "duration_s": round(elapsed, 3),
+        "model": model,
+        "encoding": "binary" if binary else "json",
+        "requested_pps": requested,
+        "achieved_pps": {k: round(v, 1) for k, v in achieved.items()},
+        "achieved_ratio": {k: round(achieved[k] / v, 4) if v else None for k, v in requested.items()},
+        "sent": sent,
+        "received": received,
+        "late_slices": sum(r["late_slices"] for r in reports),
+    }
+
+
+def _addr(text):
+    if text in ("sim", "dispatcher"):
+        return text
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.loadgen", description="Carga sintética de robots")
+    ap.add_argument("--robots", type=int, default=10000)
+    ap.add_argument("--procs", type=int, help="procesos generadores (por defecto 1 cada 5000 robots)")
+    ap.add_argument("--rate", type=float, default=20.0, help="estados por segundo por robot")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--model", choices=MODELS, default="random_walk")
+    ap.add_argument("--binary", action="store_true", help="StateBatch binario en lugar de JSON")
+    ap.add_argument("--to", type=_addr, default="sim", help="sim | dispatcher | ip:puerto")
+    ap.add_argument("--msg-rate", type=float, default=0.0, help="msg por segundo por robot al router 10011")
+    ap.add_argument("--broadcast-rate", type=float, default=0.0, help="broadcasts por segundo (total)")
+    ap.add_argument("--twins", type=float, default=0.0, help="fracción de robots con gemelo TWIN_<id>")
+    ap.add_argument("--router", type=_addr, default=(DISP_IP, DISP_MSG_PORT))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", action="store_true", help="imprimir el informe como JSON")
+    args = ap.parse_args()
+
+    rep = run(args.robots, args.procs, args.rate, args.duration, args.model, args.binary, args.to,
+              args.msg_rate, args.broadcast_rate, args.twins, args.router, args.seed)
+    if args.json:
+        print(json.dumps(rep, indent=2))
+    else:
+        print(f"[LOADGEN] {rep['robots']} robots en {rep['procs']} procesos, {rep['duration_s']} s, "
+              f"{rep['encoding']}, modelo {rep['model']}")
+        for k, req in rep["requested_pps"].items():
+            if req:
+                print(f"[LOADGEN]   {k:9s} pedido {req:10.0f}/s  logrado {rep['achieved_pps'][k]:10.0f}/s "
+                      f"({rep['achieved_ratio'][k] * 100:.1f}%)")
+        if rep["received"]:
+            print(f"[LOADGEN]   recibido del router: {rep['received']}")
+        print(f"[LOADGEN]   rebanadas atrasadas: {rep['late_slices']}")
@@ -0,0 +1,247 @@
+# ========================================================
+# ESTER-Grid - Request/response con futures sobre el transporte compartido
+# ========================================================
+#
+# Los ejemplos de mensajería esperan una respuesta así:
+#
+#   while time.time() - t0 < 5.0:
+#       pkt = A.recv_any()              # settimeout(0.05) / 0.1
+#       if pkt and pkt.get('type') == 'reply' and pkt.get('mid') == mid: ...
+#       time.sleep(0.02)
+#
+# Cada vuelta despierta al hilo aunque no llegue nada y una respuesta puede
+# esperar hasta un período entero de timeout + sleep. MessageClient no hace
+# polling: el hilo del MeshTransport (un solo selector para todos los robots
+# del proceso) entrega cada paquete apenas llega y
+#
+#   - request(to, data) devuelve un concurrent.futures.Future que se resuelve
+#     con la "reply" del mismo "mid" (TimeoutError si no llega a tiempo; el
+#     timeout es un timer del mismo loop, sin hilos extra)
+#   - on(tipo, fn) registra handlers por tipo de paquete ("msg", "broadcast",
+#     "state", ...); corren en el hilo del transporte, así que deben ser
+#     cortos (responder, encolar, setear un Event)
+#   - lo que no tiene handler ni future queda en recv(timeout)
+#   - arequest(...) es lo mismo para asyncio
+#   - subscribe(tópicos, fn) / publish(tópico, data): pub/sub en el router;
+#     un msg a "@grupo" llega a todos los suscriptores del grupo
+#
+# Con reliable=True los paquetes pasan por un ReliableEndpoint (acks y
+# retransmisión, ester_grid.reliable) y la entrega es desde su hilo.
+#
+#   from ester_grid.messaging import MessageClient
+#   a = MessageClient("R1A")
+#   a.register().result(timeout=1.0)
+#   resp = a.request("R2B", {"q": "ready?"}, timeout=5.0).result()
+#
+#   b = MessageClient("R2B")
+#   b.on("msg", lambda pkt: b.reply(pkt, {"ans": "ready"}))
+#   b.subscribe("fila_abajo", lambda pkt: print(pkt["data"])).result(timeout=1.0)
+#   a.publish("fila_abajo", {"cmd": "stop"})       # o a.send("@fila_abajo", ...)
+
+import asyncio
+import itertools
+import json
+import queue
+import threading
+from concurrent.futures import Future, InvalidStateError
+
+from .config import DISP_IP, DISP_MSG_PORT
+from .reliable import ReliableEndpoint
+from .transport import mesh_endpoint, mesh_transport
+
+DEFAULT_TIMEOUT = 5.0
+
+
+def _settle(fut, result=None, exc=None):
+    try:
+        if exc is None:
+            fut.set_result(result)
+        else:
+            fut.set_exception(exc)
+    except InvalidStateError:   # cancelado por quien esperaba
+        pass
+
+
+class MessageClient:
+    """Cliente de mensajería de un robot: futures para las replies y handlers por tipo."""
+
+    def __init__(self, robot_id, reliable=False, router=(DISP_IP, DISP_MSG_PORT), timeout=DEFAULT_TIMEOUT):
+        self.robot_id = robot_id
+        self.router = router
+        self.timeout = timeout
+        self.transport = mesh_transport()
+        self.endpoint = mesh_endpoint(robot_id)
+        self.inbox = queue.Queue()
+        self._handlers = {}
+        self._topic_handlers = {}
+        self._pending = {}      # mid -> Future de request()
+        self._acks = {"ack": [], "sub_ack": []}   # futures de register()/subscribe() esperando al router
+        self._mids = itertools.count(1)
+        self._lock = threading.Lock()
+        if reliable:
+            self.rel = ReliableEndpoint(robot_id, self.endpoint, router=router)
+            self.rel.on_packet = self._dispatch
+        else:
+            self.rel = None
+            self.endpoint.on_packet = lambda pkt, _addr: self._dispatch(pkt)
+
+    # ----------------------------
+    # Envío
+    # ----------------------------
+    def send_raw(self, pkt):
+        self.endpoint.sendto(json.dumps(pkt).encode("utf-8"), self.router)
+
+    def send(self, to, data, kind="msg", mid=None, **fields):
+        """msg/reply sin esperar respuesta; devuelve el mid."""
+        if mid is None:
+            mid = f"{self.robot_id}_{next(self._mids)}"
+        if self.rel is not None and not to.startswith("@"):   # a un grupo: sin acks por par
+            return self.rel.send(to, data, kind=kind, mid=mid, **fields)
+        pkt = {"type": kind, "src": self.robot_id, "to": to, "mid": mid, "data": data}
+        pkt.update(fields)
+        self.send_raw(pkt)
+        return mid
+
+    def reply(self, pkt, data, **fields):
+        """Responde a un msg recibido (mismo mid, al que lo mandó)."""
+        return self.send(pkt.get("src"), data, kind="reply", mid=pkt.get("mid"), **fields)
+
+    def broadcast(self, data):
+        self.send_raw({"type": "broadcast", "src": self.robot_id, "data": data})
+
+    def register(self, timeout=None):
+        """Registra el robot en el router; el Future se resuelve con el ack."""
+        return self._control({"type": "register", "src": self.robot_id}, "ack", timeout)
+
+    def subscribe(self, topics, handler=None, timeout=None):
+        """Suscribe a uno o más tópicos/grupos; handler(pkt) recibe sus publish. Future con el sub_ack."""
+        topics = [topics] if isinstance(topics, str) else list(topics)
+        if handler is not None:
+            for t in topics:
+                self._topic_handlers[t] = handler
+        return self._control({"type": "subscribe", "src": self.robot_id, "topics": topics}, "sub_ack", timeout)
+
+    def unsubscribe(self, topics=None, timeout=None):
+        """Sale de esos tópicos (o de todos)."""
+        pkt = {"type": "unsubscribe", "src": self.robot_id}
+        if topics is not None:
+            topics = [topics] if isinstance(topics, str) else list(topics)
+            pkt["topics"] = topics
+        for t in (topics if topics is not None else list(self._topic_handlers)):
+            self._topic_handlers.pop(t, None)
+        return self._control(pkt, "sub_ack", timeout)
+
+    def publish(self, topic, data, **fields):
+        """Un datagrama al router; lo reciben solo los suscriptores de `topic`."""
+        pkt = {"type": "publish", "src": self.robot_id, "topic": topic, "data": data}
+        pkt.update(fields)
+        self.send_raw(pkt)
+
+    def _control(self, pkt, ack_kind, timeout):
+        fut = Future()
+        waiting = self._acks[ack_kind]
+        with self._lock:
+            waiting.append(fut)
+        self._expire_later(fut, timeout, lambda: self._forget_ack(waiting, fut))
+        self.send_raw(pkt)
+        return fut
+
+    @staticmethod
+    def _forget_ack(waiting, fut):
+        if fut in waiting:
+            waiting.remove(fut)
+            return True
+        return False
+
+    def request(self, to, data, timeout=None, kind="msg", mid=None, **fields):
+        """Manda un msg y devuelve un Future que se resuelve con la reply del mismo mid."""
+        if mid is None:
+            mid = f"{self.robot_id}_{next(self._mids)}"
+        fut = Future()
+        with self._lock:
+            self._pending[mid] = fut
+        self._expire_later(fut, timeout, lambda: self._pending.pop(mid, None) is not None)
+        try:
+            self.send(to, data, kind=kind, mid=mid, **fields)
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(mid, None)
+            _settle(fut, exc=e)
+        return fut
+
+    def arequest(self, to, data, timeout=None, **kwargs):
+        """request() para asyncio: `pkt = await client.arequest("R2B", {...})`."""
+        return asyncio.wrap_future(self.request(to, data, timeout, **kwargs))
+
+    def _expire_later(self, fut, timeout, forget):
+        """Timer en el loop del transporte; forget() saca el future de su tabla (True si seguía ahí)."""
+        timeout = self.timeout if timeout is None else timeout
+        if not timeout:
+            return
+
+        def expire():
+            with self._lock:
+                waiting = forget()
+            if waiting:
+                _settle(fut, exc=TimeoutError(f"[{self.robot_id}] sin respuesta tras {timeout:.2f}s"))
+
+        timer = self.transport.call_later(timeout, expire)
+        fut.add_done_callback(lambda _f: self.transport.cancel(timer))
+
+    # ----------------------------
+    # Recepción
+    # ----------------------------
+    def on(self, kind, fn):
+        """fn(pkt) para cada paquete de ese tipo (en el hilo del transporte). None lo quita."""
+        if fn is None:
+            self._handlers.pop(kind, None)
+        else:
+            self._handlers[kind] = fn
+        return fn
+
+    def recv(self, timeout=None):
+        """Próximo paquete sin handler ni request esperando, o None."""
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _dispatch(self, pkt):
+        kind = pkt.get("type")
+        fut = None
+        if kind == "reply":
+            with self._lock:
+                fut = self._pending.pop(pkt.get("mid"), None)
+        elif kind in self._acks and pkt.get("src") == "dispatcher":
+            with self._lock:
+                waiting = self._acks[kind]
+                acks = waiting[:]
+                waiting.clear()
+            for f in acks:
+                _settle(f, pkt)
+            if acks:
+                return
+        if fut is not None:
+            _settle(fut, pkt)
+            return
+        handler = self._topic_handlers.get(pkt.get("topic")) if kind == "publish" else None
+        if handler is None:
+            handler = self._handlers.get(kind)
+        if handler is not None:
+            handler(pkt)
+        else:
+            self.inbox.put(pkt)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+        for fut in pending:
+            fut.cancel()
+        if self.rel is not None:
+            self.rel.close()
+        self.endpoint.on_packet = None
+        self.endpoint.close()
@@ -0,0 +1,368 @@
+# ========================================================
+# ESTER-Grid - Entrega confiable de msg/reply (acks + retransmisión)
+# ========================================================
+#
+# ejemplo9 manda "ready?" / "go" / "done" por UDP pelado y después hace
+# polling de recv_any() hasta 5 s: si se pierde un datagrama se pierde el
+# paso entero. ReliableEndpoint es una capa opcional sobre el socket de
+# mensajes (un MeshEndpoint o un socket UDP) que agrega:
+#
+#   - "rseq": número de secuencia por par (emisor → destino) y "rep": época
+#     del emisor (cambia si el robot reinicia y resetea la recepción; también
+#     por par cuando un mensaje agota MAX_TRIES, para que el receptor no se
+#     quede esperando ese rseq)
+#   - acks acumulativos + selectivos: {"type":"msg","src":B,"to":A,"rack":[época, acumulado, [sack...], época_B]}
+#     (época_B: si el receptor reinició, el emisor arranca época nueva para
+#     ese par en vez de esperar un rseq que el receptor ya no va a pedir)
+#   - retransmisión con RTO adaptativo (SRTT/RTTVAR, RFC 6298, Karn) y
+#     retransmisión temprana cuando un ack muestra huecos
+#   - supresión de duplicados y entrega en orden por par
+#   - ventana deslizante de WINDOW mensajes sin ack por destino
+#
+# "mid" sigue siendo el id de la aplicación (las replies reusan el mid del
+# pedido); si no viene, se genera uno. Los paquetes sin "rseq" (acks del
+# router, errores, broadcasts, copias para gemelos) pasan tal cual.
+#
+#   rel = ReliableEndpoint("R1A")                 # usa mesh_endpoint("R1A")
+#   rel.register()
+#   mid = rel.send("R2B", {"q": "ready?"})
+#   pkt = rel.recv(timeout=1.0)                   # en orden, sin duplicados
+#   rel.send("R2B", {"ans": "ok"}, kind="reply", mid=pkt["mid"])
+
+import itertools
+import json
+import queue
+import random
+import socket
+import threading
+import time
+
+from .config import DISP_IP, DISP_MSG_PORT
+from .transport import mesh_endpoint
+
+WINDOW = 32
+RTO_INITIAL = 0.2
+RTO_MIN = 0.02
+RTO_MAX = 2.0
+MAX_TRIES = 12
+SACK_MAX = 16
+BUFFER_MAX = 2 * WINDOW     # fuera de orden guardados por par; lo que exceda se descarta (se retransmite)
+OLD_EPOCHS = 4
+POLL_MAX = 0.05
+
+
+class _Peer:
+    __slots__ = ("tx_epoch", "peer_epoch", "next_seq", "unacked", "pending", "srtt", "rttvar", "rto",
+                 "rx_epoch", "rx_old", "expected", "buffer")
+
+    def __init__(self, epoch):
+        # envío
+        self.tx_epoch = epoch
+        self.peer_epoch = None  # época del receptor vista en sus acks
+        self.next_seq = 1
+        self.unacked = {}       # rseq -> [datos, enviado_en, intentos, vence_en]
+        self.pending = []       # (rseq, datos) esperando lugar en la ventana
+        self.srtt = None
+        self.rttvar = None
+        self.rto = RTO_INITIAL
+        # recepción
+        self.rx_epoch = None
+        self.rx_old = []        # épocas anteriores: sus rezagados se ignoran
+        self.expected = 1
+        self.buffer = {}        # rseq -> paquete fuera de orden
+
+    def sample(self, rtt):
+        """RFC 6298: actualiza SRTT/RTTVAR y el RTO con una muestra sin retransmisión."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(RTO_MAX, max(RTO_MIN, self.srtt + 4 * self.rttvar))
+
+
+class ReliableEndpoint:
+    """
+    msg/reply confiables sobre un socket de mensajes. Un hilo propio lee el
+    socket, contesta acks y retransmite; recv() entrega en orden.
+    drop (0..1) descarta al azar datagramas salientes, para probar con pérdidas.
+    """
+
+    def __init__(self, robot_id, sock=None, router=(DISP_IP, DISP_MSG_PORT), window=WINDOW, drop=0.0):
+        self.robot_id = robot_id
+        self.sock = sock if sock is not None else mesh_endpoint(robot_id)
+        self.router = router
+        self.window = window
+        self.drop = drop
+        self.epoch = random.getrandbits(31)
+        self.peers = {}
+        self.inbox = queue.Queue()
+        self.on_packet = None   # fn(pkt): entrega directa en el hilo propio en lugar del inbox
+        self.failed = []        # (destino, mid) que agotaron MAX_TRIES
+        self.stats = {"sent": 0, "retransmits": 0, "acks_sent": 0, "duplicates": 0,
+                      "out_of_order": 0, "delivered": 0, "abandoned": 0, "overflow": 0,
+                      "invalid": 0}
+        self._mids = itertools.count(1)
+        self._lock = threading.RLock()   # on_packet puede volver a llamar a send()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=f"reliable-{robot_id}", daemon=True)
+        self._thread.start()
+
+    # ----------------------------
+    # Envío
+    # ----------------------------
+    def _raw(self, data):
+        if self.drop and random.random() < self.drop:
+            return
+        try:
+            self.sock.sendto(data, self.router)
+        except OSError as e:
+            print(f"[{self.robot_id}] ERROR al enviar UDP: {e}")
+
+    def send_raw(self, pkt):
+        """Sin confiabilidad (register, broadcast, ...)."""
+        self._raw(json.dumps(pkt).encode("utf-8"))
+
+    def register(self):
+        self.send_raw({"type": "register", "src": self.robot_id})
+
+    def send(self, to, data, kind="msg", mid=None, **fields):
+        """Encola un msg/reply confiable para `to`; devuelve su mid."""
+        if mid is None:
+            mid = f"{self.robot_id}_{next(self._mids)}"
+        with self._lock:
+            peer = self._peer(to)
+            pkt = {"type": kind, "src": self.robot_id, "to": to, "mid": mid, "data": data}
+            pkt.update(fields)
+            self._enqueue(peer, pkt, time.monotonic())
+        return mid
+
+    def _peer(self, addr):
+        peer = self.peers.get(addr)
+        if peer is None:
+            peer = self.peers[addr] = _Peer(self.epoch)
+        return peer
+
+    def _enqueue(self, peer, pkt, now):
+        seq = peer.next_seq
+        peer.next_seq += 1
+        pkt["rseq"] = seq
+        pkt["rep"] = peer.tx_epoch
+        buf = json.dumps(pkt).encode("utf-8")
+        if len(peer.unacked) < self.window:
+            self._transmit(peer, seq, buf, now)
+        else:
+            peer.pending.append((seq, buf))
+
+    def _abandon(self, to, peer, seq, now):
+        """
+        rseq agotó MAX_TRIES: el receptor lo esperaría para siempre. Época
+        nueva para este par, empezando por un marcador "rskip" (confiable, no
+        se entrega) y lo que quedaba sin ack renumerado detrás; al ver la
+        época nueva el receptor entrega lo que tenía guardado y sigue.
+        """
+        entry = peer.unacked.pop(seq)
+        self.failed.append((to, json.loads(entry[0]).get("mid")))
+        self.stats["abandoned"] += 1
+        print(f"[{self.robot_id}] sin ack de {to} tras {MAX_TRIES} intentos (rseq {seq})")
+        self._new_epoch(to, peer, now)
+
+    def _new_epoch(self, to, peer, now):
+        rest = [e[0] for _, e in sorted(peer.unacked.items())] + [buf for _, buf in peer.pending]
+        peer.unacked = {}
+        peer.pending = []
+        peer.next_seq = 1
+        peer.tx_epoch = random.getrandbits(31)
+        self._enqueue(peer, {"type": "msg", "src": self.robot_id, "to": to, "mid": "skip", "rskip": 1}, now)
+        for buf in rest:
+            self._enqueue(peer, json.loads(buf), now)
+
+    def _transmit(self, peer, seq, buf, now):
+        peer.unacked[seq] = [buf, now, 1, now + peer.rto]
+        self.stats["sent"] += 1
+        self._raw(buf)
+
+    def _retransmit(self, peer, seq, entry, now):
+        entry[1] = now
+        entry[2] += 1
+        entry[3] = now + min(RTO_MAX, peer.rto * (1 << min(entry[2] - 1, 6)))  # backoff exponencial
+        self.stats["retransmits"] += 1
+        self._raw(entry[0])
+
+    def pending(self, to=None):
+        """Mensajes sin ack (de `to` o de todos)."""
+        with self._lock:
+            peers = [self.peers[to]] if to in self.peers else ([] if to else self.peers.values())
+            return sum(len(p.unacked) + len(p.pending) for p in peers)
+
+    def flush(self, timeout=5.0):
+        """Espera hasta que todo lo enviado tenga ack. True si se vació a tiempo."""
+        end = time.monotonic() + timeout
+        while self.pending():
+            if time.monotonic() >= end:
+                return False
+            time.sleep(0.005)
+        return True
+
+    # ----------------------------
+    # Recepción
+    # ----------------------------
+    def recv(self, timeout=None):
+        """Próximo paquete (confiables en orden por par, el resto tal cual) o None."""
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _deliver(self, pkt):
+        if self.on_packet is None:
+            self.inbox.put(pkt)
+            return
+        try:
+            self.on_packet(pkt)
+        except Exception as e:
+            print(f"[{self.robot_id}] Error en on_packet: {e!r}")
+
+    def _on_ack(self, src, rack, now):
+        epoch, cum, sack = rack[0], rack[1], rack[2]
+        peer = self.peers.get(src)
+        if peer is None or epoch != peer.tx_epoch:
+            return
+        restarted = False
+        if len(rack) > 3:
+            if peer.peer_epoch is not None and rack[3] != peer.peer_epoch:
+                restarted = True    # el receptor reinició: sus "expected" ya no son los nuestros
+            peer.peer_epoch = rack[3]
+        acked = [s for s in peer.unacked if s <= cum]
+        acked += [s for s in sack if s in peer.unacked and s > cum]
+        for s in acked:
+            entry = peer.unacked.pop(s)
+            if entry[2] == 1:           # Karn: solo muestras sin retransmisión
+                peer.sample(now - entry[1])
+        if restarted:
+            # lo que tiene guardado lo entrega al ver la época nueva; el resto va renumerado
+            print(f"[{self.robot_id}] {src} reinició: época nueva para ese par")
+            self._new_epoch(src, peer, now)
+            return
+        # retransmisión temprana: hay sack por encima de un hueco
+        if sack and peer.unacked:
+            first = min(peer.unacked)
+            entry = peer.unacked[first]
+            if first < max(sack) and now - entry[1] > (peer.srtt or RTO_MIN):
+                self._retransmit(peer, first, entry, now)
+        while peer.pending and len(peer.unacked) < self.window:
+            seq, buf = peer.pending.pop(0)
+            self._transmit(peer, seq, buf, now)
+
+    def _on_data(self, pkt):
+        src = pkt.get("src")
+        seq = pkt.get("rseq")
+        epoch = pkt.get("rep")
+        peer = self._peer(src)
+        if epoch in peer.rx_old:
+            return                      # rezagado de una época ya cerrada
+        if peer.rx_epoch != epoch:
+            # el emisor reinició o abandonó un rseq: lo guardado ya no va a
+            # completarse, se entrega en orden y la numeración arranca de nuevo
+            for s in sorted(peer.buffer):
+                if "rskip" not in peer.buffer[s]:
+                    self.stats["delivered"] += 1
+                    self._deliver(peer.buffer[s])
+            if peer.rx_epoch is not None:
+                peer.rx_old = (peer.rx_old + [peer.rx_epoch])[-OLD_EPOCHS:]
+            peer.rx_epoch = epoch
+            peer.expected = 1
+            peer.buffer.clear()
+        if seq < peer.expected or seq in peer.buffer:
+            self.stats["duplicates"] += 1
+        elif seq != peer.expected and len(peer.buffer) >= BUFFER_MAX:
+            self.stats["overflow"] += 1     # sin ack: el emisor lo vuelve a mandar
+        else:
+            if seq != peer.expected:
+                self.stats["out_of_order"] += 1
+            peer.buffer[seq] = pkt
+            while peer.expected in peer.buffer:
+                out = peer.buffer.pop(peer.expected)
+                peer.expected += 1
+                if "rskip" not in out:
+                    self.stats["delivered"] += 1
+                    self._deliver(out)
+        sack = sorted(peer.buffer)[:SACK_MAX]
+        ack = {"type": "msg", "src": self.robot_id, "to": src, "mid": "ack", "rack": [epoch, peer.expected - 1, sack, self.epoch]}
+        self.stats["acks_sent"] += 1
+        self._raw(json.dumps(ack, separators=(",", ":")).encode("utf-8"))
+
+    @staticmethod
+    def _valid_data(pkt):
+        seq = pkt.get("rseq")
+        return (isinstance(pkt.get("src"), str) and type(seq) is int and seq > 0
+                and type(pkt.get("rep")) is int)
+
+    @staticmethod
+    def _valid_ack(pkt):
+        rack = pkt.get("rack")
+        return (isinstance(pkt.get("src"), str) and isinstance(rack, list) and 3 <= len(rack) <= 4
+                and type(rack[0]) is int and type(rack[1]) is int and isinstance(rack[2], list)
+                and all(type(s) is int for s in rack[2]))
+
+    def _handle(self, pkt, now):
+        if pkt.get("twin_copy"):
+            if "rack" not in pkt:
+                self._deliver(pkt)    # copia para el gemelo: sin acks
+        elif "rack" in pkt:
+            if self._valid_ack(pkt):
+                self._on_ack(pkt["src"], pkt["rack"], now)
+            else:
+                self.stats["invalid"] += 1
+        elif "rseq" in pkt:
+            if self._valid_data(pkt):
+                self._on_data(pkt)
+            else:
+                self.stats["invalid"] += 1
+        else:
+            self._deliver(pkt)
+
+    def _timers(self, now):
+        next_due = now + POLL_MAX
+        for to, peer in self.peers.items():
+            for seq, entry in sorted(peer.unacked.items()):
+                if entry[3] <= now:
+                    if entry[2] >= MAX_TRIES:
+                        self._abandon(to, peer, seq, now)
+                        break           # lo que quedaba se retransmitió renumerado
+                    self._retransmit(peer, seq, entry, now)
+                next_due = min(next_due, entry[3])
+        return next_due
+
+    def _loop(self):
+        sock = self.sock
+        next_due = time.monotonic() + POLL_MAX
+        while self._running:
+            sock.settimeout(max(0.001, min(POLL_MAX, next_due - time.monotonic())))
+            try:
+                data, _ = sock.recvfrom(65535)
+            except socket.timeout:
+                data = None
+            except OSError:
+                if not self._running:
+                    break
+                data = None
+            now = time.monotonic()
+            with self._lock:
+                if data is not None:
+                    try:
+                        pkt = json.loads(data)
+                    except ValueError:
+                        pkt = None
+                    if isinstance(pkt, dict):
+                        try:
+                            self._handle(pkt, now)
+                        except Exception as e:    # un paquete raro no puede matar el hilo
+                            self.stats["invalid"] += 1
+                            print(f"[{self.robot_id}] Paquete descartado: {e!r}")
+                next_due = self._timers(now)
+
+    def close(self):
+        self._running = False
+        self._thread.join(timeout=1)
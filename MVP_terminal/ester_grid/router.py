@@ -0,0 +1,411 @@
+# ========================================================
+# ESTER-Grid - Router de mensajes robot-robot (UDP 10011) en Python
+# ========================================================
+#
+# Mismo protocolo que el udpMsgSocket de dispatcher.js (register, msg,
+# reply, broadcast, subscribe/unsubscribe/publish, state de gemelos,
+# twin_register, twin_unregister), pero:
+#
+#   - lee lotes de datagramas con recvmmsg y manda todas las respuestas del
+#     lote con sendmmsg (ester_grid.transport)
+#   - no re-serializa lo que reenvía: los campos que agrega el router ("mid",
+#     "via", "twin_copy", "for", ...) se empalman antes de la última "}" del
+#     datagrama original. En JSON gana la última clave repetida, igual que
+#     {...packet, via} en JS
+#   - un broadcast se arma una sola vez y sale una copia por dirección
+#     distinta (los robots sobre un MeshTransport comparten dirección)
+#   - endpoints, gemelos y direcciones en dicts: O(1) por paquete
+#   - estados de robots con gemelo: se guarda el último de cada par y
+#     flush_twins() manda solo ese, twin_hz veces por segundo (lo mismo que
+#     twin_flush en dispatcher.js); twin_report() da el lag por par
+#   - tópicos y grupos: "subscribe"/"unsubscribe" anotan al robot en uno o
+#     más tópicos; "publish" (y un msg con "to":"@grupo") sale codificado una
+#     vez y solo a las direcciones de los suscriptores: el costo depende de
+#     los interesados, no del tamaño de la flota
+#
+# Para usarlo en lugar del router de Node, el dispatcher no debe bindear
+# 10011 (ESTER_MSG_ROUTER=python):
+#
+#   ESTER_MSG_ROUTER=python node dispatcher/dispatcher.js
+#   python -m ester_grid.router [--port 10011] [--stats 5]
+#
+# La réplica de estados a gemelos por los puertos por robot (10010+i) usa
+# los pares que registra el router de Node; con este router los gemelos se
+# replican solo por el 10011.
+
+import json
+import selectors
+import socket
+import time
+
+from .config import DISP_MSG_PORT
+from .transport import RecvBatch, send_many
+
+RCVBUF = 1 << 23
+SNDBUF = 1 << 23
+TWIN_HZ = 20
+
+
+def _q(text):
+    """Cadena JSON (con comillas) para empalmar."""
+    return json.dumps(text).encode("utf-8")
+
+
+def _topic_list(packet):
+    topics = packet.get("topics")
+    if topics is None:
+        topics = [packet["topic"]] if packet.get("topic") else []
+    elif isinstance(topics, str):
+        topics = [topics]
+    elif not isinstance(topics, list):
+        topics = []
+    return [t for t in topics if isinstance(t, str) and t]
+
+
+def splice(data, extra):
+    """data con los pares `extra` (bytes ',"k":v,...') agregados antes de la "}" final."""
+    body = data.rstrip()
+    if not body.endswith(b"}"):
+        return None
+    head = body[:-1].rstrip()
+    if head.endswith(b"{"):
+        return head + extra[1:] + b"}"
+    return head + extra + b"}"
+
+
+class MessageRouter:
+    """Router 10011: un socket, lotes de recvmmsg y respuestas agrupadas con sendmmsg."""
+
+    def __init__(self, port=DISP_MSG_PORT, host="0.0.0.0", log=False, twin_hz=TWIN_HZ):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SNDBUF)
+        self.sock.bind((host, port))
+        self.batch = RecvBatch(self.sock)
+        self.log = log
+        self.endpoints = {}     # robot -> (ip, puerto)
+        self.addr_refs = {}     # (ip, puerto) -> cantidad de robots en esa dirección
+        self.twins = {}         # robot -> gemelo (en los dos sentidos)
+        self.topics = {}        # tópico/grupo -> {robots suscriptos}
+        self.subs = {}          # robot -> {tópicos}
+        self.twin_hz = twin_hz
+        self.twin_latest = {}   # robot -> (datagrama, recibido_en): último estado sin reenviar
+        self.twin_stats = {}    # robot -> [recibidos, enviados, coalescidos, lag_último, lag_suma, lag_máx]
+        self._now = time.monotonic()
+        self.stats = {"rx": 0, "tx": 0, "invalid": 0, "batches": 0}
+        self.by_type = {}
+        self._out = []
+        self._mid_seq = 0
+
+    # ----------------------------
+    # Estado
+    # ----------------------------
+    def _touch(self, src, addr):
+        old = self.endpoints.get(src)
+        if old == addr:
+            return
+        if old is not None:
+            n = self.addr_refs[old] - 1
+            if n:
+                self.addr_refs[old] = n
+            else:
+                del self.addr_refs[old]
+        self.endpoints[src] = addr
+        self.addr_refs[addr] = self.addr_refs.get(addr, 0) + 1
+
+    def _send(self, data, addr):
+        self._out.append((data, addr))
+
+    def _send_json(self, obj, addr):
+        self._out.append((json.dumps(obj, separators=(",", ":")).encode("utf-8"), addr))
+
+    def _fanout(self, topic, out):
+        """Una copia de `out` por dirección con suscriptores de `topic`; devuelve cuántas."""
+        members = self.topics.get(topic)
+        if not members:
+            return 0
+        endpoints = self.endpoints
+        addrs = {endpoints[r] for r in members}
+        for ep in addrs:
+            self._send(out, ep)
+        return len(addrs)
+
+    def _error(self, addr, src, code, message):
+        pkt = {"type": "error", "src": "dispatcher", "code": code, "message": message}
+        if src is not None:
+            pkt["for"] = src
+        self._send_json(pkt, addr)
+
+    # ----------------------------
+    # Protocolo
+    # ----------------------------
+    def handle(self, data, addr):
+        try:
+            packet = json.loads(data)
+        except ValueError:
+            self.stats["invalid"] += 1
+            return
+        if not isinstance(packet, dict):
+            self.stats["invalid"] += 1
+            return
+        kind = packet.get("type")
+        if kind is not None and not isinstance(kind, str):
+            self.stats["invalid"] += 1
+            return
+        self.by_type[kind] = self.by_type.get(kind, 0) + 1
+
+        src = packet.get("src") or packet.get("from") or packet.get("name")
+        if not src:
+            self._error(addr, None, "missing_src", "Se requiere 'src' en el paquete.")
+            return
+        if not isinstance(src, str):
+            self._error(addr, None, "invalid_src", "'src' debe ser un string.")
+            return
+        self._touch(src, addr)
+
+        if kind == "register":
+            self._send_json({"type": "ack", "src": "dispatcher", "for": src}, addr)
+            if self.log:
+                print(f"[ROUTER] Registro endpoint {src} -> {addr[0]}:{addr[1]}")
+
+        elif kind == "twin_register":
+            twin = packet.get("twin") or packet.get("twin_id")
+            if not twin:
+                self._error(addr, src, "missing_twin_id", "Se requiere 'twin' o 'twin_id'.")
+                return
+            if not isinstance(twin, str):
+                self._error(addr, src, "invalid_twin_id", "'twin' debe ser un string.")
+                return
+            self.twins[src] = twin
+            self.twins[twin] = src
+            self._send_json({"type": "twin_ack", "src": "dispatcher", "robot": src, "twin": twin}, addr)
+            if self.log:
+                print(f"[ROUTER] Par gemelo registrado: {src} <-> {twin}")
+
+        elif kind == "twin_unregister":
+            twin = self.twins.pop(src, None)
+            if twin is not None:
+                self.twins.pop(twin, None)
+                for r in (src, twin):
+                    self.twin_latest.pop(r, None)
+                    self.twin_stats.pop(r, None)
+                self._send_json({"type": "twin_unregister_ack", "src": "dispatcher", "robot": src}, addr)
+
+        elif kind == "subscribe" or kind == "unsubscribe":
+            topics = _topic_list(packet)
+            mine = self.subs.setdefault(src, set())
+            if kind == "subscribe":
+                if not topics:
+                    self._error(addr, src, "missing_topic", "Se requiere 'topic' o 'topics'.")
+                    return
+                for t in topics:
+                    self.topics.setdefault(t, set()).add(src)
+                mine.update(topics)
+            else:
+                for t in (topics if topics else list(mine)):
+                    members = self.topics.get(t)
+                    if members is not None:
+                        members.discard(src)
+                        if not members:
+                            del self.topics[t]
+                    mine.discard(t)
+            self._send_json({"type": "sub_ack", "src": "dispatcher", "for": src, "topics": sorted(mine)}, addr)
+            if not mine:
+                del self.subs[src]
+
+        elif kind == "publish":
+            topic = packet.get("topic")
+            if not topic or not isinstance(topic, str):
+                self._error(addr, src, "missing_topic", "Se requiere 'topic' (string) en el paquete.")
+                return
+            out = splice(data, b',"via":"dispatcher"')
+            if out is not None:
+                self._fanout(topic, out)
+
+        elif kind == "state":
+            if src in self.twins:
+                st = self.twin_stats.get(src)
+                if st is None:
+                    st = self.twin_stats[src] = [0, 0, 0, 0.0, 0.0, 0.0]
+                st[0] += 1
+                if src in self.twin_latest:
+                    st[2] += 1
+                self.twin_latest[src] = (data, self._now)
+
+        elif kind == "msg" or kind == "reply":
+            to = packet.get("to") or packet.get("dest") or packet.get("target")
+            if not to:
+                self._error(addr, src, "missing_to", "Se requiere 'to' en el paquete.")
+                return
+            if not isinstance(to, str):
+                self._error(addr, src, "invalid_to", "'to' debe ser un string.")
+                return
+            group = to[1:] if to.startswith("@") else None
+            dest = self.endpoints.get(to) if group is None else None
+            if dest is None and group is None:
+                self._error(addr, src, "unknown_target", f"Destino '{to}' no registrado.")
+                return
+            extra = b',"via":"dispatcher"'
+            if not (packet.get("mid") or packet.get("id")):
+                self._mid_seq += 1
+                extra = b',"mid":"%d_r%d"' % (int(time.time() * 1000), self._mid_seq) + extra
+            elif not packet.get("mid"):
+                extra = b',"mid":' + _q(packet["id"]) + extra
+            out = splice(data, extra)
+            if out is None:
+                return
+            if group is not None:
+                if not self._fanout(group, out):
+                    self._error(addr, src, "unknown_group", f"Grupo '{group}' sin suscriptores.")
+                return
+            self._send(out, dest)
+            twin = self.twins.get(to)
+            twin_ep = self.endpoints.get(twin) if twin else None
+            if twin_ep is not None:
+                self._send(out[:-1] + b',"twin_copy":true,"original_dest":' + _q(to) + b',"for":' + _q(twin) + b"}",
+                           twin_ep)
+
+        elif kind == "broadcast":
+            out = splice(data, b',"via":"dispatcher"')   # una sola codificación
+            if out is not None:
+                for ep in self.addr_refs:                 # una copia por dirección
+                    self._send(out, ep)
+
+        else:
+            self._error(addr, src, "unknown_type", f"Tipo '{kind}' no soportado.")
+
+    # ----------------------------
+    # Gemelos
+    # ----------------------------
+    def flush_twins(self, now=None):
+        """Reenvía a cada gemelo el último estado de su par (uno por par y por período)."""
+        if not self.twin_latest:
+            return 0
+        now = time.monotonic() if now is None else now
+        latest, self.twin_latest = self.twin_latest, {}
+        sent = 0
+        for src, (data, t_recv) in latest.items():
+            twin = self.twins.get(src)
+            ep = self.endpoints.get(twin) if twin else None
+            if ep is None:
+                continue
+            out = splice(data, b',"mirrored_from":' + _q(src) + b',"via":"dispatcher_twin","for":' + _q(twin))
+            if out is None:
+                continue
+            self._send(out, ep)
+            st = self.twin_stats[src]
+            lag = now - t_recv
+            st[1] += 1
+            st[3] = lag
+            st[4] += lag
+            st[5] = max(st[5], lag)
+            sent += 1
+        self._flush_out()
+        return sent
+
+    def twin_report(self):
+        """{robot: {twin, received, sent, coalesced, lag_*_ms}} (mismas claves que GET /twins del dispatcher)."""
+        out = {}
+        for src, (received, sent, coalesced, last, total, mx) in self.twin_stats.items():
+            out[src] = {"twin": self.twins.get(src), "received": received, "sent": sent, "coalesced": coalesced,
+                        "lag_last_ms": round(last * 1e3, 2),
+                        "lag_mean_ms": round(total / sent * 1e3, 2) if sent else None,
+                        "lag_max_ms": round(mx * 1e3, 2)}
+        return {"hz": self.twin_hz, "pairs": out}
+
+    # ----------------------------
+    # Loop
+    # ----------------------------
+    def _flush_out(self):
+        if self._out:
+            out, self._out = self._out, []
+            try:
+                self.stats["tx"] += send_many(self.sock, out)
+            except OSError as e:
+                print(f"[ROUTER] Error enviando lote: {e}")
+
+    def poll(self):
+        """Procesa lo que haya en el socket (lotes de recvmmsg) y despacha las respuestas."""
+        total = 0
+        while True:
+            batch = self.batch.recv()
+            if not batch:
+                break
+            self.stats["batches"] += 1
+            self._now = time.monotonic()
+            total += len(batch)
+            handle = self.handle
+            for data, addr in batch:
+                try:
+                    handle(data, addr)
+                except Exception as e:    # un paquete malformado no tira el router
+                    self.stats["invalid"] += 1
+                    if self.log:
+                        print(f"[ROUTER] Paquete descartado de {addr[0]}:{addr[1]}: {e!r}")
+            if len(batch) < self.batch.slots:
+                break
+        self.stats["rx"] += total
+        self._flush_out()
+        return total
+
+    def serve(self, duration=None, stats_every=None):
+        sel = selectors.DefaultSelector()
+        sel.register(self.sock, selectors.EVENT_READ)
+        end = None if duration is None else time.monotonic() + duration
+        next_stats = None if not stats_every else time.monotonic() + stats_every
+        last = dict(self.stats)
+        period = 1.0 / self.twin_hz
+        next_twins = time.monotonic() + period
+        try:
+            while end is None or time.monotonic() < end:
+                timeout = 0.5 if not self.twin_latest else max(0.0, next_twins - time.monotonic())
+                if sel.select(timeout=timeout):
+                    self.poll()
+                now = time.monotonic()
+                if now >= next_twins:
+                    self.flush_twins(now)
+                    next_twins += period
+                    if next_twins <= now:
+                        next_twins = now + period
+                if next_stats is not None and time.monotonic() >= next_stats:
+                    rx = self.stats["rx"] - last["rx"]
+                    tx = self.stats["tx"] - last["tx"]
+                    batches = max(1, self.stats["batches"] - last["batches"])
+                    print(f"[ROUTER] {rx / stats_every:.0f} rx/s  {tx / stats_every:.0f} tx/s  "
+                          f"{rx / batches:.1f} paq/lote  endpoints={len(self.endpoints)} "
+                          f"direcciones={len(self.addr_refs)} gemelos={len(self.twins) // 2} "
+                          f"tópicos={len(self.topics)}")
+                    if self.twin_stats:
+                        pairs = self.twin_report()["pairs"].values()
+                        sent = sum(p["sent"] for p in pairs)
+                        print(f"[ROUTER] gemelos a {self.twin_hz:g} Hz: {sum(p['received'] for p in pairs)} estados -> "
+                              f"{sent} envíos ({sum(p['coalesced'] for p in pairs)} coalescidos), "
+                              f"lag máx {max(p['lag_max_ms'] for p in pairs):.1f} ms")
+                    last = dict(self.stats)
+                    next_stats += stats_every
+        finally:
+            sel.close()
+
+    def close(self):
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.router", description="Router de mensajes 10011")
+    ap.add_argument("--port", type=int, default=DISP_MSG_PORT)
+    ap.add_argument("--stats", type=float, default=5.0, help="segundos entre estadísticas (0 = nunca)")
+    ap.add_argument("--log", action="store_true", help="loguear registros y pares gemelos")
+    ap.add_argument("--twin-hz", type=float, default=TWIN_HZ, help="reenvíos por segundo a cada gemelo")
+    args = ap.parse_args()
+
+    router = MessageRouter(args.port, log=args.log, twin_hz=args.twin_hz)
+    print(f"[ROUTER] Router de mensajes escuchando en 0.0.0.0:{args.port} "
+          f"(dispatcher.js con ESTER_MSG_ROUTER=python)")
+    try:
+        router.serve(stats_every=args.stats or None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        router.close()
@@ -0,0 +1,251 @@
+# ========================================================
+# ESTER-Grid - Spans de perfilado para los loops de los robots
+# ========================================================
+#
+# Los loops de comportamiento (coreografia, avanzar, movimiento_circular,
+# la máquina de estados de sigan_al_lider) mezclan cálculo, armado del
+# paquete, sendto y print en el mismo tick. Con spans se ve en qué se va
+# cada tick:
+#
+#   from ester_grid.spans import profiler
+#   prof = profiler()                       # activo solo con ESTER_PROFILE=1
+#
+#   with prof.span(robot_id, "tick"):
+#       with prof.span(robot_id, "compute"):
+#           ...mover...
+#       with prof.span(robot_id, "encode"):
+#           pkt = state_pkt.update(...)
+#       with prof.span(robot_id, "send"):
+#           sock.sendto(pkt, addr)
+#   prof.sleep(robot_id, TICK_RATE)         # time.sleep medido como "sleep"
+#
+# Desactivado, span() devuelve siempre el mismo objeto vacío: el costo es
+# una llamada y un if. Activado, cada hilo acumula en su propio dict (sin
+# locks en el camino caliente) y los spans anidados forman una pila
+# "ROB1;tick;encode". Al salir (o con dump()) se exporta:
+#
+#   - una tabla por robot y span (llamadas, total, media, self, máx, % del tiempo medido)
+#   - un archivo "collapsed stacks" (self-time en µs) para flamegraph.pl
+#     o speedscope: ESTER_PROFILE_OUT=logs/perfil → perfil.txt + perfil.folded
+#
+#   ESTER_PROFILE=1 ESTER_PROFILE_OUT=logs/perfil python robots/robots_30_udp.py
+#   python -m ester_grid.spans logs/perfil.folded [--all]
+
+import atexit
+import os
+import threading
+import time
+
+_perf_ns = time.perf_counter_ns
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("state", "robot", "name", "path", "t0", "child")
+
+    def __init__(self, state, robot, name):
+        self.state = state
+        self.robot = robot
+        self.name = name
+
+    def __enter__(self):
+        stack = self.state.stack
+        parent = stack[-1].path if stack else self.robot
+        self.path = parent + ";" + self.name
+        self.child = 0
+        stack.append(self)
+        self.t0 = _perf_ns()
+        return self
+
+    def __exit__(self, *exc):
+        dt = _perf_ns() - self.t0
+        state = self.state
+        state.stack.pop()
+        if state.stack:
+            state.stack[-1].child += dt
+        st = state.stats.get(self.path)
+        if st is None:
+            state.stats[self.path] = [1, dt, dt - self.child, dt]
+        else:
+            st[0] += 1
+            st[1] += dt
+            st[2] += dt - self.child
+            if dt > st[3]:
+                st[3] = dt
+        return False
+
+
+class _ThreadState:
+    __slots__ = ("stack", "stats")
+
+    def __init__(self):
+        self.stack = []
+        self.stats = {}   # "ROB1;tick;encode" -> [llamadas, total_ns, self_ns, max_ns]
+
+
+class Profiler:
+    """Acumula spans por robot; enabled=False deja todo en no-op."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._local = threading.local()
+        self._states = []
+        self._lock = threading.Lock()
+
+    def _state(self):
+        state = getattr(self._local, "state", None)
+        if state is None:
+            state = self._local.state = _ThreadState()
+            with self._lock:
+                self._states.append(state)
+        return state
+
+    def span(self, robot, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self._state(), str(robot), name)
+
+    def sleep(self, robot, seconds):
+        """time.sleep medido como span "sleep" (se ve cuánto del período queda libre)."""
+        if not self.enabled:
+            time.sleep(seconds)
+            return
+        with _Span(self._state(), str(robot), "sleep"):
+            time.sleep(seconds)
+
+    def reset(self):
+        with self._lock:
+            for state in self._states:
+                state.stats.clear()
+
+    # ----------------------------
+    # Agregados
+    # ----------------------------
+    def stats(self):
+        """{path: [llamadas, total_ns, self_ns, max_ns]} sumando todos los hilos."""
+        merged = {}
+        with self._lock:
+            states = list(self._states)
+        for state in states:
+            for path, st in list(state.stats.items()):
+                m = merged.get(path)
+                if m is None:
+                    merged[path] = list(st)
+                else:
+                    m[0] += st[0]
+                    m[1] += st[1]
+                    m[2] += st[2]
+                    m[3] = max(m[3], st[3])
+        return merged
+
+    def table(self, per_robot=True):
+        return format_table(self.stats(), per_robot)
+
+    def collapsed(self):
+        """Líneas "ROB1;tick;encode <self µs>" (formato de flamegraph.pl)."""
+        return [f"{path} {st[2] // 1000}" for path, st in sorted(self.stats().items()) if st[2] >= 1000]
+
+    def dump(self, prefix):
+        """Escribe prefix.txt (tabla) y prefix.folded (collapsed stacks)."""
+        folder = os.path.dirname(prefix)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(prefix + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.table() + "\n")
+        with open(prefix + ".folded", "w", encoding="utf-8") as f:
+            f.write("\n".join(self.collapsed()) + "\n")
+        return prefix + ".txt", prefix + ".folded"
+
+
+def _merge_robots(stats):
+    """Junta todos los robots bajo "*" (misma forma que stats())."""
+    out = {}
+    for path, st in stats.items():
+        _, _, rest = path.partition(";")
+        key = "*;" + rest
+        m = out.get(key)
+        if m is None:
+            out[key] = list(st)
+        else:
+            m[0] += st[0]
+            m[1] += st[1]
+            m[2] += st[2]
+            m[3] = max(m[3], st[3])
+    return out
+
+
+def format_table(stats, per_robot=True):
+    """Tabla de texto; el % es sobre el tiempo medido del robot (suma de sus spans de primer nivel)."""
+    if not per_robot:
+        stats = _merge_robots(stats)
+    roots = {}
+    for path, st in stats.items():
+        if path.count(";") == 1:
+            robot = path.partition(";")[0]
+            roots[robot] = roots.get(robot, 0) + st[1]
+    lines = [f"{'robot':<10} {'span':<28} {'llamadas':>9} {'total ms':>10} {'media µs':>10} "
+             f"{'self µs':>10} {'máx µs':>10} {'%':>7}"]
+    for path in sorted(stats):
+        n, total, self_ns, mx = stats[path]
+        robot, _, rest = path.partition(";")
+        base = roots.get(robot)
+        pct = f"{100.0 * total / base:6.1f}%" if base else "      -"
+        lines.append(f"{robot:<10} {rest:<28} {n:>9} {total / 1e6:>10.2f} {total / n / 1e3:>10.1f} "
+                     f"{self_ns / n / 1e3:>10.1f} {mx / 1e3:>10.1f} {pct:>7}")
+    return "\n".join(lines)
+
+
+def read_collapsed(path):
+    """Lee un .folded como stats(); el total de cada span es su self + el de sus hijos (sin llamadas ni máx)."""
+    self_ns = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, us = line.rstrip("\n").rpartition(" ")
+            if stack:
+                self_ns[stack] = self_ns.get(stack, 0) + int(us) * 1000
+    stats = {stack: [1, 0, ns, 0] for stack, ns in self_ns.items()}
+    for stack, ns in self_ns.items():
+        parts = stack.split(";")
+        for i in range(2, len(parts) + 1):
+            st = stats.setdefault(";".join(parts[:i]), [1, 0, 0, 0])
+            st[1] += ns
+    return stats
+
+
+_profiler = None
+
+
+def profiler():
+    """Profiler del proceso: activo con ESTER_PROFILE=1; con ESTER_PROFILE_OUT vuelca al salir."""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(os.environ.get("ESTER_PROFILE", "") not in ("", "0"))
+        out = os.environ.get("ESTER_PROFILE_OUT")
+        if _profiler.enabled:
+            if out:
+                atexit.register(_profiler.dump, out)
+            else:
+                atexit.register(lambda: print(_profiler.table()))
+    return _profiler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.spans", description="Tabla de un perfil .folded")
+    ap.add_argument("path")
+    ap.add_argument("--all", action="store_true", help="sumar todos los robots")
+    args = ap.parse_args()
+    print(format_table(read_collapsed(args.path), per_robot=not args.all))
@@ -0,0 +1,101 @@
+# ========================================================
+# ESTER-Grid - Grilla uniforme (broad-phase de colisiones)
+# ========================================================
+#
+# apply_movement probaba cada robot contra todos los robots y todos los
+# objetos: O(N²) + O(N·M) por tick (el laberinto solo ya trae ~160 paredes).
+# SpatialGrid reparte claves por celdas de `cell` px según su caja (AABB);
+# move() solo toca el diccionario cuando la caja cambia de celdas, así que
+# un robot que avanza 2 px por tick casi nunca paga nada. query() devuelve
+# las claves de las celdas que toca una caja: el narrow-phase de siempre
+# corre solo contra esos candidatos.
+#
+# El mismo esquema está en sim_server.js (class SpatialGrid).
+
+import math
+
+
+class SpatialGrid:
+    """Índice espacial de claves con caja (x ± hw, y ± hh) sobre celdas cuadradas."""
+
+    def __init__(self, cell=40.0):
+        self.cell = float(cell)
+        self.cells = {}   # (cx, cy) -> set(claves)
+        self.spans = {}   # clave -> (cx0, cy0, cx1, cy1)
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __contains__(self, key):
+        return key in self.spans
+
+    def _span(self, x, y, hw, hh):
+        inv = 1.0 / self.cell
+        return (math.floor((x - hw) * inv), math.floor((y - hh) * inv),
+                math.floor((x + hw) * inv), math.floor((y + hh) * inv))
+
+    def _add(self, key, span):
+        cx0, cy0, cx1, cy1 = span
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = {key}
+                else:
+                    bucket.add(key)
+
+    def _discard(self, key, span):
+        cx0, cy0, cx1, cy1 = span
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del cells[(cx, cy)]
+
+    def insert(self, key, x, y, hw=0.0, hh=0.0):
+        if key in self.spans:
+            self.move(key, x, y, hw, hh)
+            return
+        span = self._span(x, y, hw, hh)
+        self.spans[key] = span
+        self._add(key, span)
+
+    def move(self, key, x, y, hw=0.0, hh=0.0):
+        """Actualiza la caja; no hace nada si sigue en las mismas celdas."""
+        old = self.spans.get(key)
+        if old is None:
+            self.insert(key, x, y, hw, hh)
+            return
+        span = self._span(x, y, hw, hh)
+        if span == old:
+            return
+        self._discard(key, old)
+        self.spans[key] = span
+        self._add(key, span)
+
+    def remove(self, key):
+        span = self.spans.pop(key, None)
+        if span is not None:
+            self._discard(key, span)
+
+    def clear(self):
+        self.cells.clear()
+        self.spans.clear()
+
+    def query(self, x, y, hw=0.0, hh=0.0):
+        """Claves cuyas celdas se cruzan con la caja (x ± hw, y ± hh). Candidatos, no colisiones."""
+        cx0, cy0, cx1, cy1 = self._span(x, y, hw, hh)
+        cells = self.cells
+        if cx0 == cx1 and cy0 == cy1:
+            return set(cells.get((cx0, cy0), ()))
+        found = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return found
@@ -0,0 +1,254 @@
+# ========================================================
+# ESTER-Grid - Trazas binarias del tráfico de estado (UDP 10009)
+# Grabación append-only + replay con mmap a 1×, N× o a máxima velocidad
+# ========================================================
+#
+# events.log solo guarda joins/teleports/cmds/colisiones; las posiciones de
+# cada tick se pierden. Una traza guarda cada datagrama tal cual llegó
+# (JSON o binario) con su timestamp y su emisor:
+#
+#   cabecera  "ETRC" u8 versión  u8 0  u16 0  f64 inicio (epoch s)   16 bytes
+#   registro  u32 delta_us  u16 emisor  u16 largo  + datagrama        8 bytes + datos
+#
+# delta_us es el tiempo desde el registro anterior. emisor 0xFFFF define un
+# emisor nuevo ("ip:puerto" en los datos; recibe el id siguiente): hace falta
+# porque los ids binarios (ester_grid.binary) se internan por emisor.
+#
+# Grabar:
+#   - en el propio simulador: ESTER_TRACE=logs/sesion.etr node sim_server.js
+#   - o standalone: python -m ester_grid.trace record sesion.etr [--port 10009] [--forward ip:puerto]
+# Reproducir contra el simulador (un socket por emisor original):
+#   python -m ester_grid.trace replay sesion.etr [--speed 4 | --speed max]
+#   python -m ester_grid.trace info sesion.etr
+
+import mmap
+import socket
+import struct
+import time
+
+from .config import SIM_IP, SIM_PORT
+
+MAGIC = b"ETRC"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHd")
+RECORD = struct.Struct("<IHH")
+SENDER_DEF = 0xFFFF
+MAX_DELTA_US = 0xFFFFFFFF
+
+
+class TraceWriter:
+    """Escribe una traza; write(datagrama, (ip, puerto)) por cada paquete recibido."""
+
+    def __init__(self, path, buffering=1 << 16):
+        self.path = path
+        self.f = open(path, "wb", buffering=buffering)
+        self.f.write(HEADER.pack(MAGIC, VERSION, 0, 0, time.time()))
+        self._last = time.monotonic()
+        self._senders = {}
+        self.packets = 0
+        self.bytes = HEADER.size
+
+    def _sender_id(self, addr):
+        key = f"{addr[0]}:{addr[1]}" if isinstance(addr, tuple) else str(addr)
+        sid = self._senders.get(key)
+        if sid is None:
+            sid = len(self._senders)
+            if sid >= SENDER_DEF:
+                raise ValueError("Demasiados emisores distintos en una traza")
+            self._senders[key] = sid
+            name = key.encode("utf-8")
+            self.f.write(RECORD.pack(0, SENDER_DEF, len(name)))
+            self.f.write(name)
+            self.bytes += RECORD.size + len(name)
+        return sid
+
+    def write(self, data, addr, now=None):
+        sid = self._sender_id(addr)
+        now = time.monotonic() if now is None else now
+        delta = min(MAX_DELTA_US, max(0, int((now - self._last) * 1e6)))
+        self._last += delta / 1e6
+        self.f.write(RECORD.pack(delta, sid, len(data)))
+        self.f.write(data)
+        self.packets += 1
+        self.bytes += RECORD.size + len(data)
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    """
+    Lee una traza con mmap; iterar da (t_s, emisor "ip:puerto", memoryview del datagrama).
+    El memoryview apunta al mmap (sin copias): usar bytes(payload) para guardarlo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, _, self.started_at = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} no es una traza ESTER-Grid")
+        if version != VERSION:
+            raise ValueError(f"Versión de traza no soportada: {version}")
+        self.senders = []
+
+    def __iter__(self):
+        mm = self.mm
+        view = memoryview(mm)
+        end = len(mm)
+        off = HEADER.size
+        t_us = 0
+        senders = self.senders
+        senders.clear()
+        unpack = RECORD.unpack_from
+        try:
+            while off + RECORD.size <= end:
+                delta, sid, n = unpack(mm, off)
+                off += RECORD.size
+                if off + n > end:
+                    break  # registro cortado (traza todavía grabándose o proceso matado)
+                payload = view[off:off + n]
+                off += n
+                if sid == SENDER_DEF:
+                    senders.append(bytes(payload).decode("utf-8"))
+                    continue
+                t_us += delta
+                yield t_us / 1e6, senders[sid], payload
+        finally:
+            view.release()
+
+    def info(self):
+        packets = size = 0
+        first = last = None
+        for t, _sender, payload in self:
+            packets += 1
+            size += len(payload)
+            first = t if first is None else first
+            last = t
+        duration = (last - first) if packets > 1 else 0.0
+        return {
+            "path": self.path,
+            "started_at": self.started_at,
+            "packets": packets,
+            "senders": len(self.senders),
+            "payload_bytes": size,
+            "file_bytes": len(self.mm),
+            "duration_s": duration,
+            "rate_pps": packets / duration if duration > 0 else 0.0,
+        }
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def replay(path, addr=(SIM_IP, SIM_PORT), speed=1.0, progress=None):
+    """
+    Reenvía la traza a addr. speed=1.0 tiempo real, N = N veces más rápido,
+    None = sin esperas. Usa un socket por emisor original para que el
+    simulador vea los mismos emisores (ids binarios internados por emisor).
+    """
+    socks = {}
+    sent = 0
+    t_start = time.monotonic()
+    try:
+        with TraceReader(path) as reader:
+            for t, sender, payload in reader:
+                if speed is not None:
+                    delay = t_start + t / speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                s = socks.get(sender)
+                if s is None:
+                    s = socks[sender] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                s.sendto(payload, addr)
+                payload.release()
+                sent += 1
+                if progress is not None and sent % 10000 == 0:
+                    progress(sent, t)
+    finally:
+        for s in socks.values():
+            s.close()
+    wall = time.monotonic() - t_start
+    return {"packets": sent, "senders": len(socks), "wall_s": wall, "rate_pps": sent / wall if wall > 0 else 0.0}
+
+
+def record(path, port=SIM_PORT, host="0.0.0.0", forward=None, duration=None):
+    """Escucha en host:port y graba cada datagrama (opcionalmente reenviándolo a forward)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    sock.bind((host, port))
+    sock.settimeout(0.5)
+    out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) if forward else None
+    deadline = None if duration is None else time.monotonic() + duration
+    with TraceWriter(path) as writer:
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                try:
+                    data, addr = sock.recvfrom(65535)
+                except socket.timeout:
+                    continue
+                writer.write(data, addr)
+                if out is not None:
+                    out.sendto(data, forward)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.close()
+            if out is not None:
+                out.close()
+        return writer.packets
+
+
+def _addr(text):
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.trace", description="Trazas binarias de UDP 10009")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="grabar datagramas entrantes")
+    rec.add_argument("path")
+    rec.add_argument("--port", type=int, default=SIM_PORT)
+    rec.add_argument("--forward", type=_addr, help="reenviar cada datagrama a ip:puerto (modo tee)")
+    rec.add_argument("--duration", type=float)
+    rep = sub.add_parser("replay", help="reenviar una traza al simulador")
+    rep.add_argument("path")
+    rep.add_argument("--to", type=_addr, default=(SIM_IP, SIM_PORT))
+    rep.add_argument("--speed", default="1", help="factor de velocidad (1, 4, ...) o 'max'")
+    inf = sub.add_parser("info", help="resumen de una traza")
+    inf.add_argument("path")
+    args = ap.parse_args()
+
+    if args.cmd == "record":
+        print(f"[TRACE] Grabando UDP {args.port} en {args.path} (Ctrl+C para terminar)")
+        n = record(args.path, args.port, forward=args.forward, duration=args.duration)
+        print(f"[TRACE] {n} paquetes grabados")
+    elif args.cmd == "replay":
+        speed = None if args.speed == "max" else float(args.speed)
+        res = replay(args.path, args.to, speed,
+                     progress=lambda n, t: print(f"[TRACE] {n} paquetes (t={t:.1f} s)"))
+        print(f"[TRACE] {res['packets']} paquetes de {res['senders']} emisores en {res['wall_s']:.2f} s "
+              f"({res['rate_pps']:.0f} paq/s)")
+    else:
+        with TraceReader(args.path) as reader:
+            for k, v in reader.info().items():
+                print(f"{k}: {v}")
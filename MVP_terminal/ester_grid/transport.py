@@ -0,0 +1,556 @@
+# ========================================================
+# ESTER-Grid - Transporte UDP compartido (pool de sockets + sendmmsg)
+# ========================================================
+#
+# robot_mesh.send_mesh abría un socket por mensaje y los ejemplos 6/9/10/11
+# crean un sock_msg por robot: 30 robots = 30 descriptores solo para
+# mensajes, y una flota grande se queda sin fds. Acá:
+#
+#   - MeshTransport: pocos sockets por proceso (1 por defecto) hacia el
+#     router de mensajes (UDP 10011). Cada robot obtiene un MeshEndpoint con
+#     la misma interfaz que un socket (sendto / recvfrom / settimeout), pero
+#     todos salen por el socket del pool que les tocó. El dispatcher ve a
+#     esos robots en la misma ip:puerto; un hilo receptor reparte lo que
+#     llega según el destinatario del paquete:
+#         msg/reply     "to"                 ack/error   "for"
+#         twin_ack      "robot"              broadcast   todos los endpoints
+#         copia gemela  "for" (o el gemelo de "original_dest" / "mirrored_from")
+#         publish       suscriptores locales de "topic"   msg a "@grupo"  ídem
+#   - send_many(sock, [(datos, (ip, puerto)), ...]): varios datagramas en una
+#     sola syscall con sendmmsg(2) (Linux, vía ctypes); en otros sistemas,
+#     un sendto por datagrama. RecvBatch es lo mismo para recibir (recvmmsg).
+#   - el mismo loop corre timers (call_later) y, si el endpoint tiene
+#     on_packet, le entrega cada paquete sin pasar por la cola: es la base
+#     de ester_grid.messaging (futures para request/response)
+#
+#   from ester_grid import mesh_endpoint
+#   sock_msg = mesh_endpoint("R1A")   # en vez de socket.socket(AF_INET, SOCK_DGRAM)
+#   sock_msg.settimeout(0.05)
+#   sock_msg.sendto(json.dumps({"type": "register", "src": "R1A"}).encode(), (DISP_IP, DISP_MSG_PORT))
+#   data, addr = sock_msg.recvfrom(4096)
+
+import ctypes
+import errno
+import heapq
+import json
+import os
+import queue
+import selectors
+import socket
+import struct
+import threading
+import time
+
+from .config import DISP_IP, DISP_MSG_PORT
+
+MMSG_CHUNK = 256          # datagramas por llamada a sendmmsg
+QUEUE_SIZE = 1024         # paquetes pendientes por endpoint (más viejos se descartan)
+RCVBUF = 1 << 22
+
+
+# ----------------------------
+# sendmmsg(2) vía ctypes
+# ----------------------------
+class _IOVec(ctypes.Structure):
+    _fields_ = [("base", ctypes.c_void_p), ("len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("name", ctypes.c_void_p), ("namelen", ctypes.c_uint32),
+                ("iov", ctypes.POINTER(_IOVec)), ("iovlen", ctypes.c_size_t),
+                ("control", ctypes.c_void_p), ("controllen", ctypes.c_size_t),
+                ("flags", ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("hdr", _MsgHdr), ("len", ctypes.c_uint)]
+
+
+def _fmt(struct_type, names):
+    """Formato de struct.Struct con el mismo layout (offsets y relleno) que el Structure de ctypes."""
+    fmt, pos = "=", 0
+    for name in names:
+        field = getattr(struct_type, name)
+        fmt += "x" * (field.offset - pos) + {4: "I", 8: "Q"}[field.size]
+        pos = field.offset + field.size
+    return fmt, pos
+
+
+def _mmsg_struct():
+    fmt, pos = _fmt(_MsgHdr, ["name", "namelen", "iov", "iovlen", "control", "controllen", "flags"])
+    fmt += "x" * (_MMsgHdr.len.offset - pos) + "I"
+    fmt += "x" * (ctypes.sizeof(_MMsgHdr) - _MMsgHdr.len.offset - 4)
+    return struct.Struct(fmt)
+
+
+_IOV = struct.Struct(_fmt(_IOVec, ["base", "len"])[0])
+_MMSG = _mmsg_struct()
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _sendmmsg = _libc.sendmmsg
+    _sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    _sendmmsg.restype = ctypes.c_int
+    HAVE_SENDMMSG = _IOV.size == ctypes.sizeof(_IOVec) and _MMSG.size == ctypes.sizeof(_MMsgHdr)
+except (OSError, AttributeError):
+    _sendmmsg = None
+    HAVE_SENDMMSG = False
+
+_sockaddrs = {}
+
+
+def _sockaddr(addr):
+    """Dirección en memoria de un sockaddr_in (16 bytes), cacheado por (ip, puerto)."""
+    sa = _sockaddrs.get(addr)
+    if sa is None:
+        host, port = addr
+        raw = (struct.pack("=H", socket.AF_INET) + struct.pack("!H", port)
+               + socket.inet_aton(socket.gethostbyname(host)) + bytes(8))
+        buf = ctypes.create_string_buffer(raw, len(raw))
+        sa = _sockaddrs[addr] = (buf, ctypes.addressof(buf))
+    return sa[1]
+
+
+def _sendmmsg_all(fd, items):
+    """
+    Arma los mmsghdr/iovec con struct.pack_into sobre dos bytearrays (sin un
+    objeto ctypes por datagrama) y los datos concatenados en un solo buffer.
+    """
+    n = len(items)
+    payload = b"".join([d for d, _ in items])
+    data_buf = ctypes.create_string_buffer(payload, max(1, len(payload)))
+    data_at = ctypes.addressof(data_buf)
+    isz, msz = _IOV.size, _MMSG.size
+    iovs = bytearray(isz * n)
+    hdrs = bytearray(msz * n)
+    iov_at = ctypes.addressof((ctypes.c_char * len(iovs)).from_buffer(iovs))
+    hdr_at = ctypes.addressof((ctypes.c_char * len(hdrs)).from_buffer(hdrs))
+    pack_iov, pack_hdr = _IOV.pack_into, _MMSG.pack_into
+    off = 0
+    for i, (data, addr) in enumerate(items):
+        size = len(data)
+        pack_iov(iovs, i * isz, data_at + off, size)
+        pack_hdr(hdrs, i * msz, _sockaddr(addr), 16, iov_at + i * isz, 1, 0, 0, 0, 0)
+        off += size
+    done = 0
+    while done < n:
+        sent = _sendmmsg(fd, hdr_at + done * msz, n - done, 0)
+        if sent < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"sendmmsg: {os.strerror(err)}")
+        done += sent
+    return done
+
+
+def send_many(sock, items):
+    """
+    Envía [(datos, (ip, puerto)), ...] por sock. Con sendmmsg disponible y un
+    socket AF_INET real, en lotes de MMSG_CHUNK por syscall. Devuelve la cantidad.
+    Los datos se copian al armar el lote: se pueden pasar buffers que se reusan (StatePacket).
+    """
+    if not items:
+        return 0
+    if (not HAVE_SENDMMSG or len(items) == 1 or not isinstance(sock, socket.socket)
+            or sock.family != socket.AF_INET):
+        for data, addr in items:
+            sock.sendto(data, addr)
+        return len(items)
+    fd = sock.fileno()
+    for i in range(0, len(items), MMSG_CHUNK):
+        _sendmmsg_all(fd, items[i:i + MMSG_CHUNK])
+    return len(items)
+
+
+try:
+    _recvmmsg = _libc.recvmmsg
+    _recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    _recvmmsg.restype = ctypes.c_int
+    HAVE_RECVMMSG = HAVE_SENDMMSG
+except (NameError, AttributeError):
+    _recvmmsg = None
+    HAVE_RECVMMSG = False
+
+MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0x40)
+MSG_TRUNC = getattr(socket, "MSG_TRUNC", 0x20)
+
+
+class RecvBatch:
+    """
+    Recibe hasta `slots` datagramas por syscall con recvmmsg(2) sobre buffers
+    preasignados (slot_size bytes cada uno). Sin recvmmsg, recvfrom en un
+    socket no bloqueante hasta vaciarlo. recv() no bloquea: devuelve
+    [(bytes, (ip, puerto)), ...], vacía si no había nada.
+    """
+
+    def __init__(self, sock, slots=64, slot_size=16384):
+        self.sock = sock
+        self.slots = slots
+        self.slot_size = slot_size
+        self.truncated = 0
+        self._native = HAVE_RECVMMSG and sock.family == socket.AF_INET
+        self._addrs = {}
+        if not self._native:
+            sock.setblocking(False)
+            return
+        self._data = ctypes.create_string_buffer(slots * slot_size)
+        self._names = ctypes.create_string_buffer(slots * 16)
+        self._iovs = ctypes.create_string_buffer(slots * _IOV.size)
+        self._hdrs = ctypes.create_string_buffer(slots * _MMSG.size)
+        data_at, names_at, iov_at = (ctypes.addressof(self._data), ctypes.addressof(self._names),
+                                     ctypes.addressof(self._iovs))
+        for i in range(slots):
+            _IOV.pack_into(self._iovs, i * _IOV.size, data_at + i * slot_size, slot_size)
+            _MMSG.pack_into(self._hdrs, i * _MMSG.size, names_at + i * 16, 16, iov_at + i * _IOV.size, 1, 0, 0, 0, 0)
+        self._template = self._hdrs.raw  # namelen/len vuelven a su valor antes de cada llamada
+        self._len_at = _MMsgHdr.len.offset
+        self._flags_at = _MsgHdr.flags.offset
+
+    def _addr(self, raw):
+        addr = self._addrs.get(raw)
+        if addr is None:
+            port = struct.unpack_from("!H", raw, 2)[0]
+            addr = self._addrs[raw] = (socket.inet_ntoa(raw[4:8]), port)
+        return addr
+
+    def recv(self):
+        if not self._native:
+            out = []
+            for _ in range(self.slots):
+                try:
+                    out.append(self.sock.recvfrom(self.slot_size))
+                except (BlockingIOError, InterruptedError):
+                    break
+            return out
+        ctypes.memmove(self._hdrs, self._template, len(self._template))
+        n = _recvmmsg(self.sock.fileno(), ctypes.addressof(self._hdrs), self.slots, MSG_DONTWAIT, None)
+        if n <= 0:
+            err = ctypes.get_errno()
+            if n < 0 and err not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                raise OSError(err, f"recvmmsg: {os.strerror(err)}")
+            return []
+        hdrs, data, names = self._hdrs, self._data, self._names.raw
+        size, msz = self.slot_size, _MMSG.size
+        out = []
+        for i in range(n):
+            base = i * msz
+            length = struct.unpack_from("I", hdrs, base + self._len_at)[0]
+            if struct.unpack_from("i", hdrs, base + self._flags_at)[0] & MSG_TRUNC:
+                self.truncated += 1
+                continue
+            out.append((data[i * size:i * size + length], self._addr(names[i * 16:i * 16 + 8])))
+        return out
+
+
+# ----------------------------
+# Mensajes robot-robot por pocos sockets
+# ----------------------------
+class MeshEndpoint:
+    """Socket "virtual" de un robot sobre MeshTransport (sendto/recvfrom/settimeout)."""
+
+    def __init__(self, transport, robot_id, sock):
+        self.transport = transport
+        self.robot_id = robot_id
+        self.sock = sock
+        self.inbox = queue.Queue(QUEUE_SIZE)
+        self.dropped = 0
+        self.on_packet = None     # fn(pkt, addr): entrega directa en el hilo del transporte (sin cola)
+        self._timeout = None
+
+    def settimeout(self, timeout):
+        self._timeout = timeout
+
+    def gettimeout(self):
+        return self._timeout
+
+    def getsockname(self):
+        return self.sock.getsockname()
+
+    def sendto(self, data, addr=None):
+        if b'"twin_' in data:
+            self.transport._note_twin(data)
+        if b'subscribe"' in data:
+            self.transport._note_topics(data)
+        return self.sock.sendto(data, addr or self.transport.router)
+
+    def send_json(self, pkt, addr=None):
+        return self.sendto(json.dumps(pkt).encode("utf-8"), addr)
+
+    def _get(self):
+        try:
+            if self._timeout is None:
+                return self.inbox.get()
+            return self.inbox.get(timeout=self._timeout) if self._timeout > 0 else self.inbox.get_nowait()
+        except queue.Empty:
+            raise socket.timeout("timed out") from None
+
+    def recvfrom(self, bufsize=65535):
+        data, addr, _pkt = self._get()
+        return data[:bufsize], addr
+
+    def recv_json(self):
+        """Como recvfrom pero devuelve el paquete ya decodificado (sin volver a parsear)."""
+        return self._get()[2]
+
+    def _deliver(self, item):
+        if self.on_packet is not None:
+            try:
+                self.on_packet(item[2], item[1])
+            except Exception as e:
+                print(f"[{self.robot_id}] Error en on_packet: {e!r}")
+            return
+        try:
+            self.inbox.put_nowait(item)
+        except queue.Full:
+            try:
+                self.inbox.get_nowait()   # descartar el más viejo
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            self.inbox.put_nowait(item)
+
+    def close(self):
+        self.transport.release(self.robot_id)
+
+
+class MeshTransport:
+    """Pool de `sockets` sockets UDP compartidos por todos los robots del proceso."""
+
+    def __init__(self, sockets=1, router=(DISP_IP, DISP_MSG_PORT)):
+        self.router = router
+        self._socks = []
+        self._sel = selectors.DefaultSelector()
+        for _ in range(max(1, sockets)):
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF)
+            s.bind(("0.0.0.0", 0))
+            self._socks.append(s)
+            self._sel.register(s, selectors.EVENT_READ)
+        self._endpoints = {}
+        self._twins = {}
+        self._topics = {}         # tópico/grupo -> {robots locales suscriptos}
+        self._assigned = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._timers = []         # heap de [cuándo, n, fn, cancelado]
+        self._timer_seq = 0
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._sel.register(self._wake_r, selectors.EVENT_READ)
+        self._closed = False
+        self.stats = {"rx": 0, "routed": 0, "unroutable": 0, "invalid": 0}
+
+    @property
+    def fds(self):
+        return len(self._socks)
+
+    def endpoint(self, robot_id):
+        """MeshEndpoint del robot (el mismo si ya existía)."""
+        with self._lock:
+            ep = self._endpoints.get(robot_id)
+            if ep is None:
+                sock = self._socks[self._assigned % len(self._socks)]
+                self._assigned += 1
+                ep = self._endpoints[robot_id] = MeshEndpoint(self, robot_id, sock)
+            self._start()
+        return ep
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="mesh-transport", daemon=True)
+            self._thread.start()
+
+    # ----------------------------
+    # Timers (en el mismo loop del selector)
+    # ----------------------------
+    def call_later(self, delay, fn):
+        """Ejecuta fn() en el hilo del transporte dentro de `delay` s. Devuelve un handle para cancel()."""
+        with self._lock:
+            self._timer_seq += 1
+            handle = [time.monotonic() + delay, self._timer_seq, fn, False]
+            heapq.heappush(self._timers, handle)
+            first = self._timers[0] is handle
+            self._start()
+        if first:
+            try:
+                self._wake_w.send(b"\0")   # despertar el select para que recalcule el timeout
+            except OSError:
+                pass
+        return handle
+
+    @staticmethod
+    def cancel(handle):
+        handle[3] = True
+
+    def _run_timers(self):
+        """Corre los timers vencidos; devuelve cuánto falta para el próximo (máx. 0.5 s)."""
+        while True:
+            with self._lock:
+                if not self._timers:
+                    return 0.5
+                handle = self._timers[0]
+                wait = handle[0] - time.monotonic()
+                if wait > 0:
+                    return min(0.5, wait)
+                heapq.heappop(self._timers)
+            if not handle[3]:
+                try:
+                    handle[2]()
+                except Exception as e:
+                    print(f"[MESH] Error en timer: {e!r}")
+
+    def release(self, robot_id):
+        with self._lock:
+            self._endpoints.pop(robot_id, None)
+            for topic, members in list(self._topics.items()):
+                members.discard(robot_id)
+                if not members:
+                    del self._topics[topic]
+
+    def send_many(self, items, robot_id=None):
+        """Varios datagramas por el socket de robot_id (o el primero del pool)."""
+        ep = self._endpoints.get(robot_id) if robot_id is not None else None
+        return send_many(ep.sock if ep else self._socks[0], items)
+
+    def _note_twin(self, data):
+        try:
+            pkt = json.loads(data)
+        except ValueError:
+            return
+        src = pkt.get("src")
+        with self._lock:
+            if pkt.get("type") == "twin_register":
+                twin = pkt.get("twin") or pkt.get("twin_id")
+                if src and twin:
+                    self._twins[src] = twin
+                    self._twins[twin] = src
+            elif pkt.get("type") == "twin_unregister":
+                twin = self._twins.pop(src, None)
+                if twin is not None:
+                    self._twins.pop(twin, None)
+
+    def _note_topics(self, data):
+        try:
+            pkt = json.loads(data)
+        except ValueError:
+            return
+        kind = pkt.get("type")
+        if kind not in ("subscribe", "unsubscribe"):
+            return
+        src = pkt.get("src")
+        topics = pkt.get("topics")
+        if topics is None:
+            topics = [pkt["topic"]] if pkt.get("topic") else []
+        elif isinstance(topics, str):
+            topics = [topics]
+        with self._lock:
+            if kind == "subscribe":
+                for t in topics:
+                    self._topics.setdefault(t, set()).add(src)
+                return
+            for t in (topics or [t for t, members in self._topics.items() if src in members]):
+                members = self._topics.get(t)
+                if members is not None:
+                    members.discard(src)
+                    if not members:
+                        del self._topics[t]
+
+    def _subscribers(self, topic):
+        if not isinstance(topic, str):
+            return []
+        eps = self._endpoints
+        return [eps[r] for r in self._topics.get(topic, ()) if r in eps]
+
+    def _targets(self, pkt):
+        eps = self._endpoints
+        twins = self._twins
+        kind = pkt.get("type")
+        if pkt.get("twin_copy") or "mirrored_from" in pkt:
+            dest = pkt.get("for")
+            if not dest:
+                orig = pkt.get("original_dest") or pkt.get("mirrored_from")
+                dest = twins.get(orig) if isinstance(orig, str) else None
+        elif kind == "broadcast":
+            return list(eps.values())
+        elif kind in ("ack", "sub_ack", "error"):
+            dest = pkt.get("for")
+            if dest is None:
+                return list(eps.values())   # error sin remitente conocido: a todos
+        elif kind == "publish":
+            return self._subscribers(pkt.get("topic"))
+        elif kind in ("twin_ack", "twin_unregister_ack"):
+            dest = pkt.get("robot")
+        else:
+            dest = pkt.get("to") or pkt.get("dest") or pkt.get("target") or pkt.get("dst")
+            if isinstance(dest, str) and dest.startswith("@"):
+                return self._subscribers(dest[1:])
+        ep = eps.get(dest) if isinstance(dest, str) else None   # "to":["x"] no es un destino
+        return [ep] if ep is not None else []
+
+    def _loop(self):
+        stats = self.stats
+        wake = self._wake_r
+        timeout = 0.5
+        while not self._closed:
+            try:
+                events = self._sel.select(timeout=timeout)
+            except (OSError, ValueError):
+                break
+            for key, _ in events:
+                if key.fileobj is wake:
+                    try:
+                        wake.recv(4096)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    data, addr = key.fileobj.recvfrom(65535)
+                except OSError:
+                    continue
+                stats["rx"] += 1
+                try:
+                    pkt = json.loads(data)
+                except ValueError:
+                    stats["invalid"] += 1
+                    continue
+                try:
+                    targets = self._targets(pkt) if isinstance(pkt, dict) else []
+                except Exception as e:    # un paquete raro no puede parar el hilo de todos los robots
+                    print(f"[MESH] Paquete descartado de {addr[0]}:{addr[1]}: {e!r}")
+                    targets = []
+                if not targets:
+                    stats["unroutable"] += 1
+                    continue
+                item = (data, addr, pkt)
+                for ep in targets:
+                    ep._deliver(item)
+                stats["routed"] += 1
+            timeout = self._run_timers()
+
+    def close(self):
+        self._closed = True
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._sel.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        for s in self._socks:
+            s.close()
+
+
+_mesh = None
+_mesh_lock = threading.Lock()
+
+
+def mesh_transport():
+    """MeshTransport del proceso (se crea la primera vez)."""
+    global _mesh
+    if _mesh is None:
+        with _mesh_lock:
+            if _mesh is None:
+                _mesh = MeshTransport()
+    return _mesh
+
+
+def mesh_endpoint(robot_id):
+    """Endpoint de mensajes del robot sobre el transporte compartido del proceso."""
+    return mesh_transport().endpoint(robot_id)
@@ -0,0 +1,305 @@
+# ========================================================
+# ESTER-Grid - Digests de estado para detectar divergencia de gemelos
+# ========================================================
+#
+# Un par registrado con twin_register no tiene forma de saber si sigue en
+# sync salvo mandarse estados completos. Con digests:
+#
+#   - cada estado se cuantiza (QUANT_POS px, QUANT_ROT grados) y se resume en
+#     una hoja de 8 bytes (blake2b)
+#   - los pares se reparten en grupos fijos (crc32 del id físico) y cada
+#     grupo tiene un hash de sus hojas ordenadas (un nivel de Merkle)
+#   - DigestPublisher (el lado que tiene los estados físicos) publica cada
+#     `period` s en el tópico "twin_digest" solo los hashes de grupo: 1000
+#     pares = 16 grupos = un datagrama de ~300 bytes
+#   - DigestChecker (el lado de los gemelos) calcula lo mismo con sus
+#     estados; para cada grupo distinto pide las hojas, y para cada hoja
+#     distinta pide el estado completo: solo viaja lo que difiere
+#   - report() da por par la distancia, la diferencia de rumbo y hace
+#     cuánto que divergen (las que se cierran quedan en `resolved`)
+#
+# Todo corre sobre MessageClient (pub/sub del router y request/response con
+# futures, en el loop del transporte: sin hilos propios). Un salto de celda
+# de cuantización da un falso positivo que se descarta al comparar el
+# estado completo contra la tolerancia.
+#
+#   pub = DigestPublisher("DIGEST_FIS", pairs, lambda: {pid: (x, y, rot), ...})
+#   chk = DigestChecker("DIGEST_GEM", "DIGEST_FIS", pairs, lambda: {pid: (x, y, rot), ...})
+#   chk.report()
+#
+#   python -m ester_grid.twindigest --pairs 1000 --diverge 5 --seconds 5
+
+import hashlib
+import json
+import math
+import struct
+import time
+import zlib
+
+from .messaging import MessageClient
+
+TOPIC = "twin_digest"
+QUANT_POS = 2.0          # px por celda de cuantización
+QUANT_ROT = 5.0          # grados por celda
+TOL_POS = 3.0            # px: por debajo no se considera divergencia
+TOL_ROT = 8.0            # grados
+GROUP_SIZE = 64          # pares por grupo (aprox.)
+PERIOD = 1.0
+REQUEST_TIMEOUT = 1.0
+
+_Q = struct.Struct("<iii")
+MISSING = b"\0" * 8
+
+
+def quantize(x, y, rot):
+    return (int(math.floor(x / QUANT_POS + 0.5)), int(math.floor(y / QUANT_POS + 0.5)),
+            int(math.floor((rot % 360.0) / QUANT_ROT + 0.5)) % int(360 / QUANT_ROT))
+
+
+def leaf(pair_id, state):
+    """Hoja de 8 bytes del estado cuantizado (MISSING si no hay estado)."""
+    if state is None:
+        return MISSING
+    h = hashlib.blake2b(pair_id.encode("utf-8"), digest_size=8)
+    h.update(_Q.pack(*quantize(*state[:3])))
+    return h.digest()
+
+
+def group_of(pair_id, n_groups):
+    return zlib.crc32(pair_id.encode("utf-8")) % n_groups
+
+
+def n_groups_for(n_pairs):
+    return max(1, math.ceil(n_pairs / GROUP_SIZE))
+
+
+def group_leaves(states, pair_ids, n_groups):
+    """[{pair_id: hoja}] por grupo."""
+    groups = [{} for _ in range(n_groups)]
+    for pid in pair_ids:
+        groups[group_of(pid, n_groups)][pid] = leaf(pid, states.get(pid))
+    return groups
+
+
+def group_hash(leaves):
+    h = hashlib.blake2b(digest_size=8)
+    for pid in sorted(leaves):
+        h.update(leaves[pid])
+    return h.hexdigest()
+
+
+def divergence(a, b):
+    """(distancia px, diferencia de rumbo en grados) entre dos estados (x, y, rot)."""
+    drot = abs((a[2] - b[2] + 180.0) % 360.0 - 180.0)
+    return math.hypot(a[0] - b[0], a[1] - b[1]), drot
+
+
+class DigestPublisher:
+    """Lado físico: publica los hashes de grupo y contesta pedidos de hojas y estados."""
+
+    def __init__(self, agent_id, pair_ids, states, period=PERIOD, client=None, **client_kw):
+        self.client = client or MessageClient(agent_id, **client_kw)
+        self.pair_ids = sorted(pair_ids)
+        self.n_groups = n_groups_for(len(self.pair_ids))
+        self.states = states          # fn() -> {pair_id: (x, y, rot)}
+        self.period = period
+        self.seq = 0
+        self.stats = {"digests": 0, "leaf_requests": 0, "state_requests": 0, "bytes": 0}
+        self._groups = None
+        self._running = True
+        self.client.register()
+        self.client.on("msg", self._on_request)
+        self.client.transport.call_later(0, self._tick)
+
+    def _tick(self):
+        if not self._running:
+            return
+        self._groups = group_leaves(self.states(), self.pair_ids, self.n_groups)
+        self.seq += 1
+        data = {"seq": self.seq, "n": len(self.pair_ids), "g": [group_hash(g) for g in self._groups]}
+        self.client.publish(TOPIC, data)
+        self.stats["digests"] += 1
+        self.stats["bytes"] += len(json.dumps(data))
+        self.client.transport.call_later(self.period, self._tick)
+
+    def _on_request(self, pkt):
+        req = pkt.get("data") or {}
+        op = req.get("op")
+        if op == "leaves":
+            groups = self._groups or group_leaves(self.states(), self.pair_ids, self.n_groups)
+            g = req.get("g", 0)
+            leaves = {pid: h.hex() for pid, h in groups[g].items()} if 0 <= g < len(groups) else {}
+            self.stats["leaf_requests"] += 1
+            self.client.reply(pkt, {"g": g, "leaves": leaves})
+        elif op == "states":
+            states = self.states()
+            self.stats["state_requests"] += 1
+            self.client.reply(pkt, {"states": {pid: list(states[pid][:3]) for pid in req.get("ids", ()) if pid in states}})
+
+    def close(self):
+        self._running = False
+        self.client.close()
+
+
+class DigestChecker:
+    """Lado gemelo: compara digests, baja al detalle solo donde difieren y lleva el reporte."""
+
+    def __init__(self, agent_id, publisher_id, pair_ids, states, tol_pos=TOL_POS, tol_rot=TOL_ROT,
+                 on_divergence=None, client=None, **client_kw):
+        self.client = client or MessageClient(agent_id, **client_kw)
+        self.publisher_id = publisher_id
+        self.pair_ids = sorted(pair_ids)
+        self.n_groups = n_groups_for(len(self.pair_ids))
+        self.states = states          # fn() -> {pair_id físico: (x, y, rot) del gemelo}
+        self.tol_pos = tol_pos
+        self.tol_rot = tol_rot
+        self.on_divergence = on_divergence   # fn(pair_id, estado_físico, dist, drot)
+        self.divergent = {}           # pair_id -> [desde, última_vez, dist, drot]
+        self.resolved = []            # (pair_id, duración s, dist máx)
+        self.stats = {"digests": 0, "groups_differ": 0, "leaves_differ": 0, "false_positives": 0,
+                      "timeouts": 0, "last_seq": None}
+        self._max_dist = {}
+        self.client.register()
+        self.client.subscribe(TOPIC, self._on_digest)
+
+    # ----------------------------
+    # Comparación
+    # ----------------------------
+    def _on_digest(self, pkt):
+        data = pkt.get("data") or {}
+        remote = data.get("g") or []
+        self.stats["digests"] += 1
+        self.stats["last_seq"] = data.get("seq")
+        if len(remote) != self.n_groups:
+            return
+        mine = group_leaves(self.states(), self.pair_ids, self.n_groups)
+        now = time.monotonic()
+        for g, leaves in enumerate(mine):
+            if group_hash(leaves) == remote[g]:
+                for pid in leaves:
+                    self._resolve(pid, now)
+                continue
+            self.stats["groups_differ"] += 1
+            fut = self.client.request(self.publisher_id, {"op": "leaves", "g": g}, timeout=REQUEST_TIMEOUT)
+            fut.add_done_callback(lambda f, leaves=leaves: self._on_leaves(f, leaves))
+
+    def _on_leaves(self, fut, mine):
+        try:
+            remote = fut.result()["data"]["leaves"]
+        except Exception:
+            self.stats["timeouts"] += 1
+            return
+        now = time.monotonic()
+        differ = []
+        for pid, h in mine.items():
+            if remote.get(pid) == h.hex():
+                self._resolve(pid, now)
+            else:
+                differ.append(pid)
+        if not differ:
+            return
+        self.stats["leaves_differ"] += len(differ)
+        fut = self.client.request(self.publisher_id, {"op": "states", "ids": differ}, timeout=REQUEST_TIMEOUT)
+        fut.add_done_callback(lambda f: self._on_states(f, differ))
+
+    def _on_states(self, fut, ids):
+        try:
+            remote = fut.result()["data"]["states"]
+        except Exception:
+            self.stats["timeouts"] += 1
+            return
+        now = time.monotonic()
+        mine = self.states()
+        for pid in ids:
+            phys, twin = remote.get(pid), mine.get(pid)
+            if phys is None or twin is None:
+                dist, drot = math.inf, 180.0
+            else:
+                dist, drot = divergence(phys, twin)
+            if dist <= self.tol_pos and drot <= self.tol_rot:
+                self.stats["false_positives"] += 1
+                self._resolve(pid, now)
+                continue
+            entry = self.divergent.get(pid)
+            if entry is None:
+                self.divergent[pid] = [now, now, dist, drot]
+            else:
+                entry[1:] = [now, dist, drot]
+            self._max_dist[pid] = max(self._max_dist.get(pid, 0.0), dist)
+            if self.on_divergence is not None and phys is not None:
+                self.on_divergence(pid, phys, dist, drot)
+
+    def _resolve(self, pid, now):
+        entry = self.divergent.pop(pid, None)
+        if entry is not None:
+            self.resolved.append((pid, now - entry[0], self._max_dist.pop(pid, entry[2])))
+
+    # ----------------------------
+    # Reporte
+    # ----------------------------
+    def report(self):
+        now = time.monotonic()
+        return {
+            "pairs": len(self.pair_ids),
+            "groups": self.n_groups,
+            "divergent": {pid: {"dist_px": round(e[2], 1), "drot_deg": round(e[3], 1),
+                                "for_s": round(now - e[0], 2), "checked_s_ago": round(now - e[1], 2)}
+                          for pid, e in sorted(self.divergent.items())},
+            "resolved": len(self.resolved),
+            "stats": dict(self.stats),
+        }
+
+    def format_report(self, limit=10):
+        rep = self.report()
+        lines = [f"[DIGEST] {rep['pairs']} pares en {rep['groups']} grupos: {len(rep['divergent'])} divergentes, "
+                 f"{rep['resolved']} resueltos, digest #{rep['stats']['last_seq']}"]
+        worst = sorted(rep["divergent"].items(), key=lambda kv: -kv[1]["dist_px"])[:limit]
+        for pid, d in worst:
+            lines.append(f"  {pid:<12} {d['dist_px']:>8.1f} px {d['drot_deg']:>6.1f}°  hace {d['for_s']:.1f} s")
+        return "\n".join(lines)
+
+    def close(self):
+        self.client.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import threading
+
+    from .router import MessageRouter
+
+    ap = argparse.ArgumentParser(prog="python -m ester_grid.twindigest",
+                                 description="Demo: N pares gemelos, algunos divergen; cuenta paquetes y bytes")
+    ap.add_argument("--pairs", type=int, default=1000)
+    ap.add_argument("--diverge", type=int, default=5, help="pares a los que se les corre el gemelo")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--port", type=int, default=20011, help="router de prueba en este puerto")
+    args = ap.parse_args()
+
+    router = MessageRouter(args.port)
+    threading.Thread(target=router.serve, daemon=True).start()
+    addr = ("127.0.0.1", args.port)
+
+    ids = [f"PHYS_{i}" for i in range(args.pairs)]
+    phys = {pid: (random.uniform(0, 900), random.uniform(0, 600), random.uniform(0, 360)) for pid in ids}
+    twin = dict(phys)
+    pub = DigestPublisher("DIGEST_FIS", ids, lambda: phys, router=addr)
+    chk = DigestChecker("DIGEST_GEM", "DIGEST_FIS", ids, lambda: twin, router=addr)
+    time.sleep(0.5)
+    drifted = random.sample(ids, args.diverge)
+    for pid in drifted:
+        x, y, rot = twin[pid]
+        twin[pid] = (x + random.uniform(10, 40), y, rot)
+    rx0 = router.stats["rx"]
+    t0 = time.monotonic()
+    time.sleep(args.seconds / 2)
+    if drifted:
+        twin[drifted[0]] = phys[drifted[0]]        # uno vuelve a sync a mitad de la corrida
+    time.sleep(args.seconds / 2)
+    dt = time.monotonic() - t0
+    print(chk.format_report())
+    for pid, dur, dist in chk.resolved:
+        print(f"  resuelto {pid}: {dur:.1f} s divergente, máx {dist:.1f} px")
+    print(f"[DIGEST] {(router.stats['rx'] - rx0) / dt:.1f} paquetes/s por el router, "
+          f"{pub.stats['bytes'] / max(1, pub.stats['digests']):.0f} bytes por digest")
@@ -2,11 +2,16 @@
 # ESTER-Grid Robot Mesh Messaging
 # Send direct robot-to-robot messages via dispatcher
 # ===============================================
-import socket
+import os
+import sys
 import json
 import time
 import argparse
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ester_grid import shared_socket
+from ester_grid.transport import send_many
+
 DISPATCHER = ("127.0.0.1", 9999)
 
 
@@ -20,11 +25,28 @@ def send_mesh(src_robot, dst_robot, cmd, value=None, dispatcher=DISPATCHER):
         "ts": int(time.time() * 1000)
     }
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.sendto(json.dumps(packet).encode(), dispatcher)
+    # Socket de envío del proceso: no se abre uno por mensaje
+    shared_socket().sendto(json.dumps(packet).encode(), dispatcher)
     print(f"[Mesh] {src_robot} → {dst_robot}: {cmd} {value if value else ''}")
 
 
+def send_mesh_many(messages, dispatcher=DISPATCHER):
+    """Varios (src, dst, cmd, value) en una sola syscall (sendmmsg donde exista)."""
+    ts = int(time.time() * 1000)
+    items = []
+    for src_robot, dst_robot, cmd, value in messages:
+        packet = {
+            "src": src_robot,
+            "dst": dst_robot,
+            "type": "cmd",
+            "cmd": cmd,
+            "data": {"value": value} if value is not None else {},
+            "ts": ts
+        }
+        items.append((json.dumps(packet).encode(), dispatcher))
+    return send_many(shared_socket(), items)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Send a mesh command via dispatcher")
     parser.add_argument('--from', dest='src', required=True, help='Source robot id')
@@ -2,11 +2,18 @@
 # EGUP v3 - Máquina de estados con control de tiempo no bloqueante
 # =====================================================
 
+import os
+import sys
 import socket
 import json
 import time
 import math
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ester_grid.spans import profiler
+
+prof = profiler()  # ESTER_PROFILE=1: compute/encode/send/print/sleep por tick (ester_grid.spans)
+
 ROBOT_ID = "ROB1"
 UDP_PORT = 9999
 DISPATCHER_ADDR = ("127.0.0.1", UDP_PORT)
@@ -55,14 +62,18 @@ def send_state(cmd=None, cmd_data=None):
     if cmd:
         packet["cmd"] = cmd
         packet["cmdData"] = cmd_data
-    sock.sendto(json.dumps(packet).encode(), DISPATCHER_ADDR)
+    with prof.span(ROBOT_ID, "encode"):
+        data = json.dumps(packet).encode()
+    with prof.span(ROBOT_ID, "send"):
+        sock.sendto(data, DISPATCHER_ADDR)
 
 def rotar_hacia(target):
     dx = target[0] - robot_state["pos"][0]
     dy = target[1] - robot_state["pos"][1]
     angle = math.degrees(math.atan2(dy, dx)) % 360
     robot_state["rot"] = angle
-    print(f"[{ROBOT_ID}] Rotando hacia {angle:.1f}°")
+    with prof.span(ROBOT_ID, "print"):
+        print(f"[{ROBOT_ID}] Rotando hacia {angle:.1f}°")
 
 def girar_alrededor(centro, actual, angulo_grados):
     cx, cy = centro
@@ -84,45 +95,46 @@ STATE_DURATIONS = {
 RADIO_CIRCLE = 200
 ANGULO_POR_ITERACION = 10
 while True:
-    current_time = time.time()
-    elapsed = current_time - STATE_START_TIME
-
-    if STATE == 0:
-        # Estado 0: teleport inicial
-        teletransportar(INIT_POS[0], INIT_POS[1], 0)
-        send_state("teleport", {"x": INIT_POS[0], "y": INIT_POS[1], "rot": 0})
-        TARGET_POS = [INIT_POS[0] + 100, INIT_POS[1]]  # punto para moverse en X
-        STATE_START_TIME = time.time()
-        STATE = 1
-
-    elif STATE == 1:
-        # Estado 1: mover RADIO_CIRCLE unidades en X
-        robot_state["pos"][0] += RADIO_CIRCLE
-        send_state("move", {"x": robot_state["pos"][0], "y": robot_state["pos"][1]})
+    with prof.span(ROBOT_ID, "tick"):
+        current_time = time.time()
+        elapsed = current_time - STATE_START_TIME
+
+        if STATE == 0:
+            # Estado 0: teleport inicial
+            teletransportar(INIT_POS[0], INIT_POS[1], 0)
+            send_state("teleport", {"x": INIT_POS[0], "y": INIT_POS[1], "rot": 0})
+            TARGET_POS = [INIT_POS[0] + 100, INIT_POS[1]]  # punto para moverse en X
+            STATE_START_TIME = time.time()
+            STATE = 1
+
+        elif STATE == 1:
+            # Estado 1: mover RADIO_CIRCLE unidades en X
+            robot_state["pos"][0] += RADIO_CIRCLE
+            send_state("move", {"x": robot_state["pos"][0], "y": robot_state["pos"][1]})
         
-        # Guardar la posición final en TARGET_POS para usar en Estado 3
-        TARGET_POS = robot_state["pos"].copy()
+            # Guardar la posición final en TARGET_POS para usar en Estado 3
+            TARGET_POS = robot_state["pos"].copy()
 
-        if elapsed >= STATE_DURATIONS[1]:
-            STATE = 2
-            STATE_START_TIME = time.time()
+            if elapsed >= STATE_DURATIONS[1]:
+                STATE = 2
+                STATE_START_TIME = time.time()
 
-    elif STATE == 2:
-        # Estado 2: rotar mirando al centro desde la posición actual
-        rotar_hacia(CENTER_POS)
-        send_state("rotate_toward_center", {"rot": robot_state["rot"]})
+        elif STATE == 2:
+            # Estado 2: rotar mirando al centro desde la posición actual
+            rotar_hacia(CENTER_POS)
+            send_state("rotate_toward_center", {"rot": robot_state["rot"]})
 
-        if elapsed >= STATE_DURATIONS[2]:
-            STATE = 3
-            STATE_START_TIME = time.time()
-            robot_state["pos"] = TARGET_POS.copy()
+            if elapsed >= STATE_DURATIONS[2]:
+                STATE = 3
+                STATE_START_TIME = time.time()
+                robot_state["pos"] = TARGET_POS.copy()
 
-    elif STATE == 3:
+        elif STATE == 3:
 
 
-        if elapsed >= STATE_DURATIONS[3]:
-            STATE = 3
-            STATE_START_TIME = time.time()
+            if elapsed >= STATE_DURATIONS[3]:
+                STATE = 3
+                STATE_START_TIME = time.time()
 
     # Pequeña pausa para no saturar el CPU
-    time.sleep(0.05)
+    prof.sleep(ROBOT_ID, 0.05)
@@ -0,0 +1,103 @@
+# =====================================================
+# EGUP v4 - Coreografía de robots_30_udp sobre la flota asyncio
+# Un solo hilo / event loop para toda la flota (ver ester_grid.fleet)
+#   python robots/robots_30_async.py [NUM_ROBOTS]
+# =====================================================
+
+import os
+import sys
+import math
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ester_grid.fleet import Fleet
+
+NUM_ROBOTS = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+SPEED = 1
+MIN_DIST = 30  # distancia mínima entre filas
+TICK = 0.05
+
+# Estados
+STATE_INICIAL = 0
+STATE_GIRAR = 1
+STATE_AVANZAR = 2
+STATE_RETROCEDER = 3
+
+# Formación
+CENTER_X = 450
+CENTER_Y_ARRIBA = 150
+CENTER_Y_ABAJO = 250
+HORIZONTAL_SPACING = 40  # separación entre robots
+
+
+def formacion(robot, index, por_fila):
+    """Posición inicial: mitad arriba, mitad abajo (como robots_30_udp)."""
+    arriba = index < por_fila
+    col = index if arriba else index - por_fila
+    total_width = (por_fila - 1) * HORIZONTAL_SPACING
+    x = CENTER_X - total_width / 2 + col * HORIZONTAL_SPACING
+    y = CENTER_Y_ARRIBA if arriba else CENTER_Y_ABAJO
+    robot.pos_inicial = [x, y]
+    robot.teleport(x, y, 90 if arriba else 270)
+
+
+async def coreografia(robot, fleet, index, por_fila, fila_arriba, fila_abajo):
+    formacion(robot, index, por_fila)
+    arriba = index < por_fila
+    estado = STATE_INICIAL
+    while True:
+        if estado == STATE_INICIAL:
+            estado = STATE_GIRAR
+
+        elif estado == STATE_GIRAR:
+            estado = STATE_AVANZAR
+
+        elif estado == STATE_AVANZAR:
+            if arriba:
+                min_y = min(r.pos[1] for r in fila_abajo)
+                if robot.pos[1] + SPEED < min_y - MIN_DIST:
+                    robot.pos[1] += SPEED
+                else:
+                    estado = STATE_RETROCEDER
+            else:
+                max_y = max(r.pos[1] for r in fila_arriba)
+                if robot.pos[1] - SPEED > max_y + MIN_DIST:
+                    robot.pos[1] -= SPEED
+                else:
+                    estado = STATE_RETROCEDER
+
+        elif estado == STATE_RETROCEDER:
+            dx = robot.pos_inicial[0] - robot.pos[0]
+            dy = robot.pos_inicial[1] - robot.pos[1]
+            dist = math.hypot(dx, dy)
+            if dist > SPEED:
+                robot.pos[0] += SPEED * dx / dist
+                robot.pos[1] += SPEED * dy / dist
+            else:
+                robot.pos = robot.pos_inicial[:]
+                estado = STATE_INICIAL
+
+        robot.send_state()
+        await fleet.tick()
+
+
+if __name__ == "__main__":
+    fleet = Fleet(tick=TICK)
+    por_fila = (NUM_ROBOTS + 1) // 2
+    robots = [
+        fleet.robot(f"ROB{i+1}", color=(random.randint(50, 255), random.randint(50, 255), random.randint(50, 255)))
+        for i in range(NUM_ROBOTS)
+    ]
+    fila_arriba = robots[:por_fila]
+    fila_abajo = robots[por_fila:] or fila_arriba
+
+    for idx, r in enumerate(robots):
+        fleet.spawn(coreografia, r, idx, por_fila, fila_arriba, fila_abajo)
+    print(f"[FLOTA] {NUM_ROBOTS} robots en un solo event loop (tick {int(TICK*1000)} ms)")
+
+    try:
+        fleet.run()
+    except KeyboardInterrupt:
+        pass
+    print(f"[FLOTA] ticks={fleet.tick_count} atrasados={fleet.late_ticks} "
+          f"max_atraso={fleet.max_lateness*1000:.1f} ms")
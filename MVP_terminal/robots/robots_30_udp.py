@@ -2,18 +2,29 @@
 # EGUP v3 - Multi-Robot Simulation con Dispatcher UDP dinámico
 # =====================================================
 
+import os
 import socket
+import sys
 import json
 import time
 import threading
 import random
 import math
-import socketio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ester_grid import StatePacket, shared_socket
+from ester_grid.bootstrap import register_fleet
+from ester_grid.deadreckoning import DeadReckoner
+from ester_grid.spans import profiler
+
+prof = profiler()  # ESTER_PROFILE=1: tiempos de compute/encode/send/sleep por robot (ester_grid.spans)
 
 SERVER = "http://127.0.0.1:6029"  # Dispatcher Socket.IO
 NUM_ROBOTS = 30
 SPEED = 1
 MIN_DIST = 30  # distancia mínima entre filas
+HOPS = os.environ.get("ESTER_HOPS", "0") not in ("", "0")  # ESTER_HOPS=ip:puerto (como en sim_server.js): "ht" por tramo (ester_grid.hops)
+DEAD_RECKONING = os.environ.get("ESTER_DR", "0") == "1"  # ESTER_DR=1: vel/turn y solo mandar al desviarse (ester_grid.deadreckoning)
 
 # Estados
 STATE_INICIAL = 0
@@ -36,36 +47,29 @@ class Robot:
         self.last_collision_sent = None
         self.estado = STATE_INICIAL
         self.pos_inicial = [0,0]
+        self.state_pkt = StatePacket(robot_id, ts=True, dst="sim_server", hops=HOPS, dr=DEAD_RECKONING)
+        self.dr = DeadReckoner() if DEAD_RECKONING else None
 
-        # Socket.IO cliente para recibir puertos UDP
-        self.sio = socketio.Client()
+        # Puertos UDP: los asigna el dispatcher en un registro en lote (ver main)
         self.udp_send_port = None
         self.udp_recv_port = None
         self.sock_send = None
         self.sock_recv = None
 
-        @self.sio.event
-        def connect():
-            print(f"[{self.robot_id}] Conectado al dispatcher")
-
-        @self.sio.on("udp_ports")
-        def on_udp_ports(data):
-            self.udp_send_port = data["send"]
-            self.udp_recv_port = data["recv"]
-            print(f"[{self.robot_id}] Puertos asignados: send={self.udp_send_port}, recv={self.udp_recv_port}")
+    def on_udp_ports(self, data):
+        self.udp_send_port = data["send"]
+        self.udp_recv_port = data["recv"]
 
-            # Crear sockets UDP
-            self.sock_send = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.sock_recv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            try:
-                self.sock_recv.bind(("0.0.0.0", self.udp_recv_port))
-            except Exception as e:
-                print(f"[{self.robot_id}] ERROR al bindear UDP {self.udp_recv_port}: {e}")
+        # Crear sockets UDP (el de envío es único por proceso)
+        self.sock_send = shared_socket()
+        self.sock_recv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.sock_recv.bind(("0.0.0.0", self.udp_recv_port))
+        except Exception as e:
+            print(f"[{self.robot_id}] ERROR al bindear UDP {self.udp_recv_port}: {e}")
 
-            # Hilo receptor
-            threading.Thread(target=self.receiver, daemon=True).start()
-
-        self.sio.connect(SERVER)
+        # Hilo receptor
+        threading.Thread(target=self.receiver, daemon=True).start()
 
     # Enviar estado al dispatcher
     def send_state(self):
@@ -74,34 +78,31 @@ class Robot:
                 time.sleep(0.1)
                 continue
 
-            self.state["color"] = self.color
-            # agregar robot_id dentro de data
-            data_to_send = self.state.copy()
-            data_to_send["name"] = self.robot_id
-
-            packet = {
-                "src": self.robot_id,
-                "dst": "sim_server",
-                "type": "state",
-                "data": data_to_send,
-                "ts": int(time.time()*1000)
-            }
-
-            send_info = False
-            if self.state["pos"][0] != self.last_gps_sent[0] or self.state["pos"][1] != self.last_gps_sent[1]:
-                self.last_gps_sent = self.state["pos"][:2]
-                send_info = True
-            if self.state["collision"] != self.last_collision_sent and self.state["collision"]:
-                self.last_collision_sent = self.state["collision"]
-                send_info = True
-
-            if send_info:
-                try:
-                    self.sock_send.sendto(json.dumps(packet).encode(), ("127.0.0.1", self.udp_send_port))
-                except Exception as e:
-                    print(f"[{self.robot_id}] ERROR al enviar UDP: {e}")
-
-            time.sleep(0.05)
+            with prof.span(self.robot_id, "send_state"):
+                send_info = False
+                if self.state["collision"] != self.last_collision_sent and self.state["collision"]:
+                    self.last_collision_sent = self.state["collision"]
+                    send_info = True
+                if self.dr is not None:
+                    # mismo modelo que el simulador: mandar solo si se aparta (o latido)
+                    pos = self.state["pos"]
+                    send_info = self.dr.update(pos[0], pos[1], self.state["rot"], force=send_info)
+                elif self.state["pos"][0] != self.last_gps_sent[0] or self.state["pos"][1] != self.last_gps_sent[1]:
+                    self.last_gps_sent = self.state["pos"][:2]
+                    send_info = True
+
+                if send_info:
+                    try:
+                        pos = self.state["pos"]
+                        with prof.span(self.robot_id, "encode"):
+                            vel, turn = (self.dr.vel, self.dr.turn) if self.dr else (None, None)
+                            packet = self.state_pkt.update(pos[0], pos[1], self.state["rot"], self.color, vel, turn)
+                        with prof.span(self.robot_id, "send"):
+                            self.sock_send.sendto(packet, ("127.0.0.1", self.udp_send_port))
+                    except Exception as e:
+                        print(f"[{self.robot_id}] ERROR al enviar UDP: {e}")
+
+            prof.sleep(self.robot_id, 0.05)
 
     # Recibir comandos desde dispatcher
     def receiver(self):
@@ -130,6 +131,7 @@ class Robot:
                     if x is not None: self.state["pos"][0] = x
                     if y is not None: self.state["pos"][1] = y
                     if rot is not None: self.state["rot"] = rot
+                    if self.dr is not None: self.dr.reset()
                     print(f"[{self.robot_id}] Teletransportado a x={self.state['pos'][0]}, y={self.state['pos'][1]}, rot={self.state['rot']}°")
 
     # Posición inicial en formación
@@ -170,38 +172,39 @@ class Robot:
     def coreografia(self, index, fila_arriba, fila_abajo):
         self.formacion(index)
         while True:
-            if self.estado == STATE_INICIAL:
-                self.estado = STATE_GIRAR
-
-            elif self.estado == STATE_GIRAR:
-                self.estado = STATE_AVANZAR
-
-            elif self.estado == STATE_AVANZAR:
-                if index < 15:
-                    min_y = min(r.state["pos"][1] for r in fila_abajo)
-                    if self.state["pos"][1] + SPEED < min_y - MIN_DIST:
-                        self.state["pos"][1] += SPEED
+            with prof.span(self.robot_id, "compute"):
+                if self.estado == STATE_INICIAL:
+                    self.estado = STATE_GIRAR
+
+                elif self.estado == STATE_GIRAR:
+                    self.estado = STATE_AVANZAR
+
+                elif self.estado == STATE_AVANZAR:
+                    if index < 15:
+                        min_y = min(r.state["pos"][1] for r in fila_abajo)
+                        if self.state["pos"][1] + SPEED < min_y - MIN_DIST:
+                            self.state["pos"][1] += SPEED
+                        else:
+                            self.estado = STATE_RETROCEDER
                     else:
-                        self.estado = STATE_RETROCEDER
-                else:
-                    max_y = max(r.state["pos"][1] for r in fila_arriba)
-                    if self.state["pos"][1] - SPEED > max_y + MIN_DIST:
-                        self.state["pos"][1] -= SPEED
+                        max_y = max(r.state["pos"][1] for r in fila_arriba)
+                        if self.state["pos"][1] - SPEED > max_y + MIN_DIST:
+                            self.state["pos"][1] -= SPEED
+                        else:
+                            self.estado = STATE_RETROCEDER
+
+                elif self.estado == STATE_RETROCEDER:
+                    dx = self.pos_inicial[0] - self.state["pos"][0]
+                    dy = self.pos_inicial[1] - self.state["pos"][1]
+                    dist = math.hypot(dx, dy)
+                    if dist > SPEED:
+                        self.state["pos"][0] += SPEED * dx/dist
+                        self.state["pos"][1] += SPEED * dy/dist
                     else:
-                        self.estado = STATE_RETROCEDER
+                        self.state["pos"] = self.pos_inicial[:]
+                        self.estado = STATE_INICIAL
 
-            elif self.estado == STATE_RETROCEDER:
-                dx = self.pos_inicial[0] - self.state["pos"][0]
-                dy = self.pos_inicial[1] - self.state["pos"][1]
-                dist = math.hypot(dx, dy)
-                if dist > SPEED:
-                    self.state["pos"][0] += SPEED * dx/dist
-                    self.state["pos"][1] += SPEED * dy/dist
-                else:
-                    self.state["pos"] = self.pos_inicial[:]
-                    self.estado = STATE_INICIAL
-
-            time.sleep(0.05)
+            prof.sleep(self.robot_id, 0.05)
 
     # Iniciar robot
     def start(self, index, fila_arriba, fila_abajo):
@@ -213,6 +216,12 @@ class Robot:
 # Main
 # =====================================================
 robots = [Robot(f"ROB{i+1}") for i in range(NUM_ROBOTS)]
+
+# Una sola conexión Socket.IO registra toda la flota
+registro = register_fleet([r.robot_id for r in robots], url=SERVER)
+for r in robots:
+    r.on_udp_ports(registro[r.robot_id])
+print(f"Puertos asignados: send={registro.send_port} para {NUM_ROBOTS} robots")
 fila_arriba = robots[:15]
 fila_abajo = robots[15:]
 
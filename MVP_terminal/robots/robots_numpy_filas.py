@@ -0,0 +1,69 @@
+# =====================================================
+# Coreografía de dos filas (robots_30_udp) vectorizada con NumPy
+# Toda la flota en arrays: 1000 robots a 50 Hz en un núcleo
+#   python robots/robots_numpy_filas.py [NUM_ROBOTS]
+# =====================================================
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+
+from ester_grid import shared_socket
+from ester_grid.config import SIM_IP, SIM_PORT
+from ester_grid.kinematics import FleetState, RowsChoreography
+
+NUM_ROBOTS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+TICK = 0.02  # 50 Hz
+SPEED = 1
+MIN_DIST = 30
+
+CENTER_X = 450
+CENTER_Y_ARRIBA = 150
+CENTER_Y_ABAJO = 250
+
+
+def formacion(fleet):
+    """Mitad arriba, mitad abajo, repartidos a lo ancho de la cancha."""
+    por_fila = (fleet.n + 1) // 2
+    idx = np.arange(fleet.n)
+    arriba = idx < por_fila
+    col = np.where(arriba, idx, idx - por_fila)
+    spacing = min(40.0, 860.0 / max(1, por_fila - 1))
+    x = CENTER_X - (por_fila - 1) * spacing / 2 + col * spacing
+    y = np.where(arriba, CENTER_Y_ARRIBA, CENTER_Y_ABAJO)
+    fleet.row[:] = np.where(arriba, 0, 1)
+    fleet.place(x, y, np.where(arriba, 90, 270))
+
+
+if __name__ == "__main__":
+    ids = [f"ROB{i+1}" for i in range(NUM_ROBOTS)]
+    colors = [(random.randint(50, 255), random.randint(50, 255), random.randint(50, 255)) for _ in ids]
+    fleet = FleetState(ids, colors=colors, fixed=True)
+    formacion(fleet)
+    dance = RowsChoreography(fleet, speed=SPEED, min_dist=MIN_DIST)
+    sock = shared_socket()
+    addr = (SIM_IP, SIM_PORT)
+
+    print(f"[NUMPY] {NUM_ROBOTS} robots, tick {int(TICK*1000)} ms")
+    deadline = time.monotonic()
+    ticks = 0
+    busy = 0.0
+    try:
+        while True:
+            t0 = time.monotonic()
+            dance.step()
+            fleet.flush(sock, addr)
+            busy += time.monotonic() - t0
+            ticks += 1
+            if ticks % 250 == 0:
+                print(f"[NUMPY] tick {ticks}: {busy / ticks * 1000:.2f} ms/tick de cómputo+envío")
+            deadline += TICK
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
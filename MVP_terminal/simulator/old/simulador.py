@@ -5,11 +5,13 @@
 # GPS solo se envía si hay cambio de posición
 # Bumper solo envía cuando hay colisión
 # Nombre del robot siempre visible
+# Render con caché: sprites/etiquetas reutilizados, fondo estático y dirty rects
 # ========================================================
 
 import pygame
 import socket
 import json
+import math
 import time
 import threading
 import random
@@ -27,6 +29,10 @@ STATE_SEND_INTERVAL = 0.05
 OBJ_COUNT = 50
 OBJ_WIDTH = 25
 OBJ_HEIGHT = 15
+BG_COLOR = (30, 30, 30)
+ALPHA_STEP = 16          # sprites cacheados cada 16 niveles de alpha
+LABEL_CACHE_MAX = 4096   # textos distintos antes de vaciar la caché de etiquetas
+DIRTY_MAX = 600          # más rectángulos sucios que esto → flip() de pantalla completa
 
 # ----------------------------
 # UDP Socket
@@ -171,20 +177,74 @@ def send_state_info():
 
 threading.Thread(target=send_state_info, daemon=True).start()
 
+# ----------------------------
+# Cachés de render
+# Sprites por (color, alpha redondeado), etiquetas por texto y un fondo
+# con los objetos inamovibles ya dibujados. Cada frame se restaura el fondo
+# solo donde se dibujó el frame anterior y se actualizan esos rectángulos.
+# ----------------------------
+sprite_cache = {}
+label_cache = {}
+
+def robot_sprite(color, alpha):
+    key = (tuple(int(c) for c in color[:3]), min(255, (int(alpha) // ALPHA_STEP + 1) * ALPHA_STEP))
+    sprite = sprite_cache.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((ROBOT_SIZE*2, ROBOT_SIZE*2), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (*key[0], key[1]), (ROBOT_SIZE, ROBOT_SIZE), ROBOT_SIZE)
+        sprite_cache[key] = sprite
+    return sprite
+
+def label_surface(text):
+    surf = label_cache.get(text)
+    if surf is None:
+        if len(label_cache) >= LABEL_CACHE_MAX:
+            label_cache.clear()
+        surf = font.render(text, True, (255,255,255)).convert_alpha()
+        label_cache[text] = surf
+    return surf
+
+def build_background():
+    bg = pygame.Surface((WINDOW_W, WINDOW_H)).convert()
+    bg.fill(BG_COLOR)
+    for obj in objects:
+        if obj["type"] != "movible":
+            pygame.draw.rect(bg, obj["color"],
+                             (obj["x"]-obj["width"]/2, obj["y"]-obj["height"]/2, obj["width"], obj["height"]))
+    return bg
+
 # ----------------------------
 # Main Loop
 # ----------------------------
+background = build_background()
+background_count = len(objects)
+screen.blit(background, (0, 0))
+pygame.display.flip()
+prev_dirty = []
+
 running = True
 while running:
-    screen.fill((30,30,30))
     to_remove = []
+    dirty = []
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
 
+    if len(objects) != background_count:
+        background = build_background()
+        background_count = len(objects)
+        screen.blit(background, (0, 0))
+        prev_dirty = [screen.get_rect()]
+
+    # borrar lo dibujado en el frame anterior
+    for rect in prev_dirty:
+        screen.blit(background, rect, rect)
+
     for rid in list(robots.keys()):
-        rb = robots[rid]
+        rb = robots.get(rid)
+        if rb is None:
+            continue
         if time.time() - rb["last_seen"] > TIMEOUT_SEC:
             rb["alpha"] -= int(FADE_SPEED*255)
             if rb["alpha"] <= 0:
@@ -192,32 +252,36 @@ while running:
                 continue
 
         # dibujar robot
-        s = pygame.Surface((ROBOT_SIZE*2, ROBOT_SIZE*2), pygame.SRCALPHA)
-        pygame.draw.circle(s, (*rb["color"], rb["alpha"]), (ROBOT_SIZE, ROBOT_SIZE), ROBOT_SIZE)
-        screen.blit(s, (int(rb["x"]-ROBOT_SIZE), int(rb["y"]-ROBOT_SIZE)))
+        x, y = rb["x"], rb["y"]
+        dirty.append(screen.blit(robot_sprite(rb["color"], rb["alpha"]), (int(x-ROBOT_SIZE), int(y-ROBOT_SIZE))))
 
-        # orientación
-        dx = ROBOT_SIZE*1.5
-        nx = rb["x"] + dx * pygame.math.Vector2(1,0).rotate(-rb["rot"]).x
-        ny = rb["y"] + dx * pygame.math.Vector2(1,0).rotate(-rb["rot"]).y
-        pygame.draw.line(screen, (255,255,0), (rb["x"], rb["y"]), (nx, ny), 2)
+        # orientación (Vector2(1,0).rotate(-rot) sin crear vectores)
+        rad = math.radians(rb["rot"])
+        d = ROBOT_SIZE*1.5
+        nx = x + d * math.cos(rad)
+        ny = y - d * math.sin(rad)
+        dirty.append(pygame.draw.line(screen, (255,255,0), (x, y), (nx, ny), 2))
 
         # nombre siempre visible, colisión solo si ocurre
         col_text = ""
         if rb["collision"].get("collision"):
             col_text = f"COL {rb['collision'].get('name','')}"
-        label = font.render(f"{rid} {col_text}", True, (255,255,255))
-        screen.blit(label, (rb["x"] + 12, rb["y"] - 12))
+        dirty.append(screen.blit(label_surface(f"{rid} {col_text}"), (x + 12, y - 12)))
 
-    # dibujar objetos
+    # objetos movibles (los inamovibles ya están en el fondo)
     for obj in objects:
-        pygame.draw.rect(screen, obj["color"],
-                         (obj["x"]-obj["width"]/2, obj["y"]-obj["height"]/2, obj["width"], obj["height"]))
+        if obj["type"] == "movible":
+            dirty.append(pygame.draw.rect(screen, obj["color"],
+                         (obj["x"]-obj["width"]/2, obj["y"]-obj["height"]/2, obj["width"], obj["height"])))
 
     for rid in to_remove:
-        del robots[rid]
+        robots.pop(rid, None)
 
-    pygame.display.flip()
+    if len(dirty) + len(prev_dirty) > DIRTY_MAX:
+        pygame.display.flip()  # con muchos rectángulos sale más barato subir la pantalla entera
+    else:
+        pygame.display.update(prev_dirty + dirty)
+    prev_dirty = dirty
     clock.tick(60)
 
 pygame.quit()
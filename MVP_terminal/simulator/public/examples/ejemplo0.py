@@ -3,7 +3,12 @@
 # Secuencia: aparecer en borde del círculo central, avanzar 50px, 
 # esperar 1s, girar 90°, repetir 4 veces
 
-import socket, json, time, math
+import time, math
+
+from ester_grid import StatePacket, shared_socket
+from ester_grid.spans import profiler
+
+prof = profiler()  # ESTER_PROFILE=1 para ver compute/encode/send/sleep al terminar
 
 SIM_IP = "127.0.0.1"
 SIM_PORT = 10009
@@ -16,29 +21,21 @@ class Robot:
         self.pos = [0.0, 0.0]
         self.rot = 0.0  # grados
         self.color = [80, 180, 255]
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock = shared_socket()
+        self.state_pkt = StatePacket(robot_id)
+        self.teleport_pkt = StatePacket(robot_id, teleport=True)
 
     def teleport(self, x, y, rot=0):
         self.pos = [x, y]
         self.rot = rot
-        pkt = {
-            "type": "state",
-            "src": self.id,
-            "name": self.id,
-            "cmd": "teleport",
-            "cmdData": {"x": x, "y": y, "rot": rot},
-            "data": {"pos": [x, 0, y], "rot": rot, "color": self.color},
-        }
-        self.sock.sendto(json.dumps(pkt).encode(), (SIM_IP, SIM_PORT))
+        pkt = self.teleport_pkt.update(x, y, rot, self.color)
+        self.sock.sendto(pkt, (SIM_IP, SIM_PORT))
 
     def send(self):
-        pkt = {
-            "type": "state",
-            "src": self.id,
-            "name": self.id,
-            "data": {"pos": [self.pos[0], 0, self.pos[1]], "rot": self.rot, "color": self.color},
-        }
-        self.sock.sendto(json.dumps(pkt).encode(), (SIM_IP, SIM_PORT))
+        with prof.span(self.id, "encode"):
+            pkt = self.state_pkt.update(self.pos[0], self.pos[1], self.rot, self.color)
+        with prof.span(self.id, "send"):
+            self.sock.sendto(pkt, (SIM_IP, SIM_PORT))
 
     def avanzar(self, distancia):
         """Avanza 'distancia' píxeles en la dirección actual (rot)"""
@@ -48,10 +45,11 @@ class Robot:
         dy = SPEED * math.sin(rad)
         
         for _ in range(pasos):
-            self.pos[0] += dx
-            self.pos[1] += dy
+            with prof.span(self.id, "compute"):
+                self.pos[0] += dx
+                self.pos[1] += dy
             self.send()
-            time.sleep(TICK_RATE)
+            prof.sleep(self.id, TICK_RATE)
 
 if __name__ == "__main__":
     r = Robot()
@@ -2,10 +2,12 @@
 # =====================================================
 # Ejemplo 10: Robot Seguidor (Leader-Follower)
 # =====================================================
-# Robot A (líder) se mueve en un patrón (espiral) y envía
-# su posición constantemente al robot B via dispatcher.
-# Robot B (seguidor) recibe las coordenadas y sigue al líder
-# manteniéndose a cierta distancia.
+# Robot A (líder) se mueve en un patrón (espiral) y solo
+# reporta su estado al simulador.
+# Robot B (seguidor) se suscribe al área de interés del
+# simulador (ester_grid.aoi): recibe las posiciones de los
+# robots cercanos y sigue al líder manteniéndose a cierta
+# distancia, sin que el líder le mande nada.
 # =====================================================
 
 import socket
@@ -14,12 +16,18 @@ import time
 import threading
 import math
 
+from ester_grid import StatePacket, mesh_endpoint, shared_socket
+from ester_grid.aoi import NeighborClient
+
 SIM_IP = "127.0.0.1"
 SIM_PORT = 10009  # simulador (recibe estados)
 
 DISP_IP = "127.0.0.1"
 DISP_MSG_PORT = 10011  # dispatcher (router de mensajes)
 
+AOI_RADIUS = 600  # px: la espiral del líder llega a ~420 px del centro
+AOI_HZ = 20
+
 WINDOW_W = 900
 WINDOW_H = 600
 CENTER_X = WINDOW_W//2
@@ -32,40 +40,22 @@ class Robot:
         self.rot = start_rot
         self.color = color or [200, 200, 200]
         # Sockets
-        self.sock_state = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock_msg = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock_state = shared_socket()  # único por proceso
+        self.state_pkt = StatePacket(robot_id)
+        self.teleport_pkt = StatePacket(robot_id, teleport=True)
+        self.sock_msg = mesh_endpoint(robot_id)  # socket compartido del proceso (ester_grid.transport)
         self.sock_msg.settimeout(0.05)
         self.running = True
 
     def send_state(self):
-        packet = {
-            "type": "state",
-            "src": self.robot_id,
-            "name": self.robot_id,
-            "data": {
-                "pos": [self.pos[0], 0, self.pos[1]],
-                "rot": self.rot,
-                "color": self.color
-            }
-        }
-        self.sock_state.sendto(json.dumps(packet).encode('utf-8'), (SIM_IP, SIM_PORT))
+        packet = self.state_pkt.update(self.pos[0], self.pos[1], self.rot, self.color)
+        self.sock_state.sendto(packet, (SIM_IP, SIM_PORT))
 
     def teleport(self, x, y, rot):
         self.pos = [x, y]
         self.rot = rot
-        packet = {
-            "type": "state",
-            "src": self.robot_id,
-            "name": self.robot_id,
-            "cmd": "teleport",
-            "cmdData": {"x": x, "y": y, "rot": rot},
-            "data": {
-                "pos": [x, 0, y],
-                "rot": rot,
-                "color": self.color
-            }
-        }
-        self.sock_state.sendto(json.dumps(packet).encode('utf-8'), (SIM_IP, SIM_PORT))
+        packet = self.teleport_pkt.update(x, y, rot, self.color)
+        self.sock_state.sendto(packet, (SIM_IP, SIM_PORT))
 
     def register(self):
         pkt = {"type": "register", "src": self.robot_id}
@@ -130,9 +120,6 @@ def robot_leader_thread():
         A.rot = (math.degrees(angle) + 90) % 360  # orientación tangencial
         A.send_state()
 
-        # Enviar posición al seguidor
-        A.send_msg("FOLLOWER", {"cmd": "follow", "pos": [x, y]})
-
         # Incrementar espiral
         angle += angle_step
         radius += radius_step
@@ -142,7 +129,7 @@ def robot_leader_thread():
     print("[LEADER] movimiento completado")
 
 # ----------------------------
-# Robot B: Seguidor (recibe posición del líder y lo sigue)
+# Robot B: Seguidor (ve al líder por el área de interés y lo sigue)
 # ----------------------------
 
 def robot_follower_thread():
@@ -150,18 +137,20 @@ def robot_follower_thread():
     B.register()
     B.teleport(B.pos[0], B.pos[1], B.rot)
 
-    print("[FOLLOWER] esperando órdenes del líder...")
+    aoi = NeighborClient(sim=(SIM_IP, SIM_PORT))
+    aoi.subscribe("FOLLOWER", radius=AOI_RADIUS, hz=AOI_HZ, max_neighbors=4)
+    print("[FOLLOWER] esperando al líder en el área de interés...")
 
     target_pos = None
     last_update = time.time()
 
     while True:
-        # Recibir mensajes del líder
-        pkt = B.recv_any()
-        if pkt and pkt.get('type') == 'msg' and pkt.get('src') == 'LEADER':
-            data = pkt.get('data', {})
-            if data.get('cmd') == 'follow' and data.get('pos'):
-                target_pos = data['pos']
+        # Posición del líder según el simulador (vecinos a menos de AOI_RADIUS)
+        leader = aoi.neighbor("FOLLOWER", "LEADER")
+        if leader is not None:
+            pos = [leader[0], leader[1]]
+            if pos != target_pos:
+                target_pos = pos
                 last_update = time.time()
 
         # Si tenemos una posición objetivo, seguir
@@ -184,6 +173,7 @@ def robot_follower_thread():
 
         time.sleep(0.02)
 
+    aoi.close()
     print("[FOLLOWER] líder detenido, terminando seguimiento")
 
 
@@ -191,8 +181,8 @@ if __name__ == "__main__":
     print("=" * 60)
     print("Ejemplo 10: Robot Seguidor (Leader-Follower)")
     print("=" * 60)
-    print("El robot LEADER se mueve en espiral y transmite")
-    print("su posición. FOLLOWER lo sigue manteniendo distancia.")
+    print("El robot LEADER se mueve en espiral. FOLLOWER lo ve por")
+    print("el área de interés del simulador y lo sigue a distancia.")
     print("=" * 60)
 
     thA = threading.Thread(target=robot_leader_thread, daemon=True)
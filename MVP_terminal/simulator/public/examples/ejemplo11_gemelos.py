@@ -7,6 +7,8 @@
 # - Ambos reciben los mismos comandos
 # - Ambos comparten información de sensores
 # - Escalable a múltiples pares gemelos (ej: 30 físicos + 30 gemelos)
+#   (el dispatcher reenvía a cada gemelo solo el último estado de su
+#   par, ESTER_TWIN_HZ veces por segundo; lag por par en GET :6029/twins)
 #
 # En este ejemplo:
 # - 4 robots físicos (PHYS_A, PHYS_B, PHYS_C, PHYS_D)
@@ -20,6 +22,8 @@ import time
 import threading
 import math
 
+from ester_grid import StatePacket, mesh_endpoint, shared_socket
+
 SIM_IP = "127.0.0.1"
 SIM_PORT = 10009
 
@@ -41,12 +45,13 @@ class Robot:
         self.twin_id = None
         
         # Sockets
-        self.sock_state = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock_msg = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock_state = shared_socket()  # único por proceso
+        self.state_pkt = StatePacket(robot_id)
+        self.teleport_pkt = StatePacket(robot_id, teleport=True)
+        self.sock_msg = mesh_endpoint(robot_id)  # socket compartido del proceso (ester_grid.transport)
         
-        # El gemelo necesita escuchar estados replicados
+        # El gemelo necesita escuchar estados replicados (el transporte ya está bindeado)
         if is_twin:
-            self.sock_msg.bind(('0.0.0.0', 0))  # bind a puerto aleatorio
             self.listen_port = self.sock_msg.getsockname()[1]
             print(f"[{robot_id}] Gemelo escuchando en puerto {self.listen_port}")
         
@@ -60,20 +65,12 @@ class Robot:
         x = self.pos[0] + self.visual_offset[0]
         y = self.pos[1] + self.visual_offset[1]
         
-        packet = {
-            "type": "state",
-            "src": self.robot_id,
-            "name": self.robot_id,
-            "data": {
-                "pos": [x, 0, y],
-                "rot": self.rot,
-                "color": self.color
-            }
-        }
+        # Un solo encode: el mismo buffer va al simulador y al dispatcher
+        packet = self.state_pkt.update(x, y, self.rot, self.color)
         # Enviar al simulador directamente
-        self.sock_state.sendto(json.dumps(packet).encode('utf-8'), (SIM_IP, SIM_PORT))
-        # Y también al dispatcher para replicación a gemelo
-        self.sock_msg.sendto(json.dumps(packet).encode('utf-8'), (DISP_IP, DISP_MSG_PORT))
+        self.sock_state.sendto(packet, (SIM_IP, SIM_PORT))
+        # Y también al dispatcher para replicación a gemelo (coalescida allá)
+        self.sock_msg.sendto(packet, (DISP_IP, DISP_MSG_PORT))
 
     def teleport(self, x, y, rot):
         self.pos = [x, y]
@@ -83,22 +80,11 @@ class Robot:
         vx = x + self.visual_offset[0]
         vy = y + self.visual_offset[1]
         
-        packet = {
-            "type": "state",
-            "src": self.robot_id,
-            "name": self.robot_id,
-            "cmd": "teleport",
-            "cmdData": {"x": vx, "y": vy, "rot": rot},
-            "data": {
-                "pos": [vx, 0, vy],
-                "rot": rot,
-                "color": self.color
-            }
-        }
+        packet = self.teleport_pkt.update(vx, vy, rot, self.color)
         # Enviar al simulador directamente
-        self.sock_state.sendto(json.dumps(packet).encode('utf-8'), (SIM_IP, SIM_PORT))
+        self.sock_state.sendto(packet, (SIM_IP, SIM_PORT))
         # Y también al dispatcher para replicación a gemelo
-        self.sock_msg.sendto(json.dumps(packet).encode('utf-8'), (DISP_IP, DISP_MSG_PORT))
+        self.sock_msg.sendto(packet, (DISP_IP, DISP_MSG_PORT))
 
     def register(self):
         pkt = {"type": "register", "src": self.robot_id}
@@ -89,10 +89,10 @@ def mover_sinusoidal(r: Robot, avance=240, amp=40):
     """Movimiento sinusoidal en X mientras avanza hacia abajo."""
     pasos = int(avance / 2)
     for i in range(pasos):
-        fase = i / 12.0
+        s = math.sin(i / 12.0)  # fase
         r.y += 2
-        r.x += math.sin(fase) * (amp / pasos * 6)  # escala suave
-        r.rot = (90 + math.sin(fase)*30) % 360  # inclinación leve
+        r.x += s * (amp / pasos * 6)  # escala suave
+        r.rot = (90 + s * 30) % 360  # inclinación leve
         r.send_state(); time.sleep(TICK)
 
 
@@ -13,6 +13,8 @@ import time
 import threading
 import math
 
+from ester_grid import StatePacket, mesh_endpoint, shared_socket
+
 SIM_IP = "127.0.0.1"
 SIM_PORT = 10009  # simulador (recibe estados)
 
@@ -36,42 +38,24 @@ class Robot:
         self.rot = start_rot
         self.color = color or [200, 200, 200]
         # Sockets
-        self.sock_state = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock_msg = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock_state = shared_socket()  # único por proceso
+        self.state_pkt = StatePacket(robot_id)
+        self.teleport_pkt = StatePacket(robot_id, teleport=True)
+        self.sock_msg = mesh_endpoint(robot_id)  # socket compartido del proceso (ester_grid.transport)
         self.sock_msg.settimeout(0.05)
         self.running = True
         self.last_state_time = time.time()
 
     def send_state(self):
-        packet = {
-            "type": "state",
-            "src": self.robot_id,
-            "name": self.robot_id,
-            "data": {
-                "pos": [self.pos[0], 0, self.pos[1]],
-                "rot": self.rot,
-                "color": self.color
-            }
-        }
-        self.sock_state.sendto(json.dumps(packet).encode('utf-8'), (SIM_IP, SIM_PORT))
+        packet = self.state_pkt.update(self.pos[0], self.pos[1], self.rot, self.color)
+        self.sock_state.sendto(packet, (SIM_IP, SIM_PORT))
         self.last_state_time = time.time()
 
     def teleport(self, x, y, rot):
         self.pos = [x, y]
         self.rot = rot
-        packet = {
-            "type": "state",
-            "src": self.robot_id,
-            "name": self.robot_id,
-            "cmd": "teleport",
-            "cmdData": {"x": x, "y": y, "rot": rot},
-            "data": {
-                "pos": [x, 0, y],
-                "rot": rot,
-                "color": self.color
-            }
-        }
-        self.sock_state.sendto(json.dumps(packet).encode('utf-8'), (SIM_IP, SIM_PORT))
+        packet = self.teleport_pkt.update(x, y, rot, self.color)
+        self.sock_state.sendto(packet, (SIM_IP, SIM_PORT))
         self.last_state_time = time.time()
 
     def register(self):
@@ -87,6 +71,15 @@ class Robot:
         pkt = {"type": "broadcast", "src": self.robot_id, "data": data}
         self.sock_msg.sendto(json.dumps(pkt).encode('utf-8'), (DISP_IP, DISP_MSG_PORT))
 
+    def subscribe(self, topics):
+        """Tópicos/grupos del router: solo llegan los publish (o msg a "@grupo") de esos tópicos."""
+        pkt = {"type": "subscribe", "src": self.robot_id, "topics": topics}
+        self.sock_msg.sendto(json.dumps(pkt).encode('utf-8'), (DISP_IP, DISP_MSG_PORT))
+
+    def publish(self, topic, data):
+        pkt = {"type": "publish", "src": self.robot_id, "topic": topic, "data": data}
+        self.sock_msg.sendto(json.dumps(pkt).encode('utf-8'), (DISP_IP, DISP_MSG_PORT))
+
     def recv_any(self):
         try:
             data, _ = self.sock_msg.recvfrom(4096)
@@ -146,6 +139,7 @@ if __name__ == "__main__":
         x = start_bottom_x + i * spacing_x
         rb = Robot(name, (x, y_bottom), 0, color=[100,200,240])
         rb.register()
+        rb.subscribe(["lider", "fila_abajo"])
         rb.teleport(x, y_bottom, 0)
         robots.append(rb)
         print(f"[{name}] fila inferior x={int(x)} y={int(y_bottom)}")
@@ -158,6 +152,7 @@ if __name__ == "__main__":
         x = start_bottom_x + i * spacing_x
         rb = Robot(name, (x, y_top), 0, color=[100,200,240])
         rb.register()
+        rb.subscribe(["lider", "fila_arriba"])
         rb.teleport(x, y_top, 0)
         robots.append(rb)
         print(f"[{name}] fila superior x={int(x)} y={int(y_top)}")
@@ -188,7 +183,7 @@ if __name__ == "__main__":
             )
 
     def leader_path_formation():
-        """LEADER recorre el perímetro y broadcast su posición a todos los robots."""
+        """LEADER recorre el perímetro y publica su posición en el tópico "lider"."""
         margin = 40
         speed = 4.0
         perimeter = [
@@ -203,15 +198,17 @@ if __name__ == "__main__":
             for (tx, ty) in perimeter:
                 while math.hypot(leader.pos[0] - tx, leader.pos[1] - ty) > 6:
                     leader.move_towards(tx, ty, step_px=speed)
-                    # Broadcast posición a todos
-                    leader.broadcast({"pos": leader.pos[:], "rot": leader.rot})
+                    # Publicar posición (solo a los suscriptores de "lider")
+                    leader.publish("lider", {"pos": leader.pos[:], "rot": leader.rot})
                     time.sleep(0.015)
         # Regresar al centro final
         while math.hypot(leader.pos[0] - CENTER_X, leader.pos[1] - leader_y) > 6:
             leader.move_towards(CENTER_X, leader_y, step_px=3.5)
-            leader.broadcast({"pos": leader.pos[:], "rot": leader.rot})
+            leader.publish("lider", {"pos": leader.pos[:], "rot": leader.rot})
             time.sleep(0.015)
-        leader.broadcast({"done": True})
+        # Orden de grupo: un datagrama por fila en lugar de uno por robot
+        leader.send_msg("@fila_arriba", {"done": True})
+        leader.send_msg("@fila_abajo", {"done": True})
         print("[LEADER] recorrido completo (2 vueltas)")
 
     def formation_follower(follower_id: str, offset_x: float, offset_y: float):
@@ -223,7 +220,7 @@ if __name__ == "__main__":
         done = False
         while not done:
             pkt = rb.recv_any()
-            if pkt and pkt.get("type") == "broadcast" and pkt.get("src") == "LEADER":
+            if pkt and pkt.get("type") in ("publish", "msg") and pkt.get("src") == "LEADER":
                 data = pkt.get("data", {})
                 if data.get("done"):
                     done = True
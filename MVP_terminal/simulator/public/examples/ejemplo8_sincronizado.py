@@ -15,6 +15,11 @@ import threading
 import random
 import math
 
+from ester_grid import shared_socket
+from ester_grid.binary import StateBatch
+from ester_grid.clock import TickScheduler
+from ester_grid.spans import profiler
+
 SIM_IP = "127.0.0.1"
 SIM_PORT = 10009
 
@@ -28,16 +33,16 @@ ANGLE_CHANGE_DIRECTION = math.pi * 0.4  # Ángulo donde cambia (40% del ciclo =
 RADIO_STEP = 2.0  # Cuánto se acerca/aleja por tick
 SEPARATION_MAX_PX = 20  # Desplazamiento tangencial máximo cerca del centro para evitar choques
 
-# ✅ SOLUCIÓN: Barrier para sincronización por paso
-# Usamos una barrera de NUM_ROBOTS participantes: todos avanzan un paso,
-# esperan a que todos terminen y recién entonces se duerme el ciclo.
-## Sincronización por eventos (reemplaza Barrier)
-# Eventos de inicio y fin de tick + contador de ticks + señal de parada
-tick_start = threading.Event()
-tick_end = threading.Event()
-stop_event = threading.Event()
-tick_number_lock = threading.Lock()
-tick_number = 0
+# Estados de todos los robots del tick → un solo datagrama (lo envía el reloj)
+state_batch = StateBatch()
+
+# ✅ SOLUCIÓN: reloj maestro compartido
+# Cada tick arranca en un deadline absoluto (t0 + k*TICK_RATE), así que no
+# se acumula deriva aunque un tick se atrase. Al cerrar cada tick el reloj
+# envía el batch con los 20 robots.
+reloj = TickScheduler(TICK_RATE, on_tick=lambda tick: state_batch.flush(shared_socket(), (SIM_IP, SIM_PORT)))
+
+prof = profiler()  # ESTER_PROFILE=1: compute/encode por robot dentro del tick
 
 def log(msg):
     print(msg)
@@ -51,22 +56,13 @@ class RobotSincronizado:
         self.rot = 0
         self.ciclos = 0
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.participante = reloj.join(robot_id)
         
         # ✅ NO hay delay individual - todos usan el tick global
         
     def send_state(self):
-        packet = {
-            "type": "state",
-            "src": self.robot_id,
-            "name": self.robot_id,
-            "data": {
-                "pos": [self.pos[0], 0, self.pos[1]],
-                "rot": self.rot,
-                "color": self.color
-            }
-        }
-        msg = json.dumps(packet).encode('utf-8')
-        self.sock.sendto(msg, (SIM_IP, SIM_PORT))
+        # No envía: deja el estado en el batch del tick
+        state_batch.add_robot(self)
 
     def teleport(self, x, y, rot):
         self.pos = [x, y]
@@ -97,18 +93,24 @@ class RobotSincronizado:
         - Movimiento continuo e interpolado (no teleports)
 
         Flujo por tick:
-          1. Esperar tick_start (inicio)
+          1. Esperar el próximo tick del reloj (for tick in self.participante)
           2. Actualizar UNA vez si no terminó
-          3. Esperar tick_end (cierre)
+          3. Volver al for (marca el tick como terminado)
         """
-        # Posición angular fija para este robot en el círculo
+        # Posición angular fija para este robot en el círculo: el coseno/seno
+        # del ángulo y el vector tangencial no cambian, se calculan una vez
         angulo_base = (self.index / NUM_ROBOTS) * 2 * math.pi
+        cos_base = math.cos(angulo_base)
+        sin_base = math.sin(angulo_base)
+        tang_x, tang_y = -sin_base, cos_base
+        # Alternar lado por índice para separar robots vecinos
+        sign = 1 if (self.index % 2 == 0) else -1
         centro_x = 450
         centro_y = 300
 
         # Posición inicial expandida (máximo radio)
-        x = centro_x + RADIO_MAX * math.cos(angulo_base)
-        y = centro_y + RADIO_MAX * math.sin(angulo_base)
+        x = centro_x + RADIO_MAX * cos_base
+        y = centro_y + RADIO_MAX * sin_base
         self.teleport(x, y, 0)
 
         # Parámetros de latido (igual que ejemplo_test_latido.py)
@@ -117,96 +119,82 @@ class RobotSincronizado:
         etapas = [0.60, 0.80, 0.90, 0.95, 0.975, 0.99, 0.995, 0.998, 0.999, 1.0]
         
         # Estado del robot
-        last_tick_seen = -1
         finished = False
         ciclo_actual = 0
         punto_actual = 0  # Punto en la interpolación actual (0 a punto_retorno)
         contrayendo = True  # True = yendo hacia centro, False = regresando
 
-        while not stop_event.is_set():
-            tick_start.wait()
-            if stop_event.is_set():
-                break
-            
-            with tick_number_lock:
-                current_tick = tick_number
-            
-            if current_tick != last_tick_seen:
-                last_tick_seen = current_tick
+        for _tick in self.participante:
+            if finished:
+                continue
+            with prof.span(self.robot_id, "compute"):
+                # Punto de retorno dinámico según etapa del ciclo
+                etapa_idx = ciclo_actual if ciclo_actual < len(etapas) else len(etapas) - 1
+                punto_retorno_actual = int(etapas[etapa_idx] * num_puntos)
+                if punto_retorno_actual < 1:
+                    punto_retorno_actual = 1
+                if punto_retorno_actual > num_puntos:
+                    punto_retorno_actual = num_puntos
+                # Calcular interpolación (t de 0 a 1)
+                t = punto_actual / num_puntos
                 
-                if not finished:
-                    # Punto de retorno dinámico según etapa del ciclo
-                    etapa_idx = ciclo_actual if ciclo_actual < len(etapas) else len(etapas) - 1
-                    punto_retorno_actual = int(etapas[etapa_idx] * num_puntos)
-                    if punto_retorno_actual < 1:
-                        punto_retorno_actual = 1
-                    if punto_retorno_actual > num_puntos:
-                        punto_retorno_actual = num_puntos
-                    # Calcular interpolación (t de 0 a 1)
-                    t = punto_actual / num_puntos
-                    
-                    # Radio interpolado: desde RADIO_MAX hacia RADIO_MIN
-                    radio = RADIO_MAX - t * (RADIO_MAX - RADIO_MIN)
-                    
-                    # Calcular posición con ángulo fijo
-                    base_x = centro_x + radio * math.cos(angulo_base)
-                    base_y = centro_y + radio * math.sin(angulo_base)
+                # Radio interpolado: desde RADIO_MAX hacia RADIO_MIN
+                radio = RADIO_MAX - t * (RADIO_MAX - RADIO_MIN)
+                
+                # Calcular posición con ángulo fijo
+                base_x = centro_x + radio * cos_base
+                base_y = centro_y + radio * sin_base
 
-                    # Offset anti-choque: desplazamiento tangencial pequeño cerca del centro
-                    # Factor de cercanía 0..1 (1 = en RADIO_MIN)
-                    if RADIO_MAX != RADIO_MIN:
-                        closeness = max(0.0, min(1.0, (RADIO_MAX - radio) / (RADIO_MAX - RADIO_MIN)))
-                    else:
-                        closeness = 0.0
-                    # Alternar lado por índice para separar robots vecinos
-                    sign = 1 if (self.index % 2 == 0) else -1
-                    amplitude = sign * SEPARATION_MAX_PX * (closeness ** 2)
-                    # Vector tangencial al círculo
-                    tang_x = -math.sin(angulo_base)
-                    tang_y =  math.cos(angulo_base)
+                # Offset anti-choque: desplazamiento tangencial pequeño cerca del centro
+                # Factor de cercanía 0..1 (1 = en RADIO_MIN)
+                if RADIO_MAX != RADIO_MIN:
+                    closeness = max(0.0, min(1.0, (RADIO_MAX - radio) / (RADIO_MAX - RADIO_MIN)))
+                else:
+                    closeness = 0.0
+                amplitude = sign * SEPARATION_MAX_PX * (closeness ** 2)
 
-                    self.pos[0] = base_x + amplitude * tang_x
-                    self.pos[1] = base_y + amplitude * tang_y
-                    
-                    # Rotación continua
-                    self.rot += 5
-                    
-                    # Enviar estado
+                self.pos[0] = base_x + amplitude * tang_x
+                self.pos[1] = base_y + amplitude * tang_y
+                
+                # Rotación continua
+                self.rot += 5
+                
+                # Enviar estado
+                with prof.span(self.robot_id, "encode"):
                     self.send_state()
-                    
-                    # Avanzar al siguiente punto
-                    if contrayendo:
-                        punto_actual += 1
-                        if punto_actual > punto_retorno_actual:
-                            # Llegó al punto de retorno, empieza a regresar
-                            punto_actual = punto_retorno_actual
-                            contrayendo = False
-                            if self.index == 0:
-                                log(f"   ✅ Ciclo {ciclo_actual + 1}/{MAX_CYCLES} - Punto {punto_retorno_actual}/{num_puntos} alcanzado (~{int(etapas[etapa_idx]*100)}%)")
-                    else:
-                        # Expandiendo (regresando)
-                        punto_actual -= 1
-                        if punto_actual < 0:
-                            # Completó el ciclo, resetear
-                            punto_actual = 0
-                            contrayendo = True
-                            ciclo_actual += 1
-                            self.ciclos = ciclo_actual
-                            
+                
+                # Avanzar al siguiente punto
+                if contrayendo:
+                    punto_actual += 1
+                    if punto_actual > punto_retorno_actual:
+                        # Llegó al punto de retorno, empieza a regresar
+                        punto_actual = punto_retorno_actual
+                        contrayendo = False
+                        if self.index == 0:
+                            log(f"   ✅ Ciclo {ciclo_actual + 1}/{MAX_CYCLES} - Punto {punto_retorno_actual}/{num_puntos} alcanzado (~{int(etapas[etapa_idx]*100)}%)")
+                else:
+                    # Expandiendo (regresando)
+                    punto_actual -= 1
+                    if punto_actual < 0:
+                        # Completó el ciclo, resetear
+                        punto_actual = 0
+                        contrayendo = True
+                        ciclo_actual += 1
+                        self.ciclos = ciclo_actual
+                        
+                        if self.index == 0:
+                            log(f"   ✅ Ciclo {ciclo_actual}/{MAX_CYCLES} - Posición inicial alcanzada")
+                            log("")
+                        
+                        # Verificar si terminó todos los ciclos
+                        if ciclo_actual >= MAX_CYCLES:
+                            finished = True
                             if self.index == 0:
-                                log(f"   ✅ Ciclo {ciclo_actual}/{MAX_CYCLES} - Posición inicial alcanzada")
-                                log("")
-                            
-                            # Verificar si terminó todos los ciclos
-                            if ciclo_actual >= MAX_CYCLES:
-                                finished = True
-                                if self.index == 0:
-                                    log(f"✅ Robot {self.robot_id} completó {MAX_CYCLES} ciclos")
-            tick_end.wait()
+                                log(f"✅ Robot {self.robot_id} completó {MAX_CYCLES} ciclos")
         
         # Asegurar que el robot termine en la posición inicial (radio máximo)
-        x_ini = centro_x + RADIO_MAX * math.cos(angulo_base)
-        y_ini = centro_y + RADIO_MAX * math.sin(angulo_base)
+        x_ini = centro_x + RADIO_MAX * cos_base
+        y_ini = centro_y + RADIO_MAX * sin_base
         self.teleport(x_ini, y_ini, self.rot)
         
         log(f"  {self.robot_id} terminó (total ciclos: {self.ciclos})")
@@ -238,23 +226,7 @@ if __name__ == "__main__":
     log("")
     inicio = time.time()
 
-    def clock_thread():
-        global tick_number
-        while not stop_event.is_set():
-            # Inicio tick
-            with tick_number_lock:
-                tick_number += 1
-            tick_end.clear()
-            tick_start.set()
-            time.sleep(TICK_RATE)
-            # Fin tick
-            tick_start.clear()
-            tick_end.set()
-        # Asegurar desbloqueo final
-        tick_start.set()
-        tick_end.set()
-
-    threading.Thread(target=clock_thread, daemon=True).start()
+    reloj.start()
 
     # Monitoreo y señal de parada
     while True:
@@ -263,7 +235,7 @@ if __name__ == "__main__":
         if completados > 0:
             log(f"⏱️  {completados}/{NUM_ROBOTS} robots completaron {MAX_CYCLES} ciclos")
         if completados == NUM_ROBOTS:
-            stop_event.set()
+            reloj.stop()
             break
 
     tiempo_total = time.time() - inicio
@@ -276,15 +248,17 @@ if __name__ == "__main__":
     # Cada ciclo completo ≈ (2π / step) ticks
     total_ticks_aprox = MAX_CYCLES * int((2 * math.pi) / 0.1)
     log(f"Ticks estimados ejecutados: ~{total_ticks_aprox}")
+    log(reloj.report())
     log("")
     log("🔍 ¿Cómo funciona?")
-    log("   • clock_thread controla ritmo (un solo sleep)")
-    log("   • tick_start/tick_end delimitan cada paso")
-    log("   • Contador de tick evita múltiples updates dentro del mismo")
+    log("   • TickScheduler controla el ritmo con deadlines absolutos (sin deriva)")
+    log("   • Cada robot espera el tick con 'for tick in participante'")
+    log("   • El reloj cuenta ticks atrasados, robots lentos y jitter")
     log("   • Robots finalizados siguen sincronizando hasta parada global")
+    log("   • El reloj envía un solo datagrama por tick con todos los robots")
     log("")
     log("📚 Conceptos aplicados:")
-    log("   • threading.Event() para señalización")
+    log("   • Un reloj compartido (threading.Condition) para señalización")
     log("   • Reloj maestro centralizado")
     log("   • Pasos discretos vs. timing continuo")
     log("")
@@ -12,11 +12,13 @@
 # El estado (posición/rotación) se reporta al simulador por UDP.
 # =====================================================
 
-import socket
-import json
 import time
 import threading
 import math
+from concurrent.futures import wait
+
+from ester_grid import StatePacket, shared_socket
+from ester_grid.messaging import MessageClient
 
 SIM_IP = "127.0.0.1"
 SIM_PORT = 10009  # simulador (recibe estados)
@@ -24,6 +26,13 @@ SIM_PORT = 10009  # simulador (recibe estados)
 DISP_IP = "127.0.0.1"
 DISP_MSG_PORT = 10011  # dispatcher (router de mensajes)
 
+# msg/reply con acks, retransmisión y orden (ester_grid.reliable):
+# un datagrama perdido cuesta un RTO (decenas de ms) y no el paso entero
+CONFIABLE = True
+
+# Las respuestas llegan como futures (ester_grid.messaging): sin polling de
+# recv_any(), la reply se entrega apenas llega al socket
+
 WINDOW_W = 900
 WINDOW_H = 600
 CENTER_X = WINDOW_W//2
@@ -36,43 +45,24 @@ class Robot:
         self.rot = start_rot
         self.color = [200, 240, 120] if robot_id.endswith('A') else [120, 200, 240]
         # Sockets
-        self.sock_state = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock_msg = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock_msg.settimeout(0.1)  # lectura no bloqueante con timeout corto
+        self.sock_state = shared_socket()  # único por proceso
+        self.state_pkt = StatePacket(robot_id)
+        self.teleport_pkt = StatePacket(robot_id, teleport=True)
+        self.msg = MessageClient(robot_id, reliable=CONFIABLE, router=(DISP_IP, DISP_MSG_PORT))
         self.running = True
 
     # -------------
     # Simulador (estado)
     # -------------
     def send_state(self):
-        packet = {
-            "type": "state",
-            "src": self.robot_id,
-            "name": self.robot_id,
-            "data": {
-                "pos": [self.pos[0], 0, self.pos[1]],
-                "rot": self.rot,
-                "color": self.color
-            }
-        }
-        self.sock_state.sendto(json.dumps(packet).encode('utf-8'), (SIM_IP, SIM_PORT))
+        packet = self.state_pkt.update(self.pos[0], self.pos[1], self.rot, self.color)
+        self.sock_state.sendto(packet, (SIM_IP, SIM_PORT))
 
     def teleport(self, x, y, rot):
         self.pos = [x, y]
         self.rot = rot
-        packet = {
-            "type": "state",
-            "src": self.robot_id,
-            "name": self.robot_id,
-            "cmd": "teleport",
-            "cmdData": {"x": x, "y": y, "rot": rot},
-            "data": {
-                "pos": [x, 0, y],
-                "rot": rot,
-                "color": self.color
-            }
-        }
-        self.sock_state.sendto(json.dumps(packet).encode('utf-8'), (SIM_IP, SIM_PORT))
+        packet = self.teleport_pkt.update(x, y, rot, self.color)
+        self.sock_state.sendto(packet, (SIM_IP, SIM_PORT))
     
     def spin(self, seconds=1.0, step_deg=18, color=None):
         """Girar en el lugar enviando estado para que se note la espera."""
@@ -92,24 +82,18 @@ class Robot:
     # Dispatcher (mensajes)
     # -------------
     def register(self):
-        pkt = {"type": "register", "src": self.robot_id}
-        self.sock_msg.sendto(json.dumps(pkt).encode('utf-8'), (DISP_IP, DISP_MSG_PORT))
+        return self.msg.register()
 
-    def send_msg(self, to, mid, data):
-        pkt = {"type": "msg", "src": self.robot_id, "to": to, "mid": mid, "data": data}
-        self.sock_msg.sendto(json.dumps(pkt).encode('utf-8'), (DISP_IP, DISP_MSG_PORT))
+    def request(self, to, mid, data, timeout=5.0):
+        """Future que se resuelve con la reply de `to` (mismo mid)."""
+        return self.msg.request(to, data, timeout=timeout, mid=mid)
 
     def send_reply(self, to, mid, data):
-        pkt = {"type": "reply", "src": self.robot_id, "to": to, "mid": mid, "data": data}
-        self.sock_msg.sendto(json.dumps(pkt).encode('utf-8'), (DISP_IP, DISP_MSG_PORT))
+        self.msg.send(to, data, kind="reply", mid=mid)
 
-    def recv_any(self):
-        try:
-            data, _ = self.sock_msg.recvfrom(4096)
-            pkt = json.loads(data.decode('utf-8'))
-            return pkt
-        except socket.timeout:
-            return None
+    def recv_any(self, timeout=None):
+        """Bloquea hasta el próximo mensaje (sin polling) o None tras `timeout`."""
+        return self.msg.recv(timeout=timeout)
 
     # -------------
     # Movimiento simple
@@ -131,6 +115,16 @@ class Robot:
 # Coordinación
 # ----------------------------
 
+def wait_reply(fut, who, what):
+    """Espera el future mostrando progreso cada 0.25 s; devuelve la reply o None."""
+    while not wait([fut], timeout=0.25).done:
+        print(f"[{who}] \u23f3 esperando {what}...")
+    try:
+        return fut.result()
+    except TimeoutError:
+        return None
+
+
 def robot_A_thread():
     A = Robot("R1A", (CENTER_X - 200, CENTER_Y), 0)
     A.register()
@@ -141,25 +135,14 @@ def robot_A_thread():
 
     # 1) Ping/Pong de preparación
     mid = f"ready_{int(time.time()*1000)}"
-    A.send_msg("R2B", mid, {"q": "ready?"})
+    fut = A.request("R2B", mid, {"q": "ready?"})
     print("[A] enviado 'ready?' a B")
 
-    t0 = time.time()
-    t_print = time.time()
-    ready = False
-    while time.time() - t0 < 5.0 and not ready:
-        pkt = A.recv_any()
-        if pkt and pkt.get('type') == 'reply' and pkt.get('mid') == mid:
-            print("[A] respuesta de B:", pkt.get('data'))
-            ready = True
-        if time.time() - t_print > 0.25 and not ready:
-            print("[A] \u23f3 esperando respuesta de B...")
-            t_print = time.time()
-        time.sleep(0.02)
-
-    if not ready:
+    pkt = wait_reply(fut, "A", "respuesta de B")
+    if pkt is None:
         print("[A] B no respondió a tiempo; saliendo")
         return
+    print("[A] respuesta de B:", pkt.get('data'))
 
     # 2) Mostrar espera visible antes de la orden (spin + color)
     print("[A] listo para avanzar; realizando una breve espera visible...")
@@ -167,7 +150,7 @@ def robot_A_thread():
 
     # 3) Orden de avance sincronizado
     go_mid = f"go_{int(time.time()*1000)}"
-    A.send_msg("R2B", go_mid, {"cmd": "go", "target": [CENTER_X, CENTER_Y]})
+    go_fut = A.request("R2B", go_mid, {"cmd": "go", "target": [CENTER_X, CENTER_Y]}, timeout=15.0)
     print("[A] enviado 'go' a B; A comienza a moverse al centro")
 
     # A también avanza al centro
@@ -178,20 +161,12 @@ def robot_A_thread():
 
     # 4) Finalización
     done_mid = f"done_{int(time.time()*1000)}"
-    A.send_msg("R2B", done_mid, {"status": "A_arrived"})
+    A.msg.send("R2B", {"status": "A_arrived"}, mid=done_mid)
     print("[A] esperando ack final de B...")
-    # esperar ack opcional (timeout 5s para los 3s de delay de B)
-    t0 = time.time()
-    t_print = time.time()
-    while time.time() - t0 < 5.0:
-        pkt = A.recv_any()
-        if pkt and pkt.get('type') == 'reply' and pkt.get('mid') == done_mid:
-            print("[A] B ack final:", pkt.get('data'))
-            break
-        if time.time() - t_print > 0.25:
-            print("[A] \u23f3 esperando ack final de B...")
-            t_print = time.time()
-        time.sleep(0.02)
+    # B responde al "go" cuando llega al centro (3s de delay)
+    pkt = wait_reply(go_fut, "A", "ack final de B")
+    if pkt is not None:
+        print("[A] B ack final:", pkt.get('data'))
 
 
 def robot_B_thread():
@@ -201,12 +176,10 @@ def robot_B_thread():
 
     arrived = False
     while True:
-        pkt = B.recv_any()
+        pkt = B.recv_any(timeout=0.5)
         if not pkt:
-            # actualizar si en movimiento
             if arrived:
                 break
-            time.sleep(0.02)
             continue
 
         t = pkt.get('type')
@@ -29,6 +29,8 @@ const ROBOT_SIZE = 10;
 const ROBOT_SPEED = 2.0;
 const OBJ_WIDTH = 25;
 const OBJ_HEIGHT = 15;
+const ROBOT_CELL = ROBOT_SIZE * 4; // celda de la grilla de robots (px)
+const OBJECT_CELL = 64;            // celda de la grilla de objetos (~ una celda del laberinto)
 
 const app = express();
 const server = http.createServer(app);
@@ -52,11 +54,98 @@ const logsDir = `${__dirname}/../logs`;
 const eventsLog = `${logsDir}/events.log`;
 if(!fs.existsSync(logsDir)) fs.mkdirSync(logsDir, { recursive: true });
 
+// Rotación por tamaño/tiempo: events.log → events-<ms>.log
+// (python -m ester_grid.eventlog compact los comprime e indexa)
+const EVENTS_MAX_BYTES = cfg.events_max_bytes || 16*1024*1024;
+const EVENTS_MAX_AGE_MS = (cfg.events_max_age_s || 3600) * 1000;
+let eventsBytes = fs.existsSync(eventsLog) ? fs.statSync(eventsLog).size : 0;
+let eventsOpenedAt = Date.now();
+
+function rotateEvents(){
+  if(eventsBytes > 0){
+    try { fs.renameSync(eventsLog, `${logsDir}/events-${Date.now()}.log`); }
+    catch(e){ console.log("Error rotando events.log:", e.message); }
+  }
+  eventsBytes = 0;
+  eventsOpenedAt = Date.now();
+}
+
 function logEvent(type, payload){
   const line = JSON.stringify({ ts: Date.now(), type, ...payload });
+  if(eventsBytes >= EVENTS_MAX_BYTES || Date.now() - eventsOpenedAt >= EVENTS_MAX_AGE_MS) rotateEvents();
+  eventsBytes += Buffer.byteLength(line) + 1;
   fs.appendFile(eventsLog, line+"\n", ()=>{});
 }
 
+// ----------------------------
+// Traza binaria de UDP 10009 (formato de ester_grid/trace.py)
+// ESTER_TRACE=logs/sesion.etr node sim_server.js
+// cabecera "ETRC" u8 ver u8 0 u16 0 f64 inicio | registro u32 delta_us u16 emisor u16 largo + datagrama
+// ----------------------------
+const TRACE_SENDER_DEF = 0xFFFF;
+const tracePath = process.env.ESTER_TRACE || cfg.trace_file || null;
+let trace = null;
+
+function open_trace(path){
+  const stream = fs.createWriteStream(path, { flags: 'w', highWaterMark: 1 << 16 });
+  const header = Buffer.alloc(16);
+  header.write("ETRC", 0, "latin1");
+  header.writeUInt8(1, 4);
+  header.writeDoubleLE(Date.now()/1000, 8);
+  stream.write(header);
+  stream.on('error', (e)=>{ console.log("Error traza:", e.message); trace = null; });
+  console.log("Grabando traza UDP en", path);
+  return { stream, last: process.hrtime.bigint(), senders: new Map() };
+}
+
+function trace_record(sid, deltaUs, payload){
+  const head = Buffer.allocUnsafe(8);
+  head.writeUInt32LE(deltaUs, 0);
+  head.writeUInt16LE(sid, 4);
+  head.writeUInt16LE(payload.length, 6);
+  trace.stream.write(head);
+  trace.stream.write(payload);
+}
+
+function trace_packet(msg, rinfo){
+  const key = `${rinfo.address}:${rinfo.port}`;
+  let sid = trace.senders.get(key);
+  if(sid === undefined){
+    sid = trace.senders.size;
+    trace.senders.set(key, sid);
+    trace_record(TRACE_SENDER_DEF, 0, Buffer.from(key, 'utf8'));
+  }
+  const now = process.hrtime.bigint();
+  let deltaUs = Number((now - trace.last) / 1000n);
+  if(deltaUs > 0xFFFFFFFF) deltaUs = 0xFFFFFFFF;
+  trace.last += BigInt(deltaUs) * 1000n;
+  trace_record(sid, deltaUs, msg);
+}
+
+if(tracePath) trace = open_trace(tracePath);
+
+// ----------------------------
+// Timestamps por tramo (ester_grid/hops.py)
+// Paquetes con "ht" (robot [y dispatcher]) se completan con recepción en el
+// simulador y momento del state_update, y se mandan al colector por UDP:
+// ESTER_HOPS=127.0.0.1:10012 (o hops_collector en config.json)
+// ----------------------------
+const hopsTarget = (process.env.ESTER_HOPS || cfg.hops_collector || "").split(":");
+const HOPS_HOST = hopsTarget.length === 2 ? hopsTarget[0] : null;
+const HOPS_PORT = HOPS_HOST ? parseInt(hopsTarget[1], 10) : 0;
+const HOPS_PER_DATAGRAM = 200;
+let hopPending = []; // [src, ht, t_sim_recv]
+function now_us(){ return Math.round((performance.timeOrigin + performance.now()) * 1000); }
+
+function flush_hops(tEmit){
+  if(!HOPS_HOST || hopPending.length === 0){ hopPending = []; return; }
+  for(let i=0; i<hopPending.length; i+=HOPS_PER_DATAGRAM){
+    const records = hopPending.slice(i, i+HOPS_PER_DATAGRAM).map(([src, ht, tSim]) => [src, ht, tSim, tEmit]);
+    sock.send(Buffer.from(JSON.stringify({ type: "hops", records })), HOPS_PORT, HOPS_HOST);
+  }
+  hopPending = [];
+}
+
 // ----------------------------
 // Helpers
 // ----------------------------
@@ -71,6 +160,251 @@ function robot_color(rid) {
   return [(seed * 50) % 255, (seed * 80) % 255, (seed * 110) % 255];
 }
 
+// ----------------------------
+// Paquetes binarios (ester_grid/binary.py)
+// Primer byte 0xE5 = binario; '{' = JSON de siempre
+// ----------------------------
+const BIN_MAGIC = 0xE5;
+const BIN_KIND_STATE = 1;
+const BIN_KIND_TELEPORT = 2;
+const BIN_KIND_INTERN = 3;
+const BIN_KIND_BATCH = 4;
+const BIN_FLAG_FIXED = 0x10;
+const BIN_ENTRY_TELEPORT = 0x01;
+const BIN_FIXED_POS_SCALE = 16.0;
+const BIN_FIXED_ROT_SCALE = 65536.0 / 360.0;
+const BIN_SENDERS_MAX = 1024;  // tablas de emisores guardadas (se reanuncian cada INTERN_EVERY paquetes)
+const binNames = new Map(); // "ip:puerto" -> Map(rid -> robot_id), en orden de llegada
+const binOwner = new Map(); // robot_id -> "ip:puerto" de su último intern
+
+// Un robot que reinicia en otro puerto efímero vuelve a internar su nombre:
+// la tabla del puerto viejo pierde esa entrada y, vacía, se borra
+function bin_intern(key, names, rid, robotId){
+  names.set(rid, robotId);
+  const prev = binOwner.get(robotId);
+  if(prev !== undefined && prev !== key){
+    const old = binNames.get(prev);
+    if(old){
+      for(const [r, id] of old) if(id === robotId) old.delete(r);
+      if(old.size === 0) binNames.delete(prev);
+    }
+  }
+  binOwner.set(robotId, key);
+}
+
+function bin_sender_names(key){
+  let names = binNames.get(key);
+  if(names) return names;
+  if(binNames.size >= BIN_SENDERS_MAX){
+    // el más viejo: si sigue vivo recupera sus nombres con el próximo intern
+    const [oldKey, oldNames] = binNames.entries().next().value;
+    for(const id of oldNames.values()) if(binOwner.get(id) === oldKey) binOwner.delete(id);
+    binNames.delete(oldKey);
+  }
+  names = new Map();
+  binNames.set(key, names);
+  return names;
+}
+
+function bin_state(src, x, y, rot, color, teleport){
+  const packet = { type: "state", src, name: src, data: { pos: [x, y], rot, color } };
+  if(teleport){
+    packet.cmd = "teleport";
+    packet.cmdData = { x, y, rot };
+  }
+  return packet;
+}
+
+// Batch: varios robots en un datagrama (StateBatch en binary.py)
+function decode_binary_batch(msg, key, names, fixed){
+  const nIntern = msg[2];
+  const nState = msg[3];
+  let off = 4;
+  for(let i=0;i<nIntern;i++){
+    const rid = msg.readUInt16LE(off);
+    const n = msg[off+2];
+    bin_intern(key, names, rid, msg.toString('utf8', off+3, off+3+n));
+    off += 3 + n;
+  }
+  const out = [];
+  for(let i=0;i<nState;i++){
+    const rid = msg.readUInt16LE(off);
+    const color = [msg[off+2], msg[off+3], msg[off+4]];
+    const teleport = (msg[off+5] & BIN_ENTRY_TELEPORT) !== 0;
+    let x, y, rot;
+    if(fixed){
+      x = msg.readInt16LE(off+6) / BIN_FIXED_POS_SCALE;
+      y = msg.readInt16LE(off+8) / BIN_FIXED_POS_SCALE;
+      rot = msg.readUInt16LE(off+10) / BIN_FIXED_ROT_SCALE;
+      off += 12;
+    } else {
+      x = msg.readFloatLE(off+6);
+      y = msg.readFloatLE(off+10);
+      rot = msg.readFloatLE(off+14);
+      off += 18;
+    }
+    const src = names.get(rid);
+    if(src) out.push(bin_state(src, x, y, rot, color, teleport));
+  }
+  return out;
+}
+
+// Devuelve una lista de paquetes con la misma forma que el JSON (vacía para intern / rid desconocido)
+function decode_binary(msg, rinfo){
+  const kindFlags = msg[1];
+  const kind = kindFlags & 0x0F;
+  const key = `${rinfo.address}:${rinfo.port}`;
+  const names = bin_sender_names(key);
+  if(kind === BIN_KIND_BATCH) return decode_binary_batch(msg, key, names, (kindFlags & BIN_FLAG_FIXED) !== 0);
+  const rid = msg.readUInt16LE(2);
+  if(kind === BIN_KIND_INTERN){
+    bin_intern(key, names, rid, msg.toString('utf8', 5, 5 + msg[4]));
+    return [];
+  }
+  if(kind !== BIN_KIND_STATE && kind !== BIN_KIND_TELEPORT) return [];
+  const src = names.get(rid);
+  if(!src) return []; // todavía no llegó el intern de este robot
+  let x, y, rot;
+  if(kindFlags & BIN_FLAG_FIXED){
+    x = msg.readInt16LE(8) / BIN_FIXED_POS_SCALE;
+    y = msg.readInt16LE(10) / BIN_FIXED_POS_SCALE;
+    rot = msg.readUInt16LE(12) / BIN_FIXED_ROT_SCALE;
+  } else {
+    x = msg.readFloatLE(8);
+    y = msg.readFloatLE(12);
+    rot = msg.readFloatLE(16);
+  }
+  return [bin_state(src, x, y, rot, [msg[4], msg[5], msg[6]], kind === BIN_KIND_TELEPORT)];
+}
+
+// ----------------------------
+// Grilla uniforme (broad-phase de colisiones), igual que ester_grid/spatial.py
+// Cada clave ocupa las celdas que toca su caja (x ± hw, y ± hh); move() solo
+// toca los Map cuando la caja cambia de celdas. query() devuelve candidatos.
+// ----------------------------
+class SpatialGrid {
+  constructor(cell){
+    this.inv = 1 / cell;
+    this.cells = new Map(); // cellKey -> Set(claves)
+    this.spans = new Map(); // clave -> [cx0, cy0, cx1, cy1]
+  }
+  static cellKey(cx, cy){ return (cx + 32768) * 65536 + (cy + 32768); }
+  span(x, y, hw, hh){
+    const inv = this.inv;
+    return [Math.floor((x-hw)*inv), Math.floor((y-hh)*inv), Math.floor((x+hw)*inv), Math.floor((y+hh)*inv)];
+  }
+  _add(key, [cx0, cy0, cx1, cy1]){
+    for(let cx=cx0; cx<=cx1; cx++) for(let cy=cy0; cy<=cy1; cy++){
+      const k = SpatialGrid.cellKey(cx, cy);
+      let bucket = this.cells.get(k);
+      if(!bucket){ bucket = new Set(); this.cells.set(k, bucket); }
+      bucket.add(key);
+    }
+  }
+  _discard(key, [cx0, cy0, cx1, cy1]){
+    for(let cx=cx0; cx<=cx1; cx++) for(let cy=cy0; cy<=cy1; cy++){
+      const k = SpatialGrid.cellKey(cx, cy);
+      const bucket = this.cells.get(k);
+      if(bucket){ bucket.delete(key); if(bucket.size===0) this.cells.delete(k); }
+    }
+  }
+  move(key, x, y, hw=0, hh=0){
+    const span = this.span(x, y, hw, hh);
+    const old = this.spans.get(key);
+    if(old){
+      if(old[0]===span[0] && old[1]===span[1] && old[2]===span[2] && old[3]===span[3]) return;
+      this._discard(key, old);
+    }
+    this.spans.set(key, span);
+    this._add(key, span);
+  }
+  remove(key){
+    const old = this.spans.get(key);
+    if(old){ this._discard(key, old); this.spans.delete(key); }
+  }
+  clear(){ this.cells.clear(); this.spans.clear(); }
+  query(x, y, hw=0, hh=0){
+    const [cx0, cy0, cx1, cy1] = this.span(x, y, hw, hh);
+    const found = new Set();
+    for(let cx=cx0; cx<=cx1; cx++) for(let cy=cy0; cy<=cy1; cy++){
+      const bucket = this.cells.get(SpatialGrid.cellKey(cx, cy));
+      if(bucket) for(const key of bucket) found.add(key);
+    }
+    return found;
+  }
+}
+
+const robotGrid = new SpatialGrid(ROBOT_CELL);   // robot_id
+const objectGrid = new SpatialGrid(OBJECT_CELL); // índice en objects
+const robotSeq = new Map(); // robot_id -> orden de alta (recorrer candidatos como Object.entries)
+let robotSeqNext = 0;
+let indexedObjects = null, indexedCount = 0;
+
+// ----------------------------
+// Área de interés (ester_grid/aoi.py)
+// Un robot (o cualquier proceso, p. ej. un ESP32) manda al 10009
+//   {"type":"aoi","src":"R7","radius":150,"hz":10,"max":16}
+// y recibe en esa misma ip:puerto, a lo sumo `hz` veces por segundo,
+//   {"type":"neighbors","for":"R7","t":<ms>,"n":[[id,x,y,rot],...]}
+// con los robots a menos de `radius` px (del más cercano al más lejano,
+// hasta `max`), consultando robotGrid. La suscripción vence a los
+// AOI_TTL_MS si no se renueva; radius 0 la cancela.
+// ----------------------------
+const AOI_TTL_MS = 5000;
+const AOI_MAX_HZ = 20;          // el tick es de 50 ms
+const AOI_MAX_RADIUS = 1000;
+const AOI_MAX_NEIGHBORS = 64;
+const aoiSubs = new Map(); // robot_id -> { address, port, radius, interval, max, next, expires }
+
+function handle_aoi(packet, rinfo){
+  const rid = packet.src;
+  if(!rid) return;
+  const radius = Math.min(Number(packet.radius) || 0, AOI_MAX_RADIUS);
+  if(radius <= 0){ aoiSubs.delete(rid); return; }
+  const hz = Math.min(Math.max(Number(packet.hz) || 10, 0.1), AOI_MAX_HZ);
+  const nowMs = Date.now();
+  const prev = aoiSubs.get(rid);
+  aoiSubs.set(rid, {
+    address: rinfo.address, port: rinfo.port, radius,
+    interval: 1000 / hz,
+    max: Math.min(Math.max(parseInt(packet.max, 10) || 16, 1), AOI_MAX_NEIGHBORS),
+    next: prev ? prev.next : nowMs,
+    expires: nowMs + AOI_TTL_MS,
+  });
+}
+
+function flush_aoi(nowMs){
+  if(aoiSubs.size === 0) return;
+  for(const [rid, sub] of aoiSubs){
+    if(nowMs >= sub.expires){ aoiSubs.delete(rid); continue; }
+    if(nowMs < sub.next) continue;
+    const me = robots[rid];
+    if(!me) continue;  // todavía no mandó estado: sin centro
+    sub.next += sub.interval;
+    if(sub.next <= nowMs) sub.next = nowMs + sub.interval;  // sin ráfagas para ponerse al día
+    const r = sub.radius, r2 = r * r;
+    const near = [];
+    for(const other of robotGrid.query(me.x, me.y, r, r)){
+      if(other === rid) continue;
+      const rb = robots[other];
+      if(!rb) continue;
+      const dx = rb.x - me.x, dy = rb.y - me.y;
+      const d2 = dx*dx + dy*dy;
+      if(d2 <= r2) near.push([d2, other, rb]);
+    }
+    near.sort((a, b) => a[0] - b[0]);
+    const n = near.slice(0, sub.max).map(([, other, rb]) => [other, Math.round(rb.x), Math.round(rb.y), Math.round(rb.rot)]);
+    sock.send(Buffer.from(JSON.stringify({ type: "neighbors", for: rid, t: nowMs, n })), sub.port, sub.address);
+  }
+}
+
+function index_objects(){
+  objectGrid.clear();
+  objects.forEach((obj, i)=>objectGrid.move(i, obj.x, obj.y, obj.width/2, obj.height/2));
+  indexedObjects = objects;
+  indexedCount = objects.length;
+}
+
 function generate_objects(count = 50) {
   objects = [];
   if (count <= 0) {
@@ -175,6 +509,7 @@ function setScenario(type){
   } else if(type==='rescate'){
     generate_rescue();
   }
+  index_objects();
   console.log('Scenario cambiado a', scenarioType, 'objetos=', objects.length);
 }
 
@@ -236,82 +571,133 @@ function generate_rescue(){
 // UDP Receiver (solo del dispatcher)
 // ----------------------------
 sock.on("message", (msg, rinfo) => {
+  const tRecv = now_us();
+  if (trace) trace_packet(msg, rinfo);
   try {
-    const packet = JSON.parse(msg.toString());
-    if (packet.type !== "state") return;
-
-    const rid = packet.src;
-    if(!rid) return;
-
-    console.log(`[UDP] Paquete recibido de ${rid} desde ${rinfo.address}:${rinfo.port}`);
-    console.log(packet.data); // opcional: mostrar datos completos del robot
-
-    // --- resto de tu código existente ---
-    let px = 0, py = 0;
-    if (Array.isArray(packet.data.pos)) {
-      if (packet.data.pos.length === 3) {
-        px = packet.data.pos[0];
-        py = packet.data.pos[2];
-      } else if (packet.data.pos.length >= 2) {
-        px = packet.data.pos[0];
-        py = packet.data.pos[1];
-      }
+    if (msg[0] === BIN_MAGIC) {
+      for (const packet of decode_binary(msg, rinfo)) handle_state(packet, rinfo);
+    } else {
+      const packet = JSON.parse(msg.toString());
+      if (packet.type === "aoi") handle_aoi(packet, rinfo);
+      else handle_state(packet, rinfo, tRecv);
     }
-    [px, py] = clamp_pos(px, py);
+  } catch(e){
+    console.log("Error UDP:", e);
+  }
+});
 
-    const rot = packet.data.rot || 0;
-    const color = packet.data.color || robot_color(rid);
+// ----------------------------
+// Dead reckoning (ester_grid.deadreckoning)
+// ----------------------------
+// Si el estado trae "vel":[vx,vy] (px/s) y "turn" (grados/s), el robot solo
+// manda cuando se aparta del modelo o como latido; entre paquetes el
+// objetivo (tx, ty, rot) se extrapola en cada tick girando la velocidad a la
+// tasa de giro. Sin paquete nuevo en DR_MAX_S se queda quieto.
+// ----------------------------
+const DR_MAX_S = 3;
+
+function dr_model(data, px, py, rot){
+  if(!Array.isArray(data.vel) || data.vel.length < 2) return null;
+  const vx = Number(data.vel[0]) || 0;
+  const vy = Number(data.vel[1]) || 0;
+  const turn = Number(data.turn) || 0;
+  return { x: px, y: py, rot, vx, vy, w: turn * Math.PI / 180, turn, t0: Date.now() };
+}
 
-    const cmd = packet.cmd || packet.data?.cmd || null;
-    const cmdData = packet.cmdData || packet.data || null;
+function dr_extrapolate(rb, nowMs){
+  const m = rb.dr;
+  const dt = Math.min((nowMs - m.t0) / 1000, DR_MAX_S);
+  let x, y;
+  if(Math.abs(m.w * dt) < 1e-9){
+    x = m.x + m.vx * dt;
+    y = m.y + m.vy * dt;
+  } else {
+    const s = Math.sin(m.w * dt);
+    const c = 1 - Math.cos(m.w * dt);
+    x = m.x + (m.vx * s - m.vy * c) / m.w;
+    y = m.y + (m.vx * c + m.vy * s) / m.w;
+  }
+  [rb.tx, rb.ty] = clamp_pos(x, y);
+  rb.rot = (((m.rot + m.turn * dt) % 360) + 360) % 360;
+}
 
-    let name = packet.name || packet.data?.name || rid;
-    // Forzar que los gemelos mantengan su id como nombre para no perder el prefijo TWIN_
-    if(rid.startsWith('TWIN_')) name = rid;
-    if (!robots[rid]) {
-      robots[rid] = { name, x: px, y: py, tx: px, ty: py, rot, last_seen: Date.now()/1000, alpha: 255, color, collision: {collision:false}, cmd:null, data:null, distance:0, collisions_count:0 };
-      logEvent('robot_join', { id: rid, name, x: px, y: py });
-    } else {
-      // Evitar renombrar gemelos a un nombre sin prefijo
-      if(!rid.startsWith('TWIN_')){
-        robots[rid].name = name;
-      } else {
-        robots[rid].name = rid; // asegurar persistencia del prefijo
-      }
+function handle_state(packet, rinfo, tRecv){
+  if (packet.type !== "state") return;
+
+  const rid = packet.src;
+  if(!rid) return;
+  if(HOPS_HOST && Array.isArray(packet.ht)) hopPending.push([rid, packet.ht, tRecv]);
+
+  console.log(`[UDP] Paquete recibido de ${rid} desde ${rinfo.address}:${rinfo.port}`);
+  console.log(packet.data); // opcional: mostrar datos completos del robot
+
+  // --- resto de tu código existente ---
+  let px = 0, py = 0;
+  if (Array.isArray(packet.data.pos)) {
+    if (packet.data.pos.length === 3) {
+      px = packet.data.pos[0];
+      py = packet.data.pos[2];
+    } else if (packet.data.pos.length >= 2) {
+      px = packet.data.pos[0];
+      py = packet.data.pos[1];
     }
-
-    const rb = robots[rid];
-
-    if (cmd === 'teleport') {
-      rb.x = px;
-      rb.y = py;
-      rb.tx = px;
-      rb.ty = py;
-      if(cmdData && cmdData.rot!==undefined) rb.rot = cmdData.rot;
-      rb.last_seen = Date.now()/1000;
-      rb.alpha = 255;
-      rb.color = color;
-      rb.cmd = 'teleport';
-      rb.data = { x:px, y:py, rot:rb.rot };
-      logEvent('teleport', { id: rid, name: rb.name, x: rb.x, y: rb.y, rot: rb.rot });
+  }
+  [px, py] = clamp_pos(px, py);
+
+  const rot = packet.data.rot || 0;
+  const color = packet.data.color || robot_color(rid);
+
+  const cmd = packet.cmd || packet.data?.cmd || null;
+  const cmdData = packet.cmdData || packet.data || null;
+
+  let name = packet.name || packet.data?.name || rid;
+  // Forzar que los gemelos mantengan su id como nombre para no perder el prefijo TWIN_
+  if(rid.startsWith('TWIN_')) name = rid;
+  if (!robots[rid]) {
+    robots[rid] = { name, x: px, y: py, tx: px, ty: py, rot, last_seen: Date.now()/1000, alpha: 255, color, collision: {collision:false}, cmd:null, data:null, distance:0, collisions_count:0 };
+    robotGrid.move(rid, px, py);
+    robotSeq.set(rid, robotSeqNext++);
+    logEvent('robot_join', { id: rid, name, x: px, y: py });
+  } else {
+    // Evitar renombrar gemelos a un nombre sin prefijo
+    if(!rid.startsWith('TWIN_')){
+      robots[rid].name = name;
     } else {
-      rb.tx = px;
-      rb.ty = py;
-      rb.rot = rot;
-      rb.last_seen = Date.now()/1000;
-      rb.alpha = 255;
-      rb.color = color;
-      if(cmd){
-        rb.cmd = cmd;
-        rb.data = cmdData;
-        logEvent('cmd', { id: rid, name: rb.name, cmd, data: cmdData });
-      }
+      robots[rid].name = rid; // asegurar persistencia del prefijo
     }
+  }
 
-  } catch(e){
-    console.log("Error UDP:", e);
+  const rb = robots[rid];
+
+  if (cmd === 'teleport') {
+    rb.x = px;
+    rb.y = py;
+    rb.tx = px;
+    rb.ty = py;
+    robotGrid.move(rid, px, py);
+    if(cmdData && cmdData.rot!==undefined) rb.rot = cmdData.rot;
+    rb.last_seen = Date.now()/1000;
+    rb.alpha = 255;
+    rb.color = color;
+    rb.dr = null;
+    rb.cmd = 'teleport';
+    rb.data = { x:px, y:py, rot:rb.rot };
+    logEvent('teleport', { id: rid, name: rb.name, x: rb.x, y: rb.y, rot: rb.rot });
+  } else {
+    rb.tx = px;
+    rb.ty = py;
+    rb.rot = rot;
+    rb.dr = dr_model(packet.data, px, py, rot);
+    rb.last_seen = Date.now()/1000;
+    rb.alpha = 255;
+    rb.color = color;
+    if(cmd){
+      rb.cmd = cmd;
+      rb.data = cmdData;
+      logEvent('cmd', { id: rid, name: rb.name, cmd, data: cmdData });
+    }
   }
-});
+}
 
 
 sock.bind(UDP_DISPATCHER_TO_SIM, UDP_HOST, () => {
@@ -343,9 +729,12 @@ function apply_movement(rb, robotId){
   let collision_info = null;
 
   if(!isTwin){
-    // Verificar colisión con otros robots (ignorar gemelos como obstáculos)
-    for(const [otherId, otherRobot] of Object.entries(robots)){
+    // Verificar colisión con otros robots cercanos (ignorar gemelos como obstáculos)
+    const near = [...robotGrid.query(rb.x+move_dx, rb.y+move_dy, ROBOT_SIZE*2, ROBOT_SIZE*2)];
+    if(near.length > 1) near.sort((a,b)=>robotSeq.get(a)-robotSeq.get(b));
+    for(const otherId of near){
       if(otherId === robotId) continue;
+      const otherRobot = robots[otherId];
       if(otherRobot.name && otherRobot.name.startsWith('TWIN_')) continue; // gemelos no bloquean
       const dist_x = Math.abs(rb.x+move_dx - otherRobot.x);
       const dist_y = Math.abs(rb.y+move_dy - otherRobot.y);
@@ -369,8 +758,11 @@ function apply_movement(rb, robotId){
   }
 
   if(!isTwin){
-    // Verificar colisión con objetos (gemelos ignoran objetos)
-    for(const obj of objects){
+    // Verificar colisión con objetos cercanos (gemelos ignoran objetos)
+    const nearObjs = [...objectGrid.query(rb.x+move_dx, rb.y+move_dy, ROBOT_SIZE, ROBOT_SIZE)];
+    if(nearObjs.length > 1) nearObjs.sort((a,b)=>a-b);
+    for(const i of nearObjs){
+      const obj = objects[i];
       const dist_x = Math.abs(rb.x+move_dx - obj.x);
       const dist_y = Math.abs(rb.y+move_dy - obj.y);
       const overlap_x = (ROBOT_SIZE + obj.width/2) - dist_x;
@@ -388,13 +780,17 @@ function apply_movement(rb, robotId){
         else side='derecha';
         const colorName = obj.color ? `RGB(${Math.round(obj.color[0])},${Math.round(obj.color[1])},${Math.round(obj.color[2])})` : 'sin color';
         collision_info = {collision:true, type:obj.type, name:obj.name, color:colorName, side:side};
-        if(obj.type==="movible"){ obj.x += move_dx; obj.y += move_dy; }
+        if(obj.type==="movible"){
+          obj.x += move_dx; obj.y += move_dy;
+          objectGrid.move(i, obj.x, obj.y, obj.width/2, obj.height/2);
+        }
         else { return [false, collision_info, 0]; }
       }
     }
   }
 
   rb.x += move_dx; rb.y += move_dy;
+  robotGrid.move(robotId, rb.x, rb.y);
   const movedDist = Math.sqrt(move_dx*move_dx + move_dy*move_dy);
   return [true, collision_info, movedDist];
 }
@@ -429,9 +825,12 @@ function updateRescueProgress(){
 setInterval(()=>{
   const now = Date.now()/1000;
   const collisions = [];
+  // objects reemplazado por /regenerate u otro generador: reindexar
+  if(objects !== indexedObjects || objects.length !== indexedCount) index_objects();
 
   for(const rid in robots){
     const rb = robots[rid];
+    if(rb.dr) dr_extrapolate(rb, now * 1000);
     const [moved, collision, distMoved] = apply_movement(rb, rid);
     if(moved && distMoved>0){ rb.distance += distMoved; }
     if(now - rb.last_seen > TIMEOUT_SEC) rb.alpha -= FADE_SPEED*255;
@@ -441,13 +840,15 @@ setInterval(()=>{
       rb.collision = collision;
       collisions.push(`${rid} chocó con ${collision.name} (${collision.color}) por ${collision.side}`);
       rb.collisions_count += 1;
-      logEvent('collision', { id: rid, name: rb.name, with: collision.name, type: collision.type, color: collision.color, side: collision.side });
+      logEvent('collision', { id: rid, name: rb.name, with: collision.name, obj_type: collision.type, color: collision.color, side: collision.side });
     } else {
       rb.collision = {collision:false};
     }
 
     if(now - rb.last_seen > 10){
       delete robots[rid];
+      robotGrid.remove(rid);
+      robotSeq.delete(rid);
       console.log(`Robot ${rid} eliminado por inactividad.`);
       logEvent('robot_leave', { id: rid });
     }
@@ -470,6 +871,9 @@ setInterval(()=>{
     rescue: rescueProgress
   });
 
+  flush_hops(now_us());
+  flush_aoi(Date.now());
+
   for(const rid in robots){ robots[rid].cmd = null; robots[rid].data = null; }
 
 },50);
@@ -487,7 +891,9 @@ io.on('connection', socket=>{
 
       const pythonCmd = process.platform==='win32'?'python':'python3';
       // Agregar -u para unbuffered output (logs en tiempo real)
-      const pyProcess = spawn(pythonCmd,['-u', tempFile]);
+      // PYTHONPATH incluye MVP_terminal/ para que los ejemplos puedan importar ester_grid
+      const pyPath = [`${__dirname}/..`, process.env.PYTHONPATH].filter(Boolean).join(process.platform==='win32'?';':':');
+      const pyProcess = spawn(pythonCmd,['-u', tempFile], { env: { ...process.env, PYTHONPATH: pyPath } });
 
       const timeout = setTimeout(()=>{
         pyProcess.kill();
@@ -0,0 +1,5 @@
+# Los tests importan ester_grid desde MVP_terminal (igual que los scripts de robots/)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,53 @@
+from ester_grid.binary import MAX_DATAGRAM, StateBatch, decode_frame
+
+
+def test_parte_por_mtu_sin_perder_robots():
+    batch = StateBatch()
+    ids = [f"BM{i}" for i in range(200)]
+    for i, rid in enumerate(ids):
+        batch.add(rid, i, i + 0.5, 0, (1, 2, 3))
+    frames = batch.frames()
+    assert len(frames) > 1
+    assert all(len(f) <= MAX_DATAGRAM for f in frames)
+    names = {}
+    assert [p["src"] for f in frames for p in decode_frame(f, names)] == ids
+
+
+def test_parte_en_255_entradas():
+    batch = StateBatch(fixed=True, mtu=1 << 20)
+    for i in range(300):
+        batch.add(f"B255_{i}", i, i, 0, (0, 0, 0))
+    frames = batch.frames()
+    assert [f[3] for f in frames] == [255, 45]
+    names = {}
+    assert sum(len(decode_frame(f, names)) for f in frames) == 300
+
+
+def test_omite_robots_sin_cambios():
+    batch = StateBatch()
+    names = {}
+    batch.add("BS1", 1, 2, 3, (4, 5, 6))
+    assert len(decode_frame(batch.frames()[0], names)) == 1
+    batch.add("BS1", 1, 2, 3, (4, 5, 6))
+    assert batch.frames() == []
+    batch.add("BS1", 9, 2, 3, (4, 5, 6))
+    (frame,) = batch.frames()
+    assert frame[2] == 0   # el nombre ya se anunció: sin intern
+    assert decode_frame(frame, names)[0]["data"]["pos"] == [9, 0, 2]
+
+
+def test_teleport_no_se_pisa_en_el_mismo_tick():
+    batch = StateBatch()
+    names = {}
+    batch.add("BT1", 10, 10, 0, (0, 0, 0), teleport=True)
+    batch.add("BT1", 11, 10, 0, (0, 0, 0))
+    (pkt,) = decode_frame(batch.frames()[0], names)
+    assert pkt["cmd"] == "teleport"
+    assert pkt["data"]["pos"] == [11, 0, 10]
+    # sale aunque la posición no cambie, y no queda pegado al tick siguiente
+    batch.add("BT1", 11, 10, 0, (0, 0, 0), teleport=True)
+    (pkt,) = decode_frame(batch.frames()[0], names)
+    assert pkt["cmd"] == "teleport"
+    batch.add("BT1", 12, 10, 0, (0, 0, 0))
+    (pkt,) = decode_frame(batch.frames()[0], names)
+    assert "cmd" not in pkt
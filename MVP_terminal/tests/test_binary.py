@@ -0,0 +1,50 @@
+import pytest
+
+from ester_grid.binary import BinaryStatePacket, decode, decode_frame, is_binary
+
+
+def _names_for(pkt):
+    names = {}
+    assert decode(pkt.intern, names) is None
+    return names
+
+
+@pytest.mark.parametrize("fixed", [False, True])
+def test_ida_y_vuelta_state(fixed):
+    pkt = BinaryStatePacket("RT1", fixed=fixed)
+    names = _names_for(pkt)
+    buf = pkt.update(123.25, -45.5, 270.0, [10, 300, -5])
+    assert is_binary(buf)
+    (out,) = decode_frame(buf, names)
+    assert out["src"] == out["name"] == "RT1"
+    assert out["data"]["color"] == [10, 255, 0]
+    x, _, y = out["data"]["pos"]
+    assert x == pytest.approx(123.25, abs=1 / 16)
+    assert y == pytest.approx(-45.5, abs=1 / 16)
+    assert out["data"]["rot"] == pytest.approx(270.0, abs=0.01)
+    assert "cmd" not in out
+
+
+def test_teleport_trae_cmd_data():
+    pkt = BinaryStatePacket("RT2", teleport=True)
+    out = decode(pkt.update(5, 6, 7, [1, 2, 3]), _names_for(pkt))
+    assert out["cmd"] == "teleport"
+    assert out["cmdData"] == {"x": 5, "y": 6, "rot": 7}
+
+
+def test_rid_desconocido_se_ignora():
+    assert decode(BinaryStatePacket("RT3").update(1, 2, 3), {}) is None
+
+
+def test_fijo_satura_en_el_rango_int16():
+    pkt = BinaryStatePacket("RT4", fixed=True)
+    names = _names_for(pkt)
+    assert decode(pkt.update(2047, -2047, 0), names)["data"]["pos"] == [2047, 0, -2047]
+    # fuera de ±2047 px se satura en vez de dar la vuelta
+    assert decode(pkt.update(5000, -5000, 0), names)["data"]["pos"] == [32767 / 16, 0, -2048]
+    assert decode(pkt.update(0, 0, 725), names)["data"]["rot"] == pytest.approx(5, abs=0.01)
+
+
+def test_magic_incorrecto():
+    with pytest.raises(ValueError):
+        decode(b"{\x01\x00\x00")
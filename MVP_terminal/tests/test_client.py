@@ -0,0 +1,19 @@
+import json
+
+from ester_grid.client import StatePacket
+from ester_grid.config import robot_color
+
+
+def test_update_sin_color_usa_el_color_por_defecto():
+    pkt = json.loads(StatePacket("R2").update(10, 20, 30))
+    assert pkt["data"]["pos"] == [10, 0, 20]
+    assert pkt["data"]["rot"] == 30
+    assert pkt["data"]["color"] == robot_color("R2")
+
+
+def test_color_sobrevive_a_la_reconstruccion():
+    tpl = StatePacket("R2")
+    tpl.update(1, 2, 3, [9, 8, 7])
+    pkt = json.loads(tpl.update(123456789.5, 2, 3))   # más ancho que el campo: se reconstruye
+    assert pkt["data"]["pos"][0] == 123456789.5
+    assert pkt["data"]["color"] == [9, 8, 7]
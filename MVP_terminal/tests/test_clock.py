@@ -0,0 +1,55 @@
+import threading
+import time
+
+from ester_grid.clock import TickScheduler
+
+
+def test_overrun_saltea_ticks_en_vez_de_recuperarlos():
+    period = 0.01
+
+    def lento(tick):
+        if tick == 3:
+            time.sleep(period * 5.5)
+
+    reloj = TickScheduler(period, on_tick=lento)
+    reloj.run(ticks=10)
+    s = reloj.stats()
+    assert s["ticks"] == 10
+    assert s["overruns"] >= 1
+    assert s["skipped_ticks"] >= 4
+    assert s["jitter_ms"]["max"] >= period * 1000
+
+
+def test_participante_que_no_termina_cuenta_atrasos():
+    reloj = TickScheduler(0.01)
+    vago = reloj.join("vago")       # nunca llama done()
+    cumplidor = reloj.join("ok")
+    hecho = threading.Event()
+
+    def robot():
+        for _ in cumplidor:
+            pass
+        hecho.set()
+
+    threading.Thread(target=robot, daemon=True).start()
+    reloj.run(ticks=20)
+    assert hecho.wait(2.0)
+    s = reloj.stats()
+    assert s["late_by_participant"]["vago"] == 19   # todos menos el primer tick
+    assert s["late_by_participant"].get("ok", 0) <= 2
+    assert s["late_participants"] == sum(s["late_by_participant"].values())
+    assert vago.late == 19
+    assert "vago=19" in reloj.report()
+
+
+def test_stop_libera_a_los_que_esperan():
+    reloj = TickScheduler(0.01)
+    p = reloj.join("R1")
+    reloj.start()
+    assert p.wait(1.0) is not None
+    reloj.stop()
+    # a lo sumo queda el tick que se publicó antes del stop; después, None sin esperar el timeout
+    t0 = time.monotonic()
+    ticks = [p.wait(1.0), p.wait(1.0)]
+    assert ticks[-1] is None
+    assert time.monotonic() - t0 < 0.5
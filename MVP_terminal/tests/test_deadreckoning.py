@@ -0,0 +1,45 @@
+import math
+
+import pytest
+
+from ester_grid.deadreckoning import DeadReckoner, extrapolate
+
+
+def test_extrapola_arcos_exacto():
+    # círculo de radio 100 a 30°/s: velocidad tangente 100 * rad(30) px/s
+    v = 100 * math.radians(30)
+    x, y, rot = extrapolate(100, 0, 90, 0, v, 30, 3.0)
+    assert (x, y, rot) == pytest.approx((0, 100, 180), abs=1e-9)
+    assert extrapolate(1, 2, 3, 10, -5, 0, 0.5) == (6, -0.5, 3)
+
+
+def test_linea_recta_solo_manda_heartbeat():
+    dr = DeadReckoner(threshold=1.0, heartbeat=1.0)
+    enviados = [t for t in (i * 0.02 for i in range(250)) if dr.update(100 + 30 * t, 300, 0.0, now=t)]
+    # primer paquete (sin velocidad), el que ya la estima y después uno por heartbeat
+    assert enviados == pytest.approx([0.0, 0.04, 1.04, 2.04, 3.04, 4.04])
+    assert dr.max_error <= 1.0
+
+
+def test_umbral_de_posicion_y_de_giro():
+    dr = DeadReckoner(threshold=2.0, rot_threshold=5.0, heartbeat=10.0)
+    assert dr.update(0, 0, 0, now=0.0, vel=(0, 0), turn=0)
+    assert not dr.update(1.5, 0, 0, now=0.1, vel=(0, 0), turn=0)
+    assert dr.update(2.5, 0, 0, now=0.2, vel=(0, 0), turn=0)
+    assert not dr.update(2.5, 0, 4.0, now=0.3, vel=(0, 0), turn=0)
+    assert dr.update(2.5, 0, 6.0, now=0.4, vel=(0, 0), turn=0)
+    assert dr.sent == 3 and dr.ticks == 5
+
+
+def test_heartbeat_aunque_el_modelo_acierte():
+    dr = DeadReckoner(heartbeat=0.5)
+    envios = [dr.update(10, 10, 0, now=t / 10, vel=(0, 0), turn=0) for t in range(21)]
+    assert [t for t, e in enumerate(envios) if e] == [0, 5, 10, 15, 20]
+
+
+def test_force_y_reset_mandan_siempre():
+    dr = DeadReckoner(heartbeat=10.0)
+    dr.update(0, 0, 0, now=0.0, vel=(0, 0), turn=0)
+    assert dr.update(0, 0, 0, now=0.1, vel=(0, 0), turn=0, force=True)
+    dr.reset()
+    assert dr.update(0, 0, 0, now=0.2, vel=(0, 0), turn=0)
@@ -0,0 +1,71 @@
+import math
+
+import pytest
+
+from ester_grid.engine import ROBOT_SIZE, ROBOT_SPEED, SimEngine, _random_walk, collision_side, color_name
+
+
+class _BruteEngine(SimEngine):
+    """apply_movement O(N²) de antes de la grilla, como referencia."""
+
+    def apply_movement(self, rb, robot_id):
+        dx = rb["tx"] - rb["x"]
+        dy = rb["ty"] - rb["y"]
+        dist = math.hypot(dx, dy)
+        if dist == 0:
+            return False, None, 0
+        step = min(dist, ROBOT_SPEED)
+        move_dx = dx / dist * step
+        move_dy = dy / dist * step
+        nx = rb["x"] + move_dx
+        ny = rb["y"] + move_dy
+        collision = None
+
+        if not robot_id.startswith("TWIN_"):
+            for other_id, other in self.robots.items():
+                if other_id == robot_id or (other["name"] or "").startswith("TWIN_"):
+                    continue
+                if ROBOT_SIZE * 2 - math.hypot(nx - other["x"], ny - other["y"]) > 0:
+                    collision = {"collision": True, "type": "robot", "name": other["name"],
+                                 "color": color_name(other["color"]),
+                                 "side": collision_side(nx, ny, rb["rot"], other["x"], other["y"])}
+                    return False, collision, 0
+
+            for obj in self.objects:
+                if (ROBOT_SIZE + obj["width"] / 2 - abs(nx - obj["x"]) > 0
+                        and ROBOT_SIZE + obj["height"] / 2 - abs(ny - obj["y"]) > 0):
+                    collision = {"collision": True, "type": obj["type"], "name": obj["name"],
+                                 "color": color_name(obj["color"]),
+                                 "side": collision_side(nx, ny, rb["rot"], obj["x"], obj["y"])}
+                    if obj["type"] != "movible":
+                        return False, collision, 0
+                    obj["x"] += move_dx
+                    obj["y"] += move_dy
+
+        rb["x"] = nx
+        rb["y"] = ny
+        return True, collision, step
+
+
+def _corrida(cls, scenario, n=60, ticks=400):
+    eng = cls(scenario, seed=11)
+    for i in range(n):
+        eng.add_robot(f"ROB{i+1}", eng.rng.uniform(0, 900), eng.rng.uniform(0, 600))
+    eng.add_robot("TWIN_ROB1", 450, 300)
+    log = []
+    for _ in range(ticks):
+        _random_walk(eng)
+        log.append(eng.step())
+    final = {rid: (rb["x"], rb["y"], rb["collisions_count"]) for rid, rb in eng.robots.items()}
+    objs = [(o["x"], o["y"]) for o in eng.objects]
+    return log, final, objs
+
+
+@pytest.mark.parametrize("scenario", ["obstaculos", "rescate"])
+def test_colisiones_iguales_a_fuerza_bruta(scenario):
+    log, final, objs = _corrida(SimEngine, scenario)
+    ref_log, ref_final, ref_objs = _corrida(_BruteEngine, scenario)
+    assert sum(map(len, log)) > 0
+    assert log == ref_log
+    assert final == ref_final
+    assert objs == ref_objs
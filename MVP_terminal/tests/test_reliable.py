@@ -0,0 +1,124 @@
+import json
+import queue
+import socket
+import time
+
+from ester_grid import reliable
+from ester_grid.reliable import ReliableEndpoint
+
+
+class _Wire:
+    """Router en memoria entre endpoints: entrega por "to" salvo lo que `lose` descarte."""
+
+    def __init__(self, lose=lambda pkt: False):
+        self.lose = lose
+        self.queues = {}
+
+    def sock(self, robot_id):
+        return _WireSock(self, self.queues.setdefault(robot_id, queue.Queue()))
+
+
+class _WireSock:
+    def __init__(self, wire, inbox):
+        self.wire = wire
+        self.inbox = inbox
+        self.timeout = None
+
+    def sendto(self, data, _addr):
+        pkt = json.loads(data)
+        if not self.wire.lose(pkt):
+            self.wire.queues.setdefault(pkt["to"], queue.Queue()).put(data)
+
+    def settimeout(self, t):
+        self.timeout = t
+
+    def recvfrom(self, _n):
+        try:
+            return self.inbox.get(timeout=self.timeout), ("127.0.0.1", 0)
+        except queue.Empty:
+            raise socket.timeout
+
+
+def test_mensaje_abandonado_no_bloquea_los_siguientes(monkeypatch):
+    monkeypatch.setattr(reliable, "MAX_TRIES", 2)
+    monkeypatch.setattr(reliable, "RTO_INITIAL", 0.02)
+    # el segundo mensaje de A a B (y todas sus retransmisiones) se pierde
+    wire = _Wire(lose=lambda pkt: pkt.get("data") == {"n": 2})
+    a = ReliableEndpoint("A", sock=wire.sock("A"))
+    b = ReliableEndpoint("B", sock=wire.sock("B"))
+    try:
+        for n in range(1, 6):
+            a.send("B", {"n": n})
+        got = []
+        end = time.monotonic() + 5.0
+        while len(got) < 4 and time.monotonic() < end:
+            pkt = b.recv(timeout=0.1)
+            if pkt is not None:
+                got.append(pkt["data"]["n"])
+        assert got == [1, 3, 4, 5]
+        assert a.stats["abandoned"] == 1
+        assert [mid for _, mid in a.failed] == ["A_2"]
+        assert a.flush(timeout=2.0)
+        # y el par sigue andando con la época nueva
+        a.send("B", {"n": 6})
+        assert b.recv(timeout=2.0)["data"] == {"n": 6}
+    finally:
+        a.close()
+        b.close()
+
+
+def test_buffer_fuera_de_orden_acotado(monkeypatch):
+    monkeypatch.setattr(reliable, "BUFFER_MAX", 3)
+    wire = _Wire()
+    b = ReliableEndpoint("B", sock=wire.sock("B"))
+    try:
+        with b._lock:
+            for seq in range(2, 10):     # falta el 1: todo queda fuera de orden
+                b._on_data({"type": "msg", "src": "A", "to": "B", "rseq": seq, "rep": 7, "data": seq})
+        assert len(b.peers["A"].buffer) == 3
+        assert b.stats["overflow"] == 5
+    finally:
+        b.close()
+
+
+def test_receptor_que_reinicia_no_traba_el_par():
+    wire = _Wire()
+    a = ReliableEndpoint("A", sock=wire.sock("A"))
+    b = ReliableEndpoint("B", sock=wire.sock("B"))
+    try:
+        for n in (1, 2):
+            a.send("B", {"n": n})
+        assert [b.recv(timeout=2.0)["data"]["n"] for _ in range(2)] == [1, 2]
+        assert a.flush(timeout=2.0)
+        b.close()
+        b = ReliableEndpoint("B", sock=wire.sock("B"))   # mismo id, estado nuevo
+        a.send("B", {"n": 3})
+        a.send("B", {"n": 4})
+        got = [b.recv(timeout=2.0), b.recv(timeout=2.0)]
+        assert [p["data"]["n"] for p in got if p] == [3, 4]
+        assert a.flush(timeout=2.0)
+    finally:
+        a.close()
+        b.close()
+
+
+def test_paquetes_malformados_no_matan_el_hilo():
+    wire = _Wire()
+    b = ReliableEndpoint("B", sock=wire.sock("B"))
+    a = ReliableEndpoint("A", sock=wire.sock("A"))
+    try:
+        raw = wire.sock("X")
+        for bad in ({"type": "msg", "src": "A", "to": "B", "rseq": None, "rep": 1},
+                    {"type": "msg", "src": "A", "to": "B", "rseq": "1", "rep": 1},
+                    {"type": "msg", "src": ["A"], "to": "B", "rseq": 1, "rep": 1},
+                    {"type": "msg", "src": "A", "to": "B", "rack": [1]},
+                    {"type": "msg", "src": "A", "to": "B", "rack": [1, 0, [None]]},
+                    {"type": "msg", "src": "A", "to": "B", "rack": "x"}):
+            raw.sendto(json.dumps(bad).encode("utf-8"), None)
+        a.send("B", {"n": 1})
+        assert b.recv(timeout=2.0)["data"] == {"n": 1}
+        assert b._thread.is_alive()
+        assert b.stats["invalid"] == 6
+    finally:
+        a.close()
+        b.close()
@@ -0,0 +1,71 @@
+import json
+import socket
+
+import pytest
+
+from ester_grid.router import MessageRouter
+
+
+@pytest.fixture
+def router():
+    r = MessageRouter(port=0, host="127.0.0.1")
+    yield r
+    r.sock.close()
+
+
+@pytest.fixture
+def robot():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(("127.0.0.1", 0))
+    s.settimeout(1.0)
+    yield s
+    s.close()
+
+
+def _exchange(router, robot, pkt):
+    robot.sendto(json.dumps(pkt).encode("utf-8"), router.sock.getsockname())
+    router.sock.settimeout(1.0)
+    data, addr = router.sock.recvfrom(65535)
+    router.handle(data, addr)
+    router._flush_out()
+    try:
+        return json.loads(robot.recv(65535))
+    except socket.timeout:
+        return None
+
+
+@pytest.mark.parametrize("pkt, code", [
+    ({"type": "msg", "src": "A", "to": ["x"]}, "invalid_to"),
+    ({"type": "register", "src": ["A"]}, "invalid_src"),
+    ({"type": "twin_register", "src": "A", "twin": {"x": 1}}, "invalid_twin_id"),
+])
+def test_campos_no_string_responden_error(router, robot, pkt, code):
+    reply = _exchange(router, robot, pkt)
+    assert reply["type"] == "error" and reply["code"] == code
+
+
+def test_paquete_malformado_no_corta_el_lote(router, robot, monkeypatch):
+    def boom(_topic, _out):
+        raise TypeError("unhashable type: 'list'")
+
+    monkeypatch.setattr(router, "_fanout", boom)
+    dst = router.sock.getsockname()
+    robot.sendto(json.dumps({"type": "publish", "src": "A", "topic": "t"}).encode("utf-8"), dst)
+    robot.sendto(json.dumps({"type": "register", "src": "A"}).encode("utf-8"), dst)
+    router.sock.settimeout(1.0)
+    handled = 0
+    while handled < 2:
+        handled += router.poll()
+    assert router.stats["invalid"] == 1
+    assert json.loads(robot.recv(65535))["type"] == "ack"
+
+
+@pytest.mark.parametrize("pkt", [
+    {"type": "publish", "src": "A", "topic": ["t"]},
+    {"type": "subscribe", "src": "A", "topics": 5},
+    {"type": "subscribe", "src": "A", "topic": {"t": 1}},
+])
+def test_topicos_no_string(router, robot, pkt):
+    reply = _exchange(router, robot, pkt)
+    assert reply["type"] == "error" and reply["code"] == "missing_topic"
+    assert not router.topics
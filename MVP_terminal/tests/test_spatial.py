@@ -0,0 +1,57 @@
+import random
+
+from ester_grid.spatial import SpatialGrid
+
+
+def _cruza(a, b):
+    """Fuerza bruta: ¿dos rangos de celdas (cx0, cy0, cx1, cy1) se solapan?"""
+    return not (a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1])
+
+
+def test_query_igual_a_fuerza_bruta():
+    rng = random.Random(7)
+    grid = SpatialGrid(cell=40)
+    boxes = {}
+    for step in range(2000):
+        key = rng.randrange(60)
+        op = rng.random()
+        if op < 0.1:
+            grid.remove(key)
+            boxes.pop(key, None)
+        else:
+            box = (rng.uniform(-50, 950), rng.uniform(-50, 650), rng.uniform(0, 30), rng.uniform(0, 30))
+            (grid.move if op < 0.6 else grid.insert)(key, *box)
+            boxes[key] = box
+        if step % 20 == 0:
+            q = (rng.uniform(0, 900), rng.uniform(0, 600), rng.uniform(0, 60), rng.uniform(0, 60))
+            span_q = grid._span(*q)
+            esperado = {k for k, b in boxes.items() if _cruza(grid._span(*b), span_q)}
+            assert grid.query(*q) == esperado
+    assert len(grid) == len(boxes)
+    # la grilla no deja celdas vacías ni claves colgadas
+    assert all(grid.cells.values())
+    assert {k for bucket in grid.cells.values() for k in bucket} == set(boxes)
+
+
+def test_query_no_pierde_vecinos_reales():
+    rng = random.Random(3)
+    grid = SpatialGrid(cell=40)
+    pts = {i: (rng.uniform(0, 900), rng.uniform(0, 600)) for i in range(300)}
+    for i, (x, y) in pts.items():
+        grid.insert(i, x, y)
+    r = 20
+    for i, (x, y) in pts.items():
+        cerca = {j for j, (ox, oy) in pts.items() if j != i and (x - ox) ** 2 + (y - oy) ** 2 < r * r}
+        assert cerca <= grid.query(x, y, r, r)
+
+
+def test_move_dentro_de_la_celda_no_toca_el_indice():
+    grid = SpatialGrid(cell=40)
+    grid.insert("a", 10, 10)
+    cells = {k: set(v) for k, v in grid.cells.items()}
+    grid.move("a", 30, 30)
+    assert grid.cells == cells
+    grid.move("a", 50, 10)
+    assert grid.query(50, 10) == {"a"} and grid.query(10, 10) == set()
+    grid.remove("a")
+    assert not grid.cells and "a" not in grid
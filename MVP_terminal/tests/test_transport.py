@@ -0,0 +1,28 @@
+import json
+import socket
+
+import pytest
+
+from ester_grid.transport import MeshTransport
+
+
+@pytest.fixture
+def mesh():
+    t = MeshTransport()
+    yield t
+    t.close()
+
+
+def test_destinos_no_string_no_paran_el_hilo(mesh):
+    ep = mesh.endpoint("B")
+    ep.settimeout(2.0)
+    port = ep.getsockname()[1]
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        for bad in ({"type": "msg", "src": "A", "to": ["B"]},
+                    {"type": "ack", "src": "dispatcher", "for": {"x": 1}},
+                    {"type": "msg", "src": "A", "to": "B", "twin_copy": True, "original_dest": ["B"]},
+                    {"type": "publish", "src": "A", "topic": ["t"]}):
+            s.sendto(json.dumps(bad).encode("utf-8"), ("127.0.0.1", port))
+        s.sendto(json.dumps({"type": "msg", "src": "A", "to": "B", "data": 1}).encode("utf-8"), ("127.0.0.1", port))
+        assert ep.recv_json()["data"] == 1
+    assert mesh.stats["unroutable"] == 4